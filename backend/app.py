@@ -1,13 +1,15 @@
 import asyncio
 from pathlib import Path
-from typing import List, Dict, Union, Optional
+from typing import Callable, List, Dict, Tuple, Union, Optional
 import pandas as pd
 import traceback # Import traceback to print full errors
 
 # Import your modules
-from src.file_reader import read_text_file, read_csv_file, read_pdf_file, read_doc_file
+from src.ingest import stream_documents
 from src.associational_algorithm import AssociationalOntologyCreator
-from src.generate_knowledge_graph import visualize_graph
+from src.generate_knowledge_graph import build_vis_graph, render_vis_graph
+from src.graph_session import GraphSession
+from src.job_queue import get_job_manager
 
 
 async def generate_knowledge_graph_html(
@@ -18,66 +20,35 @@ async def generate_knowledge_graph_html(
     llm_name: Optional[str] = None,
     temp: Optional[int] = None,
     chunk_size: Optional[int] = None,
-    chunk_overlap: Optional[int] = None
+    chunk_overlap: Optional[int] = None,
+    ontology_scope: str = "chunk",
+    fuzzy_entity_matching: bool = False,
+    csv_mode: str = "schema",
+    deadline_seconds: Optional[float] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    result_callback: Optional[Callable[[dict], None]] = None,
+    report_callback: Optional[Callable[[dict], None]] = None,
+    graph_callback: Optional[Callable[[dict], None]] = None
 ) -> Optional[str]:
+    """
+    Builds the graph for the given files and text and returns it as HTML, or None.
+    With deadline_seconds, extraction stops at the deadline and the graph merged so far
+    is rendered. report_callback, if given, receives creator.run_report() once extraction
+    is done, including the chunks that were dropped and the coverage of the input.
+    graph_callback, if given, receives the graph from build_vis_graph before it is rendered.
+    """
     
     print("--- 🔍 DEBUG: Starting generate_knowledge_graph_html ---")
     
-    full_text = []
-    
-    # 1. Handle Raw Text
-    if raw_text:
-        full_text.append({"name": "raw_text", "content": raw_text})
-    
-    # 2. Handle Files
-    if files:
-        for file_dict in files:
-            file_name = file_dict.get('name', 'unknown')
-            file_content = file_dict.get('content') 
-            file_extension = file_dict.get('extension', Path(file_name).suffix).lower()
-            
-            print(f"--- 🔍 DEBUG: Processing file: {file_name} ({file_extension}) ---")
-
-            try:
-                # Reset stream position
-                if file_content is not None and hasattr(file_content, 'seek'):
-                    file_content.seek(0)
-                
-                content = None
-                
-                if file_extension == ".txt":
-                    content = read_text_file(file_content)
-                elif file_extension == ".csv":
-                    content = read_csv_file(file_content)
-                elif file_extension == ".pdf":
-                    # This calls your new src/file_reader.py
-                    content = read_pdf_file(file_content)
-                elif file_extension == ".docx":
-                    content = read_doc_file(file_content)
-                else:
-                    print(f"Skipping unsupported file type: {file_extension}")
-                    continue
-
-                # Check if content extraction actually worked
-                if content is not None and len(str(content)) > 0:
-                    full_text.append({"name": file_name, "content": content})
-                    print(f"--- 🔍 DEBUG: Successfully read {len(str(content))} chars from {file_name}")
-                else:
-                    print(f"--- 🔍 DEBUG: Warning - Extracted empty content from {file_name}")
-
-            except Exception as e:
-                # 🛑 THIS WAS THE PROBLEM BEFORE: It was returning None and stopping everything.
-                print(f"!!! CRITICAL ERROR reading file {file_name}: {e}")
-                traceback.print_exc()
-                # We continue to the next file instead of crashing
-                continue 
-    
-    # 3. Validation
-    if not full_text:
-        print("--- 🔍 DEBUG: No text extracted from any source. Returning None.")
+    # 1. Validation
+    if not raw_text and not files:
+        print("--- 🔍 DEBUG: No raw text or files provided. Returning None.")
         return None
     
-    # 4. Generate Graph
+    # 2. Generate Graph
+    # Files are read concurrently and streamed through the chunker into the LLM workers,
+    # so extraction starts on the first pages while later files are still being parsed
+    creator = None
     try:
         print("--- 🔍 DEBUG: Initializing Ontology Creator ---")
         creator = AssociationalOntologyCreator(
@@ -86,25 +57,94 @@ async def generate_knowledge_graph_html(
             api_key=api_key, 
             temperature=temp, 
             chunk_size=chunk_size, 
-            chunk_overlap=chunk_overlap
+            chunk_overlap=chunk_overlap,
+            fuzzy_entity_matching=fuzzy_entity_matching,
+            csv_mode=csv_mode
         )
         
-        print("--- 🔍 DEBUG: Running create_associational_ontology (This calls the LLM) ---")
-        graph_document = await creator.create_associational_ontology(full_text)
+        print("--- 🔍 DEBUG: Running create_associational_ontology_stream (This calls the LLM) ---")
+        graph_document = await creator.create_associational_ontology_stream(
+            stream_documents(files, raw_text),
+            ontology_scope=ontology_scope,
+            progress_callback=progress_callback,
+            result_callback=result_callback,
+            deadline_seconds=deadline_seconds
+        )
+        if report_callback is not None:
+            report_callback(creator.run_report())
         
         if graph_document and graph_document.nodes:
             print(f"--- 🔍 DEBUG: Graph generated with {len(graph_document.nodes)} nodes. Visualizing... ---")
-            html_output = visualize_graph(graph_document)
-            return html_output
+            return await asyncio.to_thread(render_graph_document, graph_document, graph_callback)
         else:
             print("--- 🔍 DEBUG: Graph document was empty or had no nodes. ---")
             return None 
             
+    except asyncio.CancelledError:
+        # Cancelled job or disconnected client: report what was skipped, then let it propagate
+        print("--- 🔍 DEBUG: Graph generation cancelled ---")
+        if report_callback is not None and creator is not None:
+            report_callback(creator.run_report())
+        raise
     except Exception as e:
         print(f"!!! CRITICAL ERROR during graph generation: {e}")
         traceback.print_exc()
         return None
 
+def render_graph_document(graph_document, graph_callback: Optional[Callable[[dict], None]] = None) -> Optional[str]:
+    """
+    Renders a merged GraphDocument as HTML, passing the vis graph to graph_callback first.
+    Layout, clustering and payload compression take CPU time in proportion to the graph,
+    so the async callers run this in a worker thread rather than on the job loop.
+    """
+    vis_graph = build_vis_graph(graph_document)
+    if vis_graph is None:
+        return None
+    if graph_callback is not None:
+        graph_callback(vis_graph)
+    return render_vis_graph(vis_graph)
+
+
+async def update_graph_session(
+    session: GraphSession,
+    files: List[Dict[str, Union[str, bytes]]],
+    api_key: Optional[str] = None,
+    deadline_seconds: Optional[float] = None,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    result_callback: Optional[Callable[[dict], None]] = None,
+    report_callback: Optional[Callable[[dict], None]] = None,
+    graph_callback: Optional[Callable[[dict], None]] = None
+) -> Tuple[Optional[str], Dict[str, List[str]]]:
+    """
+    Adds files to a graph session, extracting only those that are new or changed, and
+    renders the whole session graph. Callbacks are as in generate_knowledge_graph_html.
+    Returns (html or None, the file names by outcome from GraphSession.add_documents).
+    """
+    changes = await session.add_documents(
+        files, api_key=api_key, deadline_seconds=deadline_seconds, progress_callback=progress_callback,
+        result_callback=result_callback, report_callback=report_callback
+    )
+    graph_document = session.to_graph_document()
+    if graph_document is None:
+        return None, changes
+    return await asyncio.to_thread(render_graph_document, graph_document, graph_callback), changes
+
+
+async def remove_graph_session_documents(
+    session: GraphSession,
+    names: List[str],
+    graph_callback: Optional[Callable[[dict], None]] = None
+) -> Tuple[Optional[str], List[str]]:
+    """
+    Takes documents out of a graph session and renders what is left.
+    Returns (html or None, the names that were removed).
+    """
+    removed = await session.remove_documents(names)
+    graph_document = session.to_graph_document()
+    if graph_document is None:
+        return None, removed
+    return await asyncio.to_thread(render_graph_document, graph_document, graph_callback), removed
+
 # --- Synchronous Wrapper ---
 def generate_knowledge_graph_html_sync(
     files: Optional[List[Dict[str, Union[str, bytes]]]] = None,
@@ -114,9 +154,12 @@ def generate_knowledge_graph_html_sync(
     llm_name: Optional[str] = None,
     temp: Optional[int] = None,
     chunk_size: Optional[int] = None,
-    chunk_overlap: Optional[int] = None
+    chunk_overlap: Optional[int] = None,
+    ontology_scope: str = "chunk"
 ) -> Optional[str]:
-    return asyncio.run(generate_knowledge_graph_html(
+    # Pooled LLM clients keep connections bound to one event loop, so run on the
+    # shared long-lived job loop instead of a fresh asyncio.run loop
+    return get_job_manager().run(generate_knowledge_graph_html(
         files, 
         raw_text=raw_text, # Passed raw_text correctly
         api_key=api_key, 
@@ -124,5 +167,6 @@ def generate_knowledge_graph_html_sync(
         llm_name=llm_name, 
         temp=temp, 
         chunk_size=chunk_size, 
-        chunk_overlap=chunk_overlap
+        chunk_overlap=chunk_overlap,
+        ontology_scope=ontology_scope
     ))
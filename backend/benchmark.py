@@ -166,6 +166,8 @@ async def benchmark_llm_processing(benchmark: PerformanceBenchmark, creator: Ass
     print(f"LLM processing completed in {elapsed:.3f} seconds")
     print(f"  - Processed {len(text_entries)} documents")
     print(f"  - Total content size: {total_chars:,} characters")
+    if creator.cache is not None:
+        print(f"  - LLM chunk cache: {creator.cache_hits} hits, {creator.cache_misses} misses")
     
     return graph_document
 
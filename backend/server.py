@@ -1,8 +1,38 @@
-from flask import Flask, jsonify, request, Response
+from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
+import asyncio
 import base64
+import hashlib
 import io
-from app import generate_knowledge_graph_html_sync
+import queue
+import zipfile
+from app import (generate_knowledge_graph_html, generate_knowledge_graph_html_sync, remove_graph_session_documents,
+                 update_graph_session)
+from src.associational_algorithm import ONTOLOGY_SCOPES, PROMPT_VERSION
+from src.csv_graph import CSV_MODES
+from src.generate_knowledge_graph import render_vis_graph
+from src.graph_export import EXPORT_FORMATS, export_graph_html, export_graphs_html, get_browser_pool
+from src.graph_lod import build_level_of_detail
+from src.graph_payload import (ENCODING_IDENTITY, decode_graph_payload, encode_graph_payload, get_graph_store,
+                               negotiate_encoding)
+from src.graph_session import GraphSessionLimitError, get_session_store
+from src.graph_template import render_graph_viewer_html
+from src.job_queue import JOB_CANCELLED, JOB_FAILED, JOB_SUCCEEDED, JobQueueFullError, get_job_manager
+from src.graph_stream import GraphDeltaBuilder, format_sse
+from src.json_parsing import get_parse_stats
+from src.rate_limiter import get_rate_limiter_stats
+from src.request_cache import CACHE_MISS, get_request_cache, is_complete_run, read_and_hash, request_cache_key
+
+SSE_KEEPALIVE_SECONDS = 15
+# Graph payloads are content-addressed, so a stored id never changes meaning
+GRAPH_DATA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+GRAPH_VIEWER_CACHE_CONTROL = "public, max-age=3600"
+GRAPH_EXPORT_BATCH_MAX = 50
+GRAPH_EXPORT_MIMETYPES = {"pdf": "application/pdf", "jpeg": "image/jpeg"}
+
+# The viewer page is the same for every graph, so it is rendered once
+GRAPH_VIEWER_HTML = render_graph_viewer_html()
+GRAPH_VIEWER_ETAG = hashlib.sha256(GRAPH_VIEWER_HTML.encode("utf-8")).hexdigest()[:16]
 
 app = Flask(__name__)
 
@@ -17,6 +47,20 @@ def howdy_horld():
     
     return jsonify({"message": "Howdy World!"})
 
+@app.route('/stats/', methods=['GET'])
+def get_stats():
+    # Process-wide counts of strict, repaired and failed LLM response parses, jobs per
+    # status and LLM calls retried or cancelled (e.g. after a client disconnect)
+    return jsonify({
+        "json_parsing": get_parse_stats().to_dict(),
+        "jobs": get_job_manager().stats(),
+        "llm_calls": get_rate_limiter_stats(),
+        "graph_store": get_graph_store().stats(),
+        "graph_export": get_browser_pool().stats(),
+        "graph_sessions": get_session_store().stats(),
+        "request_cache": request_cache.stats() if (request_cache := get_request_cache()) is not None else None,
+    })
+
 @app.route('/env/', methods=['POST'])
 def set_env_variables():
     global user_api_key, user_base_url, user_model_name
@@ -29,78 +73,572 @@ def set_env_variables():
 
     return jsonify({"status": "Environment variables received."})
 
+class GenerationRequestError(ValueError):
+    """A graph generation request that is missing required input."""
+
+
+def _parse_generation_request():
+    """
+    Reads settings, text and uploaded files from the current form request.
+    Returns the keyword arguments for generate_knowledge_graph_html.
+    """
+    api_key = request.form.get('api_key')
+    base_url = request.form.get('base_url')
+    model_name = request.form.get('model_name')
+    
+    # Handle temperature with default value
+    temp_str = request.form.get('temperature', '0.7')
+    temperature = float(temp_str) if temp_str else 0.7
+    
+    # Handle chunk_size with default value
+    chunk_str = request.form.get('chunk_size', '1000')
+    chunk_size = int(chunk_str) if chunk_str else 1000
+    
+    chunk_overlap = chunk_size // 20
+
+    # "chunk", "document" or "corpus": how often node types are derived
+    ontology_scope = request.form.get('ontology_scope') or 'chunk'
+    if ontology_scope not in ONTOLOGY_SCOPES:
+        raise ValueError(f"ontology_scope must be one of {', '.join(ONTOLOGY_SCOPES)}")
+    
+    # Optionally merge near-identical entity names, e.g. "Retrieval Augmented Generation" and "Retrieval Augmented Generaton"
+    fuzzy_entity_matching = request.form.get('fuzzy_entity_matching', 'false').lower() in ('1', 'true', 'yes', 'on')
+
+    # "schema", "heuristic" or "text": how CSV uploads are turned into nodes and edges
+    csv_mode = request.form.get('csv_mode') or 'schema'
+    if csv_mode not in CSV_MODES:
+        raise ValueError(f"csv_mode must be one of {', '.join(CSV_MODES)}")
+    
+    # Optional time limit: the best partial graph is returned when it passes
+    deadline_str = request.form.get('deadline_seconds')
+    deadline_seconds = float(deadline_str) if deadline_str else None
+    if deadline_seconds is not None and deadline_seconds <= 0:
+        raise ValueError("deadline_seconds must be greater than 0")
+    
+    # Validate credentials are provided
+    if not api_key or not base_url or not model_name:
+        raise GenerationRequestError("API credentials required. Please configure your API settings.")
+    
+    # Get text from form data
+    text = request.form.get('text', '')
+    
+    # Get uploaded files
+    uploaded_files = request.files.getlist('files')
+    
+    processed_files = []
+    
+    # Process uploaded files
+    for file in uploaded_files:
+        extension = '.' + file.filename.split('.')[-1].lower()
+        # Read file content into BytesIO, hashing it on the way for the request cache key
+        data, digest = read_and_hash(file.stream)
+        processed_files.append({
+            "name": file.filename,
+            "extension": extension,
+            "content": io.BytesIO(data),
+            "sha256": digest,
+        })
+    
+    # If text was provided, add it as a text file
+    if text.strip():
+        text_bytes = text.encode('utf-8')
+        processed_files.append({
+            "name": "input_text.txt",
+            "extension": ".txt",
+            "content": io.BytesIO(text_bytes),
+            "sha256": hashlib.sha256(text_bytes).hexdigest(),
+        })
+    
+    if not processed_files:
+        raise GenerationRequestError("No files or text provided")
+    
+    return {
+        "files": processed_files,
+        "api_key": api_key,
+        "api_base": base_url,
+        "llm_name": model_name,
+        "temp": temperature,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "ontology_scope": ontology_scope,
+        "fuzzy_entity_matching": fuzzy_entity_matching,
+        "csv_mode": csv_mode,
+        "deadline_seconds": deadline_seconds,
+    }
+
+
+def _include_html():
+    """
+    Whether the response should carry the rendered HTML page. Clients that load the
+    graph through graph_url / data_url send include_html=false.
+    """
+    return request.form.get('include_html', 'true').lower() in ('1', 'true', 'yes', 'on')
+
+
+class GraphResult:
+    """
+    Collects what one generation run produced: the run report, and the links to the
+    stored compact graph payload once graph_callback has been called. Large graphs
+    are viewed through a level-of-detail overview whose clusters expand on demand.
+    """
+
+    def __init__(self, include_html: bool = True):
+        self.include_html = include_html
+        self.report = {}
+        self.links = {}
+        self.graph = None
+        # Ids of every payload the links depend on, cluster expansions included
+        self.graph_ids = []
+        # Where the result came from when the request cache is enabled, see request_cache
+        self.cache = None
+
+    def on_graph(self, vis_graph):
+        store = get_graph_store()
+        self.graph = vis_graph
+        graph_id = store.put(encode_graph_payload(vis_graph))
+        view_id = graph_id
+        self.graph_ids = [graph_id]
+        lod = build_level_of_detail(vis_graph)
+        if lod is not None:
+            overview, expansions = lod
+            for node in overview["nodes"]:
+                if "cluster" in node:
+                    node["cluster"]["graph"] = store.put(encode_graph_payload(expansions[node["id"]]))
+                    self.graph_ids.append(node["cluster"]["graph"])
+            # Stored last, so the overview is the last of its graphs to be evicted
+            view_id = store.put(encode_graph_payload(overview))
+            self.graph_ids.append(view_id)
+            self.report["level_of_detail"] = {
+                "nodes_total": len(vis_graph["nodes"]),
+                "nodes_shown": len(overview["nodes"]),
+                "clusters": len(expansions),
+            }
+        self.links = {
+            "graph_id": graph_id,
+            "view_id": view_id,
+            "data_url": f"/graphs/{graph_id}/data/",
+            "graph_url": f"/graphs/viewer/?graph={view_id}",
+            "html_url": f"/graphs/{graph_id}/html/",
+        }
+
+    def to_dict(self, html):
+        result = {"report": self.report, **self.links}
+        if self.cache is not None:
+            result["cache"] = self.cache
+        if self.include_html:
+            result["html"] = html
+        return result
+
+    def cache_entry(self, html):
+        """The request cache value for this run: everything needed to answer it again."""
+        return {"html": html, "report": self.report, "graph": self.graph, "links": self.links,
+                "graph_ids": self.graph_ids}
+
+    def restore(self, entry):
+        """
+        Loads a request cache entry. The graph payloads are stored again only if the
+        graph store has evicted any of them since.
+        """
+        self.report = dict(entry["report"])
+        self.graph = entry["graph"]
+        store = get_graph_store()
+        if entry["graph"] is not None and not all(graph_id in store for graph_id in entry["graph_ids"]):
+            self.on_graph(entry["graph"])
+        else:
+            self.links = dict(entry["links"])
+            self.graph_ids = list(entry["graph_ids"])
+
+
+def _cacheable(entry):
+    return entry["html"] is not None and entry["graph"] is not None and is_complete_run(entry["report"])
+
+
+async def _generate_graph(generation_kwargs, result, **callbacks):
+    """
+    Runs generate_knowledge_graph_html for a parsed request, filling result. Identical
+    requests (same uploads, settings and API key) are answered from the request cache, and
+    concurrent ones without a deadline share a single run. Returns the HTML, or None if no
+    graph was built.
+    """
+    callbacks.setdefault("report_callback", result.report.update)
+
+    async def compute():
+        html = await generate_knowledge_graph_html(**generation_kwargs, graph_callback=result.on_graph, **callbacks)
+        return result.cache_entry(html)
+
+    request_cache = get_request_cache()
+    if request_cache is None:
+        return (await compute())["html"]
+    key = request_cache_key(generation_kwargs, PROMPT_VERSION)
+    entry, result.cache = await request_cache.get_or_compute(
+        key, compute, _cacheable, shared=generation_kwargs["deadline_seconds"] is None
+    )
+    if result.cache != CACHE_MISS:
+        # May re-encode and compress the graph, so it stays off the job loop
+        await asyncio.to_thread(result.restore, entry)
+    return entry["html"]
+
+
 @app.route('/generate-graph/', methods=['POST'])
 def run_algorithm():
     try:
-        api_key = request.form.get('api_key')
-        base_url = request.form.get('base_url')
-        model_name = request.form.get('model_name')
-        
-        # Handle temperature with default value
-        temp_str = request.form.get('temperature', '0.7')
-        temperature = float(temp_str) if temp_str else 0.7
-        
-        # Handle chunk_size with default value
-        chunk_str = request.form.get('chunk_size', '1000')
-        chunk_size = int(chunk_str) if chunk_str else 1000
-        
-        chunk_overlap = chunk_size // 20
-        
-        # Validate credentials are provided
-        if not api_key or not base_url or not model_name:
-            return jsonify({
-                "error": "API credentials required. Please configure your API settings."
-            }), 400
-        
-        # Get text from form data
-        text = request.form.get('text', '')
-        
-        # Get uploaded files
-        uploaded_files = request.files.getlist('files')
-        
-        processed_files = []
-        
-        # Process uploaded files
-        for file in uploaded_files:
-            extension = '.' + file.filename.split('.')[-1].lower()
-            # Read file content into BytesIO
-            file_content = io.BytesIO(file.read())
-            file_content.seek(0)
-            processed_files.append({
-                "name": file.filename,
-                "extension": extension,
-                "content": file_content,
-            })
-        
-        # If text was provided, add it as a text file
-        if text.strip():
-            text_content = io.BytesIO(text.encode('utf-8'))
-            processed_files.append({
-                "name": "input_text.txt",
-                "extension": ".txt",
-                "content": text_content,
-            })
-        
-        if not processed_files:
-            return jsonify({"error": "No files or text provided"}), 400
-        
-        html = generate_knowledge_graph_html_sync(
-            processed_files, 
-            api_key=api_key, 
-            api_base=base_url, 
-            llm_name=model_name, 
-            temp=temperature, 
-            chunk_size=chunk_size, 
-            chunk_overlap=chunk_overlap
-        )
-        return jsonify({"html": html})
+        generation_kwargs = _parse_generation_request()
+
+        # Run on the shared long-lived loop rather than a fresh asyncio.run loop per request
+        result = GraphResult(include_html=_include_html())
+        html = get_job_manager().run(_generate_graph(generation_kwargs, result))
+        return jsonify(result.to_dict(html))
         
+    except GenerationRequestError as e:
+        return jsonify({"error": str(e)}), 400
     except ValueError as e:
         return jsonify({"error": f"Invalid settings value: {str(e)}"}), 400
     except Exception as e:
         return jsonify({"error": f"Error generating graph: {str(e)}"}), 500
 
 
+@app.route('/jobs/generate-graph/', methods=['POST'])
+def submit_generate_graph_job():
+    """Queues a graph generation job and returns its id right away."""
+    try:
+        generation_kwargs = _parse_generation_request()
+    except GenerationRequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError as e:
+        return jsonify({"error": f"Invalid settings value: {str(e)}"}), 400
+    include_html = _include_html()
+
+    async def run_job(job):
+        def on_progress(completed, total):
+            job.update_progress(completed_chunks=completed, total_chunks=total)
+
+        result = GraphResult(include_html=include_html)
+
+        def on_report(run_report):
+            result.report.update(run_report)
+            job.update_progress(dropped_chunks=len(run_report["dropped_chunks"]),
+                                cancelled_chunks=run_report["cancelled_chunks"])
+
+        html = await _generate_graph(generation_kwargs, result, progress_callback=on_progress,
+                                     report_callback=on_report)
+        if html is None:
+            raise RuntimeError("No graph could be generated from the provided input.")
+        return result.to_dict(html)
+
+    try:
+        job = get_job_manager().submit(run_job)
+    except JobQueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}/",
+        "result_url": f"/jobs/{job.id}/result/",
+    }), 202
+
+
+@app.route('/generate-graph/stream/', methods=['POST'])
+def stream_generate_graph():
+    """
+    Streams graph generation as Server-Sent Events: 'progress' and 'delta' events
+    while chunks complete, then one 'done' event with the graph links and the final
+    HTML unless include_html=false (or 'error').
+    """
+    try:
+        generation_kwargs = _parse_generation_request()
+    except GenerationRequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError as e:
+        return jsonify({"error": f"Invalid settings value: {str(e)}"}), 400
+
+    events = queue.Queue()
+    delta_builder = GraphDeltaBuilder(fuzzy_entity_matching=generation_kwargs["fuzzy_entity_matching"])
+
+    def on_progress(completed, total):
+        events.put(("progress", {"completed_chunks": completed, "total_chunks": total}))
+
+    def on_result(gd_dict):
+        delta = delta_builder.add(gd_dict)
+        if delta["nodes"] or delta["edges"]:
+            events.put(("delta", delta))
+
+    result = GraphResult(include_html=_include_html())
+
+    async def run_job(job):
+        try:
+            html = await _generate_graph(generation_kwargs, result, progress_callback=on_progress,
+                                         result_callback=on_result)
+        except Exception as e:
+            events.put(("error", {"error": f"Error generating graph: {str(e)}"}))
+            raise
+        if html is None:
+            events.put(("error", {"error": "No graph could be generated from the provided input."}))
+        else:
+            events.put(("done", result.to_dict(html)))
+        return result.to_dict(html)
+
+    try:
+        job = get_job_manager().submit(run_job)
+    except JobQueueFullError as e:
+        return jsonify({"error": str(e)}), 503
+
+    def event_stream():
+        finished = False
+        try:
+            yield format_sse("job", {"job_id": job.id})
+            while True:
+                try:
+                    event, data = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    # Comment frame keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event, data)
+                if event in ("done", "error"):
+                    finished = True
+                    return
+        finally:
+            # GeneratorExit when the client disconnects; the server notices on the next
+            # write, at the latest with the next keepalive
+            if not finished:
+                get_job_manager().cancel(job.id)
+
+    return Response(
+        stream_with_context(event_stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route('/jobs/<job_id>/', methods=['GET'])
+def get_job_status(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job id"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancels a queued or running job along with its pending and in-flight LLM calls."""
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job id"}), 404
+    return jsonify(job.to_dict()), 202
+
+
+@app.route('/jobs/<job_id>/result/', methods=['GET'])
+def get_job_result(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job id"}), 404
+    if job.status == JOB_FAILED:
+        return jsonify({"error": f"Error generating graph: {job.error}"}), 500
+    if job.status == JOB_CANCELLED:
+        return jsonify({"error": "Job was cancelled", **job.to_dict()}), 410
+    if job.status != JOB_SUCCEEDED:
+        return jsonify(job.to_dict()), 202
+    return jsonify(job.result)
+
+
+def _update_session(session, generation_kwargs):
+    """Adds the request's files to a session; returns the JSON body with the rendered graph."""
+    result = GraphResult(include_html=_include_html())
+    html, changes = get_job_manager().run(update_graph_session(
+        session, generation_kwargs["files"], api_key=generation_kwargs["api_key"],
+        deadline_seconds=generation_kwargs["deadline_seconds"], report_callback=result.report.update,
+        graph_callback=result.on_graph
+    ))
+    return {"session": session.to_dict(), "changes": changes, **result.to_dict(html)}
+
+
+@app.route('/graph-sessions/', methods=['POST'])
+def create_graph_session():
+    """
+    Opens a graph session with the request's settings and builds its graph from the
+    request's files and text. Documents can then be added and removed without
+    extracting the rest again.
+    """
+    try:
+        generation_kwargs = _parse_generation_request()
+        session = get_session_store().create(generation_kwargs)
+    except GenerationRequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError as e:
+        return jsonify({"error": f"Invalid settings value: {str(e)}"}), 400
+    except GraphSessionLimitError as e:
+        return jsonify({"error": str(e)}), 503
+    try:
+        return jsonify(_update_session(session, generation_kwargs)), 201
+    except Exception as e:
+        get_session_store().delete(session.id)
+        return jsonify({"error": f"Error generating graph: {str(e)}"}), 500
+
+
+@app.route('/graph-sessions/<session_id>/', methods=['GET'])
+def get_graph_session(session_id):
+    session = get_session_store().get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired session id"}), 404
+    return jsonify(session.to_dict())
+
+
+@app.route('/graph-sessions/<session_id>/', methods=['DELETE'])
+def delete_graph_session(session_id):
+    session = get_session_store().delete(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired session id"}), 404
+    return jsonify(session.to_dict())
+
+
+@app.route('/graph-sessions/<session_id>/documents/', methods=['POST'])
+def add_graph_session_documents(session_id):
+    """
+    Adds the request's files and text to a session. Only new or changed documents are
+    extracted, with the settings the session was created with; the request supplies
+    the credentials and an optional deadline.
+    """
+    session = get_session_store().get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired session id"}), 404
+    try:
+        generation_kwargs = _parse_generation_request()
+        return jsonify(_update_session(session, generation_kwargs))
+    except GenerationRequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except ValueError as e:
+        return jsonify({"error": f"Invalid settings value: {str(e)}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error generating graph: {str(e)}"}), 500
+
+
+@app.route('/graph-sessions/<session_id>/documents/<path:document>/', methods=['DELETE'])
+def remove_graph_session_document(session_id, document):
+    """Takes one document out of a session graph through its provenance; no LLM calls are made."""
+    session = get_session_store().get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired session id"}), 404
+    result = GraphResult(include_html=request.args.get('include_html', 'true').lower() in ('1', 'true', 'yes', 'on'))
+    html, removed = get_job_manager().run(remove_graph_session_documents(
+        session, [document], graph_callback=result.on_graph
+    ))
+    if not removed:
+        return jsonify({"error": f"Document '{document}' is not in this session"}), 404
+    return jsonify({"session": session.to_dict(), "changes": {"removed": removed}, **result.to_dict(html)})
+
+
+def _etag_matches(graph_id):
+    """True if If-None-Match names any encoding of graph_id (or is *)."""
+    if_none_match = request.if_none_match
+    if if_none_match.star_tag:
+        return True
+    return any(tag.split("-")[0] == graph_id for tag in if_none_match.as_set(include_weak=True))
+
+
+@app.route('/graphs/viewer/', methods=['GET'])
+def get_graph_viewer():
+    """Static viewer page; loads the graph named by ?graph=<id> from /graphs/<id>/data/."""
+    headers = {"ETag": f'"{GRAPH_VIEWER_ETAG}"', "Cache-Control": GRAPH_VIEWER_CACHE_CONTROL}
+    if _etag_matches(GRAPH_VIEWER_ETAG):
+        return Response(status=304, headers=headers)
+    return Response(GRAPH_VIEWER_HTML, mimetype="text/html", headers=headers)
+
+
+@app.route('/graphs/<graph_id>/data/', methods=['GET'])
+def get_graph_data(graph_id):
+    """
+    Compact columnar graph payload (see src.graph_payload), brotli or gzip compressed
+    when the client accepts it. The graph id is a content hash, so responses are
+    immutable and revalidate with the ETag.
+    """
+    headers = {"Cache-Control": GRAPH_DATA_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if _etag_matches(graph_id):
+        return Response(status=304, headers={**headers, "ETag": f'"{graph_id}"'})
+
+    stored = get_graph_store().get(graph_id, negotiate_encoding(request.headers.get("Accept-Encoding")))
+    if stored is None:
+        return jsonify({"error": "Unknown or expired graph id"}), 404
+    body, encoding = stored
+    if encoding == ENCODING_IDENTITY:
+        headers["ETag"] = f'"{graph_id}"'
+    else:
+        # Each content coding is its own representation and gets its own strong ETag
+        headers["ETag"] = f'"{graph_id}-{encoding}"'
+        headers["Content-Encoding"] = encoding
+    return Response(body, mimetype="application/json", headers=headers)
+
+
+@app.route('/graphs/<graph_id>/html/', methods=['GET'])
+def get_graph_html(graph_id):
+    """The stored graph rendered as a standalone HTML page, e.g. for downloads."""
+    html = _stored_graph_html(graph_id)
+    if html is None:
+        return jsonify({"error": "Unknown or expired graph id"}), 404
+    return Response(html, mimetype="text/html", headers={"ETag": f'"{graph_id}-html"'})
+
+
+def _stored_graph_html(graph_id):
+    stored = get_graph_store().get(graph_id)
+    if stored is None:
+        return None
+    return render_vis_graph(decode_graph_payload(stored[0]))
+
+
+@app.route('/graphs/<graph_id>/export/<file_type>/', methods=['GET'])
+def export_graph(graph_id, file_type):
+    """The stored graph as a PDF or JPEG, rendered by the warm export browser pool."""
+    if file_type not in EXPORT_FORMATS:
+        return jsonify({"error": f"Export format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    html = _stored_graph_html(graph_id)
+    if html is None:
+        return jsonify({"error": "Unknown or expired graph id"}), 404
+    try:
+        data = export_graph_html(html, file_type)
+    except Exception as e:
+        return jsonify({"error": f"Error exporting graph: {str(e)}"}), 500
+    return Response(data, mimetype=GRAPH_EXPORT_MIMETYPES[file_type], headers={
+        "Content-Disposition": f'attachment; filename="knowledge_graph.{file_type}"',
+    })
+
+
+@app.route('/graphs/export/', methods=['POST'])
+def export_graphs():
+    """
+    Exports several stored graphs at once. Takes {"graph_ids": [...], "format": "pdf"
+    or "jpeg"} and returns a zip with one <graph_id>.<format> file per graph that
+    rendered; failed or unknown ids are listed in errors.txt.
+    """
+    data = request.get_json(silent=True) or {}
+    graph_ids = data.get("graph_ids")
+    file_type = data.get("format", "pdf")
+    if file_type not in EXPORT_FORMATS:
+        return jsonify({"error": f"Export format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    if not isinstance(graph_ids, list) or not graph_ids or not all(isinstance(graph_id, str) for graph_id in graph_ids):
+        return jsonify({"error": "graph_ids must be a non-empty list of graph ids"}), 400
+    if len(graph_ids) > GRAPH_EXPORT_BATCH_MAX:
+        return jsonify({"error": f"At most {GRAPH_EXPORT_BATCH_MAX} graphs can be exported at once"}), 400
+
+    graph_ids = list(dict.fromkeys(graph_ids))
+    htmls = {graph_id: _stored_graph_html(graph_id) for graph_id in graph_ids}
+    errors = [f"{graph_id}: unknown or expired graph id" for graph_id, html in htmls.items() if html is None]
+    found = [graph_id for graph_id, html in htmls.items() if html is not None]
+    exports = export_graphs_html([htmls[graph_id] for graph_id in found], file_type) if found else []
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_STORED) as zf:
+        for graph_id, export in zip(found, exports):
+            if export is None:
+                errors.append(f"{graph_id}: export failed")
+            else:
+                zf.writestr(f"{graph_id}.{file_type}", export)
+        if errors:
+            zf.writestr("errors.txt", "\n".join(errors) + "\n")
+    return Response(archive.getvalue(), mimetype="application/zip", headers={
+        "Content-Disposition": 'attachment; filename="knowledge_graphs.zip"',
+    })
+
+
 # encoded_string = None
 # with open("paper1.pdf", "rb") as pdf_file:
 #     encoded_string = base64.b64encode(pdf_file.read()).decode("utf-8")
@@ -1,18 +1,17 @@
 # knowledge_graph_project/src/associational_algorithm.py
 import asyncio
+import itertools
 import json
 import logging
 import re
+import time
 import traceback
-from typing import Dict, List, Any, Tuple
+from typing import Any, AsyncIterable, Dict, List, Optional, Tuple
 
+import pandas as pd
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_community.chat_models import ChatOpenAI
-from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
-from json_repair import repair_json
-import tiktoken
+from langchain_community.graphs.graph_document import GraphDocument
 # from src.stopwords import nltkStopRemoval
 
 # Set up logging for better error visibility
@@ -21,7 +20,168 @@ logger = logging.getLogger(__name__)
 
 # --- LLM Configuration ---
 # Import the function to configure the LLM.
-from src.llm_config import get_llm
+from src.llm_config import disable_json_mode, get_chain, get_llm, is_json_mode_error
+from src.json_parsing import PARSE_FAILED, ParseStats, get_parse_stats, parse_llm_json
+from src.llm_cache import ChunkResultCache, get_chunk_cache
+from src.graph_merger import IncrementalGraphMerger
+from src.entity_resolution import EntityResolver
+from src.tokenizer import StreamingChunker, TokenChunkSplitter, count_tokens
+from src.rate_limiter import get_rate_limiter
+from src.chunk_dedup import ChunkDeduplicator, ChunkJob, relabel_copy
+from src.chunk_packing import ChunkPacker, combine_results, pack_text, split_packed_result
+from src.chunk_retry import (DROP_REASON_BUDGET, DROP_REASON_DEADLINE, DROP_REASON_FAILED, DROP_REASON_RETRY_FAILED,
+                              DROP_REASON_TIMEOUT,
+                              RETRY_MAX_CHUNKS, RETRY_MIN_CHUNK_SIZE, RETRY_SPLIT_FACTOR, RETRY_TIME_BUDGET_SECONDS,
+                              RetryBudget, dropped_chunk_entry)
+from src.csv_graph import (CSV_MODES, CSV_SCHEMA_PROMPT_TEMPLATE, csv_sample, csv_to_graph_dict,
+                           infer_csv_schema, validate_csv_schema)
+
+# Bump whenever a prompt template below changes so cached chunk results are not reused.
+PROMPT_VERSION = "1"
+
+# "chunk" derives node types for every chunk, "document" once per document
+# and "corpus" once for all documents from a sample of their chunks.
+ONTOLOGY_SCOPES = ("chunk", "document", "corpus")
+ONTOLOGY_SAMPLE_CHUNKS = 6
+ONTOLOGY_SAMPLE_TOKENS = 6000
+
+# Rough size of the system prompts, added to the chunk when estimating tokens per call
+PROMPT_OVERHEAD_TOKENS = 400
+
+# Chunks waiting for an LLM worker in the streaming pipeline, per worker
+STREAM_QUEUE_CHUNKS_PER_WORKER = 2
+
+ONTOLOGY_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a sophisticated AI that extracts knowledge from text. "
+     "Your task is to identify a short list of node types to help classify important topics within the included documents. "
+     "Respond exclusively with a JSON object. "
+     "Do not add any additional text, markdown, or explanations."
+     "The JSON object must have one key: 'node_types'. "
+     "Evaluate the best set of node types based on the topic of the document and the frequency of important concepts."
+     "The exact number of node types may vary, but aim for between 5 and 15 types."),
+     ("user", "{text_chunk}")
+])
+
+GRAPH_SYSTEM_PROMPT = (
+     "You are a sophisticated AI that extracts knowledge from text. "
+     "Your task is to identify and extract all nodes and their relationships. "
+     "Respond exclusively with a JSON object. "
+     "Do not add any additional text, markdown, or explanations."
+     "The JSON object must have two keys: 'nodes' and 'relationships'."
+     "Each node must have an 'id' and a 'type'."
+     "ids should be unique identifiers based on the content. Do not label the node ids as 'Node 1', 'Node 2', etc.—use meaningful identifiers based on the content."
+     "Each relationship must have a 'source' id, a 'target' id, and a 'type'."
+     "Node types should be chosen from the following list: {node_types}."
+     "Relationships should be verbs or short phrases that describe the connection, like 'WORKS_AT', 'IS_A', 'LOCATED_IN', 'MENTIONS', etc."
+)
+
+GRAPH_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system", GRAPH_SYSTEM_PROMPT),
+     ("user", "{text_chunk}")
+])
+
+# Several short chunks in one request, see src.chunk_packing
+PACKED_GRAPH_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system",
+     GRAPH_SYSTEM_PROMPT +
+     " The text consists of independent segments, each starting with a line like '### SEGMENT 1'. "
+     "Each node and each relationship must also have a 'segment' field with the number of the segment it was found in."),
+     ("user", "{text_chunk}")
+])
+
+# Second attempt at a chunk whose first extraction failed, see _retry_failed_chunks
+STRICT_GRAPH_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system",
+     GRAPH_SYSTEM_PROMPT +
+     " A previous answer for this text could not be used. Output only the JSON object itself: "
+     "start with '{{' and end with '}}', use double quotes for all keys and strings, no trailing commas, "
+     "no comments and no markdown code fences."),
+     ("user", "{text_chunk}")
+])
+
+NODES_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a sophisticated AI that extracts knowledge from text. "
+     "Your task is to identify a list of nodes from text. "
+     "Respond exclusively with a JSON object. "
+     "Do not add any additional text, markdown, or explanations."
+     "The JSON object must have one key: 'nodes'. "
+     "Each node must have an 'id' and a 'type'. "
+     "Evaluate the best set of nodes based on the topic of the document and the most frequently appearing concepts."
+     "The number of nodes should depend on the length and complexity of the text, but aim to product a node for every 5-20 words."),
+     ("user", "{text_chunk}")
+])
+
+RELATIONSHIPS_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a sophisticated AI that extracts knowledge from text. "
+     "Your task is to identify a list of relationships from text and the following list of nodes: {nodes} "
+     "Respond exclusively with a JSON object. "
+     "Do not add any additional text, markdown, or explanations."
+     "The JSON object must have two keys: 'nodes' and 'relationships'. "
+     "Each node must have an 'id' and a 'type'. "
+     "Preserve the nodes provided to you and only add the relationships to the JSON object. "
+     "Relationships should be verbs or short phrases that describe the connection, like 'WORKS_AT', 'IS_A', 'LOCATED_IN', 'MENTIONS', etc. "
+     "Each JSON object should describe a connection or relationship, and it must have a source, a target, and a type field."
+     "The number of nodes should depend on the length and complexity of the text, but aim to product a node for every 5-20 words."),
+     ("user", "{text_chunk}")
+])
+
+
+class ChunkRun:
+    """
+    Scheduling state of one extraction run: the near-duplicate index, the open packs of
+    short chunks, the chunks whose extraction failed, kept for the retry stage, and
+    per-document counts of chunks scheduled and finished for the coverage report.
+    """
+
+    def __init__(self, dedup: ChunkDeduplicator | None, packer: ChunkPacker | None,
+                 deadline_seconds: float | None = None):
+        self.dedup = dedup
+        self.packer = packer
+        # (chunk, name, cluster_id, node_types) per failed chunk
+        self.failed: List[Tuple[str, Any, int | None, str | None]] = []
+        self.scheduled: Dict[Any, int] = {}
+        self.finished: Dict[Any, int] = {}
+        self.started_at = time.monotonic()
+        self.deadline_seconds = deadline_seconds
+        self.deadline_reached = False
+        self.cancelled = False
+        self.input_complete = False
+
+    def remaining_seconds(self) -> float | None:
+        """Seconds left until the deadline, or None for runs without one."""
+        if self.deadline_seconds is None:
+            return None
+        return max(0.0, self.started_at + self.deadline_seconds - time.monotonic())
+
+    def chunk_scheduled(self, name):
+        self.scheduled[name] = self.scheduled.get(name, 0) + 1
+
+    def chunk_finished(self, name):
+        self.finished[name] = self.finished.get(name, 0) + 1
+
+    def coverage(self) -> Dict[str, Any]:
+        """How much of the input was extracted, overall and per document."""
+        total = sum(self.scheduled.values())
+        finished = sum(self.finished.values())
+        return {
+            "deadline_seconds": self.deadline_seconds,
+            "deadline_reached": self.deadline_reached,
+            "cancelled": self.cancelled,
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 2),
+            # False if the deadline hit while documents were still being read
+            "input_complete": self.input_complete,
+            "chunks_total": total,
+            "chunks_finished": finished,
+            "ratio": round(finished / total, 4) if total else 1.0,
+            "documents": {
+                str(name): {"chunks": count, "finished": self.finished.get(name, 0)}
+                for name, count in self.scheduled.items()
+            },
+        }
+
 
 class AssociationalOntologyCreator:
     """
@@ -36,14 +196,37 @@ class AssociationalOntologyCreator:
                 llm_name=None,
                 api_base=None,
                 api_key=None,
-                temperature=0):
+                temperature=0,
+                use_cache=True,
+                fuzzy_entity_matching=False,
+                csv_mode="schema",
+                deduplicate_chunks=True,
+                pack_small_chunks=True,
+                retry_failed_chunks=True,
+                retry_max_chunks=RETRY_MAX_CHUNKS,
+                retry_time_budget_seconds=RETRY_TIME_BUDGET_SECONDS):
         """
         Initializes the ontology creator with a specific LLM and chunking strategy.
 
         Args:
             chunk_size (int): The size of the chunks for text splitting.
             chunk_overlap (int): The overlap between chunks.
+            use_cache (bool): Reuse parsed chunk results from the on-disk LLM cache.
+            fuzzy_entity_matching (bool): Also merge near-identical node ids (n-gram MinHash)
+                on top of the exact case/spacing/plural folding.
+            csv_mode (str): One of CSV_MODES. "schema" and "heuristic" map DataFrame content
+                straight to nodes and edges instead of extracting from its text chunk by chunk.
+            deduplicate_chunks (bool): Send only one chunk of each near-duplicate cluster
+                (SimHash) to the LLM and reuse its result for the others.
+            pack_small_chunks (bool): Extract chunks shorter than half of chunk_size
+                several at a time, in one request of at most chunk_size tokens.
+            retry_failed_chunks (bool): After the first pass, re-extract chunks that failed,
+                split into smaller pieces and with a stricter JSON-only prompt.
+            retry_max_chunks (int): Failed chunks retried per run; the rest are dropped.
+            retry_time_budget_seconds (float): Time the retry stage may take per run.
         """
+        if csv_mode not in CSV_MODES:
+            raise ValueError(f"csv_mode must be one of {CSV_MODES}, got '{csv_mode}'")
 
         self.llm_name = llm_name
         self.api_base = api_base
@@ -51,110 +234,120 @@ class AssociationalOntologyCreator:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.temperature = temperature
-        self.llm = get_llm(temperature=0.0, model_name=self.llm_name, api_base=self.api_base, api_key=self.api_key)
+        self.fuzzy_entity_matching = fuzzy_entity_matching
+        self.csv_mode = csv_mode
+        self.deduplicate_chunks = deduplicate_chunks
+        self.duplicate_chunks = 0
+        self.pack_small_chunks = pack_small_chunks
+        self.packed_requests = 0
+        self.retry_failed_chunks = retry_failed_chunks
+        self.retry_max_chunks = retry_max_chunks
+        self.retry_time_budget_seconds = retry_time_budget_seconds
+        self.retried_chunks = 0
+        self.recovered_chunks = 0
+        # dropped_chunk_entry() dicts for chunks missing from the graph
+        self.dropped_chunks: List[Dict[str, Any]] = []
+        # ChunkRun.coverage() of the last run
+        self.coverage: Dict[str, Any] | None = None
+        # Chunks left unextracted because a run was cancelled, e.g. when the client went away
+        self.cancelled_chunks = 0
+        # time.monotonic() deadline of the current run, so LLM retries never wait past it
+        self.deadline_at: float | None = None
+        self.llm_temperature = 0.0
+        llm_settings = dict(temperature=self.llm_temperature, model_name=self.llm_name, api_base=self.api_base, api_key=self.api_key)
+        self.llm_settings = llm_settings
+        # Pooled client: reused across requests with the same credentials and model
+        self.llm = get_llm(**llm_settings)
+        self.cache = get_chunk_cache() if use_cache else None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.ontology_cache_hits = 0
+        self.ontology_cache_misses = 0
+        # strict / repaired / failed response parses for this creator
+        self.parse_stats = ParseStats()
+        # Shared by every creator using the same provider account, so concurrent
+        # requests draw from one budget
+        self.rate_limiter = get_rate_limiter(self.api_base, self.api_key)
         # Use a text splitter that respects token limits
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.text_splitter = TokenChunkSplitter(
             chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=self._tiktoken_len
+            chunk_overlap=self.chunk_overlap
+        )
+        # Smaller pieces for re-extracting failed chunks
+        self.retry_splitter = TokenChunkSplitter(
+            chunk_size=max(self.chunk_size // RETRY_SPLIT_FACTOR, RETRY_MIN_CHUNK_SIZE),
+            chunk_overlap=self.chunk_overlap // RETRY_SPLIT_FACTOR
         )
 
-        self.ontology_prompt_template = ChatPromptTemplate.from_messages([
-            ("system",
-             "You are a sophisticated AI that extracts knowledge from text. "
-             "Your task is to identify a short list of node types to help classify important topics within the included documents. "
-             "Respond exclusively with a JSON object. "
-             "Do not add any additional text, markdown, or explanations."
-             "The JSON object must have one key: 'node_types'. "
-             "Evaluate the best set of node types based on the topic of the document and the frequency of important concepts."
-             "The exact number of node types may vary, but aim for between 5 and 15 types."),
-             ("user", "{text_chunk}")
-        ])
-
-        self.graph_prompt_template = ChatPromptTemplate.from_messages([
-            ("system",
-             "You are a sophisticated AI that extracts knowledge from text. "
-             "Your task is to identify and extract all nodes and their relationships. "
-             "Respond exclusively with a JSON object. "
-             "Do not add any additional text, markdown, or explanations."
-             "The JSON object must have two keys: 'nodes' and 'relationships'."
-             "Each node must have an 'id' and a 'type'."
-             "ids should be unique identifiers based on the content. Do not label the node ids as 'Node 1', 'Node 2', etc.—use meaningful identifiers based on the content."
-             "Each relationship must have a 'source' id, a 'target' id, and a 'type'."
-             "Node types should be chosen from the following list: {node_types}."
-             "Relationships should be verbs or short phrases that describe the connection, like 'WORKS_AT', 'IS_A', 'LOCATED_IN', 'MENTIONS', etc."),
-             ("user", "{text_chunk}")
-        ])
-
-        self.nodes_prompt_template = ChatPromptTemplate.from_messages([
-            ("system",
-             "You are a sophisticated AI that extracts knowledge from text. "
-             "Your task is to identify a list of nodes from text. "
-             "Respond exclusively with a JSON object. "
-             "Do not add any additional text, markdown, or explanations."
-             "The JSON object must have one key: 'nodes'. "
-             "Each node must have an 'id' and a 'type'. "
-             "Evaluate the best set of nodes based on the topic of the document and the most frequently appearing concepts."
-             "The number of nodes should depend on the length and complexity of the text, but aim to product a node for every 5-20 words."),
-             ("user", "{text_chunk}")
-        ])
-
-        self.relationships_prompt_template = ChatPromptTemplate.from_messages([
-            ("system",
-             "You are a sophisticated AI that extracts knowledge from text. "
-             "Your task is to identify a list of relationships from text and the following list of nodes: {nodes} "
-             "Respond exclusively with a JSON object. "
-             "Do not add any additional text, markdown, or explanations."
-             "The JSON object must have two keys: 'nodes' and 'relationships'. "
-             "Each node must have an 'id' and a 'type'. "
-             "Preserve the nodes provided to you and only add the relationships to the JSON object. "
-             "Relationships should be verbs or short phrases that describe the connection, like 'WORKS_AT', 'IS_A', 'LOCATED_IN', 'MENTIONS', etc. "
-             "Each JSON object should describe a connection or relationship, and it must have a source, a target, and a type field."
-             "The number of nodes should depend on the length and complexity of the text, but aim to product a node for every 5-20 words."),
-             ("user", "{text_chunk}")
-        ])
-
-        # Create an extraction chain to process chunks
+        # Prompt templates are compiled once at import time and shared
+        self.ontology_prompt_template = ONTOLOGY_PROMPT_TEMPLATE
+        self.graph_prompt_template = GRAPH_PROMPT_TEMPLATE
+        self.nodes_prompt_template = NODES_PROMPT_TEMPLATE
+        self.relationships_prompt_template = RELATIONSHIPS_PROMPT_TEMPLATE
+
+        # Create an extraction chain to process chunks; chains are pooled with their client
         # Option 1: Generate ontology first, then full graph
-        self.ontology_extraction_chain = self.ontology_prompt_template | self.llm
-        self.graph_extraction_chain = self.graph_prompt_template | self.llm
+        self.ontology_extraction_chain = get_chain("ontology", self.ontology_prompt_template, **llm_settings)
+        self.graph_extraction_chain = get_chain("graph", self.graph_prompt_template, **llm_settings)
+        self.packed_graph_extraction_chain = get_chain("packed_graph", PACKED_GRAPH_PROMPT_TEMPLATE, **llm_settings)
 
         # Option 2: Generate nodes first, then relationships
-        self.nodes_extraction_chain = self.nodes_prompt_template | self.llm
-        self.relationships_extraction_chain = self.relationships_prompt_template | self.llm
+        self.nodes_extraction_chain = get_chain("nodes", self.nodes_prompt_template, **llm_settings)
+        self.relationships_extraction_chain = get_chain("relationships", self.relationships_prompt_template, **llm_settings)
+
+        # Tables: one schema call per CSV instead of one extraction call per chunk
+        self.csv_schema_chain = get_chain("csv_schema", CSV_SCHEMA_PROMPT_TEMPLATE, **llm_settings)
 
     def _tiktoken_len(self, text: str) -> int:
         """
-        Calculates the length of text in tokens using tiktoken.
+        Calculates the length of text in tokens using the shared tiktoken encoding.
         """
-        try:
-            tokenizer = tiktoken.get_encoding("cl100k_base")
-            tokens = tokenizer.encode(text, disallowed_special=())
-            return len(tokens)
-        except Exception as e:
-            logger.warning(f"Tiktoken error: {e}. Falling back to character count.")
-            return len(text)
+        return count_tokens(text)
 
-    async def create_associational_ontology(self, text_entries) -> GraphDocument:
+    async def create_associational_ontology(self, text_entries, ontology_scope: str = "chunk",
+                                            progress_callback=None, result_callback=None,
+                                            deadline_seconds: float | None = None) -> GraphDocument:
         """
         Orchestrates the creation of the knowledge graph from multiple documents.
         Each entry in text_entries should be a dict with keys:
             - 'name': document name
             - 'content': document text or dataframe
+
+        Args:
+            ontology_scope (str): One of ONTOLOGY_SCOPES. With "document" or "corpus" the
+                node types are derived once from sampled chunks, so each chunk only needs
+                the graph extraction call.
+            progress_callback (callable): Optional, called as progress_callback(completed, total)
+                each time a chunk finishes.
+            result_callback (callable): Optional, called with each chunk's parsed graph dict
+                as soon as that chunk succeeds, before the final merge.
+            deadline_seconds (float): Optional time limit for the run. Chunks are scheduled
+                round-robin across documents, LLM calls still outstanding at the deadline
+                are cancelled and the graph merged so far is returned; see self.coverage.
         """
+        if ontology_scope not in ONTOLOGY_SCOPES:
+            raise ValueError(f"ontology_scope must be one of {ONTOLOGY_SCOPES}, got '{ontology_scope}'")
+
         if not text_entries:
             logger.warning("Input is empty. Cannot create a graph.")
             return GraphDocument(nodes=[], relationships=[], source=None)
 
-        sem = asyncio.Semaphore(10)
-    
+        run = self.new_run(deadline_seconds)
+        run.input_complete = True
+
         # Prepare all documents first
-        all_tasks = []
+        named_contents = []
+        tables = []
         
         for entry in text_entries:
             name = entry.get("name", "Unnamed Document")
             content = entry.get("content", "")
 
+            # Tables go through the structured fast path
+            if isinstance(content, pd.DataFrame) and self.csv_mode != "text":
+                tables.append((name, content))
+                continue
+
             # Convert non-string content (e.g. DataFrames) to string
             if not isinstance(content, str):
                 try:
@@ -166,32 +359,584 @@ class AssociationalOntologyCreator:
                 logger.warning(f"Document '{name}' is empty. Skipping.")
                 continue
 
-            # Split into chunks
-            chunks = self.text_splitter.split_text(content)
-            logger.info(f"Document '{name}' split into {len(chunks)} chunks for processing.")
+            named_contents.append((name, content))
 
-            # Add all chunk tasks for this document to the global task list
-            for chunk in chunks:
-                all_tasks.append(
-                    self.limited_process_chunk_ontology_graphs(sem, chunk, name)
-                )
+        # Split into chunks, encoding all documents in one batch
+        split_contents = self.text_splitter.split_texts([content for _, content in named_contents])
+        documents = []
+        for (name, _), chunks in zip(named_contents, split_contents):
+            logger.info(f"Document '{name}' split into {len(chunks)} chunks for processing.")
+            documents.append((name, chunks))
         
-        # Process ALL chunks from ALL documents concurrently
-        if not all_tasks:
+        if not tables and not any(chunks for _, chunks in documents):
             logger.warning("No chunks to process from any document.")
             return GraphDocument(nodes=[], relationships=[], source=None)
+
+        # Derive shared node types up front; None means each chunk derives its own
+        if ontology_scope == "corpus":
+            corpus_node_types = await self._derive_node_types([chunk for _, chunks in documents for chunk in chunks])
+            doc_node_types = [corpus_node_types] * len(documents)
+        elif ontology_scope == "document":
+            doc_node_types = await asyncio.gather(*(self._derive_node_types(chunks) for _, chunks in documents))
+        else:
+            doc_node_types = [None] * len(documents)
+
+        # Add all chunk tasks for every document to the global task list. Tables come first
+        # and chunks are interleaved across documents, so LLM calls start in that order and
+        # a deadline cuts the tail of every document rather than whole documents
+        all_tasks = []
+        for name, table in tables:
+            run.chunk_scheduled(name)
+            all_tasks.append(self._finishing_job(run, name, lambda table=table, name=name: self._process_csv_table(table, name))())
+        document_chunks = [
+            [(chunk, name, node_types) for chunk in chunks]
+            for (name, chunks), node_types in zip(documents, doc_node_types)
+        ]
+        for chunk, name, node_types in itertools.chain.from_iterable(
+                itertools.zip_longest(*document_chunks, fillvalue=(None, None, None))):
+            if chunk is None:
+                continue
+            run.chunk_scheduled(name)
+            jobs, duplicate_job = self._schedule_chunk(run, chunk, name, node_types)
+            all_tasks.extend(job() for job in jobs)
+            if duplicate_job is not None:
+                all_tasks.append(duplicate_job())
+        all_tasks.extend(job() for job in self._flush_packs(run))
         
+        # Process ALL chunks from ALL documents concurrently, merging each result as it arrives
         logger.info(f"Processing {len(all_tasks)} total chunks across all documents concurrently.")
-        results = await asyncio.gather(*all_tasks)
-        valid_results = [res for res in results if res is not None]
+        merger = self.new_merger()
+        try:
+            valid_count = await self._merge_as_completed(all_tasks, merger, progress_callback, result_callback, run=run)
+            valid_count += await self._retry_failed_chunks(run, merger, result_callback)
+        except asyncio.CancelledError:
+            self._record_cancellation(run)
+            raise
+        self.coverage = run.coverage()
+        self._log_run_stats(run.dedup)
+
+        if not valid_count:
+            logger.warning("No valid results were returned from any document.")
+            return GraphDocument(nodes=[], relationships=[], source=None)
 
-        # Merge all documents’ graphs into one
-        if not valid_results:
+        return merger.to_graph_document()
+
+    async def create_associational_ontology_stream(self, segments: AsyncIterable[Tuple[int, str, Optional[str]]],
+                                                   ontology_scope: str = "chunk",
+                                                   progress_callback=None, result_callback=None,
+                                                   deadline_seconds: float | None = None,
+                                                   merger: IncrementalGraphMerger | None = None) -> GraphDocument | None:
+        """
+        Streaming form of create_associational_ontology that overlaps reading, chunking
+        and extraction. Chunks are cut as soon as enough tokens have arrived and handed
+        to LLM workers through a bounded queue, so a slow LLM pauses the readers instead
+        of buffering the whole corpus.
+
+        Args:
+            segments: Async iterable of (doc_index, name, text) as produced by
+                src.ingest.stream_documents; text None marks the end of a document.
+                text may also be a DataFrame, which is handled as a whole table.
+            ontology_scope (str): As in create_associational_ontology. With "document" or
+                "corpus", a document's (or the corpus') chunks are held back until it has
+                been read in full, so the shared node types are derived from chunks spread
+                across all of it; only then are they extracted.
+            progress_callback (callable): Called as progress_callback(completed, total),
+                where total grows while documents are still being read.
+            result_callback (callable): Called with each chunk's parsed graph dict.
+            deadline_seconds (float): As in create_associational_ontology. Queued chunks are
+                taken by their position in their document, so early chunks of every
+                document go first; the queue is unbounded in this mode so that all
+                documents are read ahead.
+            merger (IncrementalGraphMerger): Optional, the merger to fold results into, e.g.
+                a graph session's, whose existing graph is then extended. A new one by default.
+
+        Returns:
+            GraphDocument: The merged graph, or None when merger was given: the caller owns
+            that graph and builds it when needed, see self.run_report() for this run.
+        """
+        if ontology_scope not in ONTOLOGY_SCOPES:
+            raise ValueError(f"ontology_scope must be one of {ONTOLOGY_SCOPES}, got '{ontology_scope}'")
+
+        worker_count = max(1, self.rate_limiter.max_concurrency)
+        # (position in document, submit order, job); the order breaks ties between equal positions.
+        # With a deadline the input is read ahead without backpressure, so the ordering can
+        # spread work over every document rather than over the ones that were read first
+        queue_size = 0 if deadline_seconds is not None else worker_count * STREAM_QUEUE_CHUNKS_PER_WORKER
+        chunk_queue = asyncio.PriorityQueue(maxsize=queue_size)
+        submit_order = itertools.count()
+        external_merger = merger is not None
+        if merger is None:
+            merger = self.new_merger()
+        run = self.new_run(deadline_seconds)
+        counts = {"total": 0, "completed": 0, "valid": 0}
+
+        def report():
+            if progress_callback is not None:
+                progress_callback(counts["completed"], counts["total"])
+
+        async def submit(job, position):
+            counts["total"] += 1
+            report()
+            await chunk_queue.put((position, next(submit_order), job))
+
+        # Near-duplicate chunks wait for their representative outside the queue, so they
+        # never hold a worker that the representative itself needs
+        followers: List[asyncio.Future] = []
+
+        async def follow(duplicate_job):
+            result = await duplicate_job()
+            counts["completed"] += 1
+            if self._fold_result(result, merger, result_callback):
+                counts["valid"] += 1
+            report()
+
+        async def enqueue(chunk, name, node_types, position):
+            jobs, duplicate_job = self._schedule_chunk(run, chunk, name, node_types)
+            for job in jobs:
+                await submit(job, position)
+            if duplicate_job is not None:
+                counts["total"] += 1
+                report()
+                followers.append(asyncio.ensure_future(follow(duplicate_job)))
+
+        # Chunks held back per scope key until the scope has been read in full, so its node
+        # types come from a sample spread across all of it
+        held: Dict[Any, List[Tuple[str, str, int]]] = {}
+        scope_node_types: Dict[Any, str | None] = {}
+
+        async def release(scope_key):
+            chunks = held.pop(scope_key, [])
+            node_types = await self._derive_node_types([chunk for chunk, _, _ in chunks])
+            scope_node_types[scope_key] = node_types
+            for chunk, name, position in chunks:
+                await enqueue(chunk, name, node_types, position)
+
+        async def route(doc_index, name, chunk, position):
+            run.chunk_scheduled(name)
+            if ontology_scope == "chunk":
+                await enqueue(chunk, name, None, position)
+                return
+            scope_key = doc_index if ontology_scope == "document" else "corpus"
+            if scope_key in scope_node_types:
+                await enqueue(chunk, name, scope_node_types[scope_key], position)
+                return
+            held.setdefault(scope_key, []).append((chunk, name, position))
+
+        async def produce():
+            chunkers: Dict[int, StreamingChunker] = {}
+            chunk_counts: Dict[int, int] = {}
+            async for doc_index, name, text in segments:
+                if isinstance(text, pd.DataFrame):
+                    if self.csv_mode != "text":
+                        run.chunk_scheduled(name)
+                        await submit(self._finishing_job(
+                            run, name, lambda table=text, name=name: self._process_csv_table(table, name)
+                        ), 0)
+                        continue
+                    text = text.to_string()
+                chunker = chunkers.get(doc_index)
+                if chunker is None:
+                    chunker = chunkers[doc_index] = StreamingChunker(self.chunk_size, self.chunk_overlap)
+                chunks = chunker.feed(text) if text is not None else chunker.flush()
+                position = chunk_counts.get(doc_index, 0)
+                chunk_counts[doc_index] = position + len(chunks)
+                for offset, chunk in enumerate(chunks):
+                    await route(doc_index, name, chunk, position + offset)
+                if text is None:
+                    del chunkers[doc_index]
+                    logger.info(f"Document '{name}' split into {chunk_counts[doc_index]} chunks for processing.")
+                    if ontology_scope == "document" and doc_index in held:
+                        await release(doc_index)
+            run.input_complete = True
+            for scope_key in list(held):
+                await release(scope_key)
+            for job in self._flush_packs(run):
+                await submit(job, 0)
+            # Stop markers sort after every job
+            for _ in range(worker_count):
+                await chunk_queue.put((float("inf"), next(submit_order), None))
+
+        async def work():
+            while True:
+                _, _, job = await chunk_queue.get()
+                if job is None:
+                    return
+                result = await job()
+                counts["completed"] += 1
+                if self._fold_result(result, merger, result_callback):
+                    counts["valid"] += 1
+                report()
+
+        tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(work()) for _ in range(worker_count)]
+        try:
+            try:
+                done, pending = await asyncio.wait(tasks, timeout=run.remaining_seconds(),
+                                                   return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    # Re-raises the first error from the producer or a worker
+                    task.result()
+                if not pending and followers:
+                    # Every representative has finished, so only the deadline can hold these up
+                    done, pending = await asyncio.wait(followers, timeout=run.remaining_seconds())
+                    for task in done:
+                        task.result()
+                if pending:
+                    run.deadline_reached = True
+                    logger.warning(f"Deadline of {deadline_seconds}s reached after {counts['completed']} of "
+                                   f"{counts['total']} chunks; cancelling outstanding LLM calls.")
+            finally:
+                # Followers are cancelled with the workers, before cancelled representatives
+                # publish their empty results
+                waiting = tasks + followers
+                for task in waiting:
+                    task.cancel()
+                # Let cancelled LLM calls unwind before the partial graph is rendered
+                await asyncio.gather(*waiting, return_exceptions=True)
+            counts["valid"] += await self._retry_failed_chunks(run, merger, result_callback)
+        except asyncio.CancelledError:
+            # The request was cancelled, e.g. because the client disconnected
+            self._record_cancellation(run)
+            raise
+        self.coverage = run.coverage()
+        self._log_run_stats(run.dedup)
+
+        if not counts["valid"]:
             logger.warning("No valid results were returned from any document.")
+        if external_merger:
+            return None
+        if not counts["valid"]:
             return GraphDocument(nodes=[], relationships=[], source=None)
 
-        return self.merge_graph_documents(valid_results)
+        return merger.to_graph_document()
+
+    def new_deduplicator(self) -> ChunkDeduplicator | None:
+        """Returns a per-run near-duplicate index, or None when deduplication is off."""
+        return ChunkDeduplicator() if self.deduplicate_chunks else None
+
+    def new_packer(self) -> ChunkPacker | None:
+        """Returns a per-run packer for short chunks, or None when packing is off."""
+        return ChunkPacker(self.chunk_size) if self.pack_small_chunks else None
+
+    def new_run(self, deadline_seconds: float | None = None) -> ChunkRun:
+        run = ChunkRun(self.new_deduplicator(), self.new_packer(), deadline_seconds)
+        self.deadline_at = run.started_at + deadline_seconds if deadline_seconds is not None else None
+        return run
+
+    @staticmethod
+    def _finishing_job(run: ChunkRun, name, job: ChunkJob) -> ChunkJob:
+        """Wraps a job so that its chunk counts as finished once the job returns."""
+        async def run_job():
+            result = await job()
+            run.chunk_finished(name)
+            return result
+        return run_job
+
+    def _schedule_chunk(self, run: ChunkRun, chunk: str, name,
+                        node_types: str | None) -> Tuple[List[ChunkJob], ChunkJob | None]:
+        """
+        Returns (jobs, duplicate_job) for one chunk. jobs are the zero-argument coroutine
+        functions to run now: the chunk's own job, a pack that the chunk sealed, or nothing
+        while a short chunk waits in an open pack. For a near-duplicate, jobs holds the pack
+        its representative was sealed into, if any, and duplicate_job waits for the
+        representative's result; it must not be run by a worker that jobs depend on.
+        """
+        cluster_id = None
+        if run.dedup is not None:
+            cluster_id, duplicate_job = run.dedup.claim(chunk, name)
+            if duplicate_job is not None:
+                # The representative may still sit in an open pack; send it first
+                sealed = run.packer.seal_where(lambda member: member[2] == cluster_id) if run.packer is not None else []
+                return [self._pack_job(run, pack, key) for key, pack in sealed], self._finishing_job(run, name, duplicate_job)
+
+        member = (chunk, name, cluster_id)
+        if run.packer is not None:
+            tokens = self._tiktoken_len(chunk)
+            if run.packer.is_small(tokens):
+                sealed = run.packer.add(node_types, member, tokens)
+                return ([self._pack_job(run, sealed, node_types)] if sealed else []), None
+        return [self._pack_job(run, [member], node_types)], None
+
+    def _flush_packs(self, run: ChunkRun) -> List[ChunkJob]:
+        if run.packer is None:
+            return []
+        return [self._pack_job(run, pack, node_types) for node_types, pack in run.packer.flush()]
+
+    def _pack_job(self, run: ChunkRun, members: List[tuple], node_types: str | None) -> ChunkJob:
+        """
+        Returns a job that extracts one chunk, or several short chunks in one packed request,
+        hands each chunk's result to the run's deduplicator for its near-duplicates and
+        records failed chunks for the retry stage.
+        """
+        async def run_job():
+            results = [None] * len(members)
+            try:
+                if len(members) == 1:
+                    chunk, name, _ = members[0]
+                    results[0] = await self.limited_process_chunk_ontology_graphs(chunk, name, node_types=node_types)
+                else:
+                    results = await self._process_packed_chunks(
+                        [chunk for chunk, _, _ in members], [name for _, name, _ in members], node_types
+                    )
+            finally:
+                if run.dedup is not None:
+                    for (_, _, cluster_id), result in zip(members, results):
+                        run.dedup.publish(cluster_id, result)
+            # Not reached when the job is cancelled, e.g. at the deadline
+            for (chunk, name, cluster_id), result in zip(members, results):
+                run.chunk_finished(name)
+                if result is None:
+                    run.failed.append((chunk, name, cluster_id, node_types))
+            return results[0] if len(members) == 1 else combine_results(results)
+        return run_job
+
+    def new_merger(self) -> IncrementalGraphMerger:
+        """
+        Returns a merger that resolves node ids through a fresh alias index,
+        so spelling variants of an entity merge before edges are attached.
+        """
+        resolver = EntityResolver(fuzzy=self.fuzzy_entity_matching)
+        return IncrementalGraphMerger(normalize_id=resolver.resolve)
+
+    @staticmethod
+    async def _merge_as_completed(tasks, merger: IncrementalGraphMerger,
+                                  progress_callback=None, result_callback=None,
+                                  run: ChunkRun | None = None) -> int:
+        """
+        Folds chunk results into the merger in completion order, so nothing but the
+        merged graph is held in memory. Returns the number of chunks that succeeded.
+        If run has a deadline, the tasks still pending when it passes are cancelled.
+        """
+        tasks = [asyncio.ensure_future(task) for task in tasks]
+        total = len(tasks)
+        completed = 0
+        valid_count = 0
+        if progress_callback is not None:
+            progress_callback(completed, total)
+
+        try:
+            for next_result in asyncio.as_completed(tasks, timeout=run.remaining_seconds() if run else None):
+                result = await next_result
+                completed += 1
+                if AssociationalOntologyCreator._fold_result(result, merger, result_callback):
+                    valid_count += 1
+                if progress_callback is not None:
+                    progress_callback(completed, total)
+        except asyncio.TimeoutError:
+            run.deadline_reached = True
+            logger.warning(f"Deadline of {run.deadline_seconds}s reached after {completed} of {total} chunks; "
+                           f"cancelling outstanding LLM calls.")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return valid_count
+
+    @staticmethod
+    def _fold_result(result: dict | None, merger: IncrementalGraphMerger, result_callback=None) -> bool:
+        """
+        Adds one chunk result to the merger and reports it. Returns False for failed chunks.
+        """
+        if result is None:
+            return False
+        merger.add(result)
+        if result_callback is not None:
+            try:
+                result_callback(result)
+            except Exception as e:
+                logger.warning(f"Chunk result callback failed: {e}")
+        return True
+
+    async def _retry_failed_chunks(self, run: ChunkRun, merger: IncrementalGraphMerger, result_callback=None) -> int:
+        """
+        Re-extracts only the chunks that failed in the first pass, within a per-run budget
+        of retry_max_chunks chunks and retry_time_budget_seconds (less if the run's deadline
+        is closer; none once it has passed). Each chunk is re-split
+        into smaller pieces sent with the strict JSON-only prompt; recovered results are
+        also copied to the chunk's near-duplicates. Whatever still fails, or does not fit
+        the budget, is recorded in dropped_chunks. Returns the number of results merged.
+        """
+        failed, run.failed = run.failed, []
+        if not failed:
+            return 0
+        remaining = run.remaining_seconds()
+        if not self.retry_failed_chunks or run.deadline_reached or remaining == 0:
+            reason = DROP_REASON_FAILED if not self.retry_failed_chunks else DROP_REASON_DEADLINE
+            for chunk, name, cluster_id, _ in failed:
+                self._drop_chunk(run, chunk, name, cluster_id, reason)
+            return 0
+
+        logger.info(f"Retrying {len(failed)} failed chunks with smaller pieces and a strict JSON prompt.")
+        time_budget = self.retry_time_budget_seconds if remaining is None else min(self.retry_time_budget_seconds, remaining)
+        budget = RetryBudget(self.retry_max_chunks, time_budget)
+
+        async def retry(chunk, name, node_types):
+            if not budget.take():
+                return [(chunk, DROP_REASON_BUDGET)], []
+            self.retried_chunks += 1
+            try:
+                pieces = await asyncio.wait_for(self._reextract_chunk(chunk, name, node_types),
+                                                budget.remaining_seconds())
+            except asyncio.TimeoutError:
+                return [(chunk, DROP_REASON_TIMEOUT)], []
+            dropped = [(piece, DROP_REASON_RETRY_FAILED) for piece, result in pieces if result is None]
+            return dropped, [result for _, result in pieces if result is not None]
+
+        valid_count = 0
+        tasks = [retry(chunk, name, node_types) for chunk, name, _, node_types in failed]
+        # Results come back in task order, so they line up with failed
+        for (chunk, name, cluster_id, _), (dropped, results) in zip(failed, await asyncio.gather(*tasks)):
+            for piece, reason in dropped:
+                self._drop_chunk(run, piece, name, cluster_id, reason)
+            if not results:
+                continue
+            self.recovered_chunks += 1
+            result = combine_results(results)
+            titles = run.dedup.duplicate_titles(cluster_id) if run.dedup is not None and cluster_id is not None else []
+            for recovered in [result] + [relabel_copy(result, title) for title in titles]:
+                if self._fold_result(recovered, merger, result_callback):
+                    valid_count += 1
+
+        logger.info(f"Chunk retry: {self.recovered_chunks} of {self.retried_chunks} retried chunks recovered, "
+                    f"{len(self.dropped_chunks)} chunks dropped.")
+        return valid_count
+
+    async def _reextract_chunk(self, text_chunk: str, text_title, node_types: str | None) -> List[Tuple[str, dict | None]]:
+        """
+        Splits a failed chunk with retry_splitter and extracts the pieces with the strict
+        prompt. Returns (piece, result) pairs; result is None for pieces that failed again.
+        """
+        pieces = self.retry_splitter.split_text(text_chunk) or [text_chunk]
+        if node_types is None:
+            # One ontology call for the whole chunk instead of one per piece
+            node_types = await self._derive_node_types([text_chunk])
+        results = await asyncio.gather(*(
+            self._process_chunk_with_llm_ontology_graph(piece, text_title, node_types=node_types, strict=True)
+            for piece in pieces
+        ))
+        return list(zip(pieces, results))
+
+    def _drop_chunk(self, run: ChunkRun, text_chunk: str, text_title, cluster_id: int | None, reason: str):
+        duplicates = len(run.dedup.duplicate_titles(cluster_id)) if run.dedup is not None and cluster_id is not None else 0
+        entry = dropped_chunk_entry(text_chunk, text_title, reason, duplicates=duplicates)
+        self.dropped_chunks.append(entry)
+        logger.warning(f"Dropped chunk of '{entry['document']}' ({reason}): {entry['preview']}")
+
+    def _record_cancellation(self, run: ChunkRun):
+        run.cancelled = True
+        self.coverage = run.coverage()
+        self.cancelled_chunks += self.coverage["chunks_total"] - self.coverage["chunks_finished"]
+        logger.info(f"Run cancelled after {self.coverage['chunks_finished']} of {self.coverage['chunks_total']} "
+                    f"chunks; outstanding LLM calls were cancelled.")
+
+    def run_report(self) -> Dict[str, Any]:
+        """
+        Summary of this creator's runs for API responses: chunk retries, the chunks that
+        are missing from the graph, the coverage of the last run and the reuse and parse counters.
+        """
+        return {
+            "retried_chunks": self.retried_chunks,
+            "recovered_chunks": self.recovered_chunks,
+            "dropped_chunks": list(self.dropped_chunks),
+            "coverage": self.coverage,
+            "cancelled_chunks": self.cancelled_chunks,
+            "duplicate_chunks": self.duplicate_chunks,
+            "packed_requests": self.packed_requests,
+            "json_parsing": self.parse_stats.to_dict(),
+        }
+
+    def _sample_chunks(self, chunks: List[str]) -> str:
+        """
+        Picks evenly spaced chunks and joins them, stopping at ONTOLOGY_SAMPLE_TOKENS.
+        """
+        if len(chunks) <= ONTOLOGY_SAMPLE_CHUNKS:
+            picked = chunks
+        else:
+            step = len(chunks) / ONTOLOGY_SAMPLE_CHUNKS
+            picked = [chunks[int(i * step)] for i in range(ONTOLOGY_SAMPLE_CHUNKS)]
+
+        sample = []
+        budget = ONTOLOGY_SAMPLE_TOKENS
+        for chunk in picked:
+            tokens = self._tiktoken_len(chunk)
+            if sample and tokens > budget:
+                break
+            sample.append(chunk)
+            budget -= tokens
+        return "\n\n".join(sample)
+
+    async def _derive_node_types(self, chunks: List[str]) -> str | None:
+        """
+        Runs the ontology chain once over a sample of chunks and returns the raw node types.
+        Returns None on failure so chunks fall back to deriving their own ontology.
+        """
+        if not chunks:
+            return None
+
+        sample = self._sample_chunks(chunks)
+        cache_key = self._cache_key("ontology", sample)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.ontology_cache_hits += 1
+                return cached.get("node_types")
+            self.ontology_cache_misses += 1
+
+        try:
+            response = await self._ainvoke(self.ontology_extraction_chain, {"text_chunk": sample})
+            self._store_cached_result(cache_key, {"node_types": response.content})
+            return response.content
+        except Exception as e:
+            logger.error(f"Error deriving shared ontology, falling back to per-chunk ontology: {e}")
+            logger.debug(traceback.format_exc())
+            return None
     
+    async def _process_csv_table(self, table: pd.DataFrame, text_title) -> dict | None:
+        """
+        Maps a table straight to a graph dict: entity and relationship columns come from
+        _derive_csv_schema (or the column heuristic), then nodes and edges are built with
+        vectorized pandas operations rather than per-chunk LLM calls.
+        """
+        schema = await self._derive_csv_schema(table) if self.csv_mode == "schema" else None
+        if schema is None:
+            schema = infer_csv_schema(table)
+        if not schema["nodes"]:
+            logger.warning(f"No entity columns found in table '{text_title}'. Skipping.")
+            return None
+        try:
+            return await asyncio.to_thread(csv_to_graph_dict, table, schema, text_title)
+        except Exception as e:
+            logger.error(f"Error mapping table '{text_title}' to a graph: {e}")
+            logger.debug(traceback.format_exc())
+            return None
+
+    async def _derive_csv_schema(self, table: pd.DataFrame) -> dict | None:
+        """
+        Asks the LLM once which columns hold entities and how they relate, from the header
+        and a few sample rows. Returns None on failure so the column heuristic is used.
+        """
+        sample = csv_sample(table)
+        cache_key = self._cache_key("csv_schema", sample)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return validate_csv_schema(cached, table.columns)
+
+        try:
+            response = await self._ainvoke_json("csv_schema", CSV_SCHEMA_PROMPT_TEMPLATE, {"sample": sample})
+            schema, _ = parse_llm_json(response.content)
+        except Exception as e:
+            logger.error(f"Error deriving CSV schema, falling back to column heuristics: {e}")
+            logger.debug(traceback.format_exc())
+            return None
+
+        validated = validate_csv_schema(schema, table.columns)
+        if validated is None:
+            logger.warning("LLM CSV schema did not reference any known column, falling back to column heuristics.")
+            return None
+        self._store_cached_result(cache_key, schema)
+        return validated
+
     async def create_associational_nodes(self, text: str, text_title) -> GraphDocument:
         """
         Orchestrates the creation of the knowledge graph from raw text,
@@ -205,19 +950,17 @@ class AssociationalOntologyCreator:
 
         logger.info(f"Text split into {len(chunks)} chunks for processing.")
         
-        sem = asyncio.Semaphore(10)
-
         # First extract nodes
-        node_tasks = [self.limited_process_chunk_nodes_relationships(sem, chunk, text_title) for chunk in chunks]
-        node_results = await asyncio.gather(*node_tasks)
-
-        valid_node_results = [res for res in node_results if res is not None]
+        node_tasks = [self.limited_process_chunk_nodes_relationships(chunk, text_title) for chunk in chunks]
+        merger = self.new_merger()
+        valid_count = await self._merge_as_completed(node_tasks, merger)
+        self._log_run_stats()
 
-        if not valid_node_results:
+        if not valid_count:
             logger.warning("No valid node results were returned from the LLM. Cannot create graph.")
             return GraphDocument(nodes=[], relationships=[], source=None)
 
-        return self.merge_graph_documents(valid_node_results)
+        return merger.to_graph_document()
     
 
         # # Then extract relationships using the extracted nodes
@@ -235,58 +978,183 @@ class AssociationalOntologyCreator:
         # return self.merge_graph_documents(combined_results)
 
 
-    async def _process_chunk_with_llm_ontology_graph(self, text_chunk: str, text_title) -> dict | None:
+    def _cache_key(self, pipeline: str, text_chunk: str) -> str:
+        return ChunkResultCache.make_key(
+            text_chunk, self.llm_name, self.api_base, PROMPT_VERSION, self.llm_temperature, pipeline=pipeline
+        )
+
+    def _get_cached_result(self, cache_key: str, text_title) -> dict | None:
+        """
+        Returns the cached graph dict for a chunk, re-labelled with the current document name.
+        """
+        if self.cache is None:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            self.cache_misses += 1
+            return None
+        self.cache_hits += 1
+        for item in cached.get("nodes", []) + cached.get("relationships", []):
+            if isinstance(item, dict):
+                item["document"] = text_title
+        return cached
+
+    def _store_cached_result(self, cache_key: str, parsed: dict | None) -> None:
+        if self.cache is not None and parsed is not None:
+            self.cache.set(cache_key, parsed)
+
+    def _log_run_stats(self, dedup: ChunkDeduplicator | None = None):
+        if dedup is not None:
+            self.duplicate_chunks += dedup.duplicates
+            logger.info(f"Near-duplicate chunks reused: {self.duplicate_chunks}.")
+        if self.pack_small_chunks:
+            logger.info(f"Packed requests for short chunks: {self.packed_requests}.")
+        if self.cache is not None:
+            logger.info(f"LLM chunk cache: {self.cache_hits} hits, {self.cache_misses} misses.")
+            logger.info(f"LLM ontology cache: {self.ontology_cache_hits} hits, {self.ontology_cache_misses} misses.")
+        logger.info(f"LLM response parsing: {self.parse_stats.to_dict()}")
+        logger.info(f"LLM rate limiter: {self.rate_limiter.stats()}")
+
+    async def _process_chunk_with_llm_ontology_graph(self, text_chunk: str, text_title, node_types: str | None = None,
+                                                     strict: bool = False) -> dict | None:
         """
         Processes a single chunk of text with the LLM asynchronously.
+        When node_types is given the per-chunk ontology call is skipped.
+        strict uses the JSON-only retry prompt, see _retry_failed_chunks.
         """
         # first remove stop words from chunk
 
         # text_chunk = nltkStopRemoval(text_chunk)
 
         try:
-            response1 = await self.ontology_extraction_chain.ainvoke({"text_chunk": text_chunk})
-            response2 = await self.graph_extraction_chain.ainvoke({"text_chunk": text_chunk, "node_types": response1.content})
+            pipeline = "ontology_graph" if node_types is None else f"graph:{node_types}"
+            if strict:
+                pipeline = f"strict_{pipeline}"
+            cache_key = self._cache_key(pipeline, text_chunk)
+            cached = self._get_cached_result(cache_key, text_title)
+            if cached is not None:
+                return cached
+
+            if node_types is None:
+                response1 = await self._ainvoke(self.ontology_extraction_chain, {"text_chunk": text_chunk})
+                node_types = response1.content
+            chain_name, prompt = ("strict_graph", STRICT_GRAPH_PROMPT_TEMPLATE) if strict else ("graph", self.graph_prompt_template)
+            response2 = await self._ainvoke_json(chain_name, prompt, {"text_chunk": text_chunk, "node_types": node_types})
             
-            return self._parse_llm_response(response2.content, text_title)
+            parsed = self._parse_llm_response(response2.content, text_title)
+            self._store_cached_result(cache_key, parsed)
+            return parsed
         except Exception as e:
             logger.error(f"Error processing chunk: {e}")
             logger.debug(traceback.format_exc())
             return None
         
+    async def _process_packed_chunks(self, chunks: List[str], text_titles: List[Any],
+                                     node_types: str | None = None) -> List[dict | None]:
+        """
+        Extracts several short chunks with one ontology and one graph call, then splits
+        the response into one graph dict per chunk, labelled with that chunk's document.
+        Results are cached per chunk rather than per pack, since which chunks share a pack
+        depends on how concurrent reads interleave; only the chunks missing from the cache
+        are sent.
+        """
+        try:
+            pipeline = "packed_segment" if node_types is None else f"packed_segment:{node_types}"
+            cache_keys = [self._cache_key(pipeline, chunk) for chunk in chunks]
+            results = [self._get_cached_result(cache_key, text_title)
+                       for cache_key, text_title in zip(cache_keys, text_titles)]
+            missing = [i for i, result in enumerate(results) if result is None]
+            if not missing:
+                return results
+
+            packed_text = pack_text([chunks[i] for i in missing])
+            self.packed_requests += 1
+            if node_types is None:
+                response1 = await self._ainvoke(self.ontology_extraction_chain, {"text_chunk": packed_text})
+                node_types = response1.content
+            response2 = await self._ainvoke_json("packed_graph", PACKED_GRAPH_PROMPT_TEMPLATE,
+                                                 {"text_chunk": packed_text, "node_types": node_types})
+            parsed = self._parse_llm_response(response2.content, None)
+            if parsed is None:
+                return results
+
+            for i, result in zip(missing, split_packed_result(parsed, [chunks[i] for i in missing])):
+                for item in result["nodes"] + result["relationships"]:
+                    item["document"] = text_titles[i]
+                self._store_cached_result(cache_keys[i], result)
+                results[i] = result
+            return results
+        except Exception as e:
+            logger.error(f"Error processing packed chunks: {e}")
+            logger.debug(traceback.format_exc())
+            return [None] * len(chunks)
+
     async def _process_chunk_with_llm_nodes_relationships(self, text_chunk: str, text_title) -> dict | None:
         """
         Processes a single chunk of text with the nodes LLM asynchronously.
         """
         try:
-            response1 = await self.nodes_extraction_chain.ainvoke({"text_chunk": text_chunk})
-            response2 = await self.relationships_extraction_chain.ainvoke({"text_chunk": text_chunk, "nodes": response1.content})
+            cache_key = self._cache_key("nodes_relationships", text_chunk)
+            cached = self._get_cached_result(cache_key, text_title)
+            if cached is not None:
+                return cached
+
+            response1 = await self._ainvoke(self.nodes_extraction_chain, {"text_chunk": text_chunk})
+            response2 = await self._ainvoke_json("relationships", self.relationships_prompt_template,
+                                                 {"text_chunk": text_chunk, "nodes": response1.content})
 
-            return self._parse_llm_response(response2.content, text_title)
+            parsed = self._parse_llm_response(response2.content, text_title)
+            self._store_cached_result(cache_key, parsed)
+            return parsed
         except Exception as e:
             logger.error(f"Error processing chunk: {e}")
             logger.debug(traceback.format_exc())
             return None
 
-    async def limited_process_chunk_nodes_relationships(self, sem, chunk, text_title):
-        async with sem:
-            return await self._process_chunk_with_llm_nodes_relationships(chunk, text_title)
+    async def _ainvoke(self, chain, inputs: dict):
+        """
+        Invokes a chain through the provider's shared rate limiter, which bounds
+        concurrency and retries 429s and transient errors with backoff.
+        """
+        estimated_tokens = PROMPT_OVERHEAD_TOKENS + 2 * count_tokens(inputs.get("text_chunk", ""))
+        return await self.rate_limiter.run(lambda: chain.ainvoke(inputs), estimated_tokens=estimated_tokens,
+                                           deadline=self.deadline_at)
+
+    async def _ainvoke_json(self, chain_name: str, prompt, inputs: dict):
+        """
+        Invokes a JSON-producing chain with the provider's JSON mode when available. If the
+        provider rejects response_format, JSON mode is switched off for this client and the
+        call is repeated with the plain chain.
+        """
+        json_chain = get_chain(chain_name, prompt, json_mode=True, **self.llm_settings)
+        if json_chain is not None:
+            try:
+                return await self._ainvoke(json_chain, inputs)
+            except Exception as e:
+                if not is_json_mode_error(e):
+                    raise
+                if disable_json_mode(**self.llm_settings):
+                    logger.warning(f"Provider rejected JSON mode, falling back to plain output: {e}")
+        return await self._ainvoke(get_chain(chain_name, prompt, **self.llm_settings), inputs)
+
+    async def limited_process_chunk_nodes_relationships(self, chunk, text_title):
+        # Concurrency is bounded per LLM call by self.rate_limiter
+        return await self._process_chunk_with_llm_nodes_relationships(chunk, text_title)
         
-    async def limited_process_chunk_ontology_graphs(self, sem, chunk, text_title):
-        async with sem:
-            return await self._process_chunk_with_llm_ontology_graph(chunk, text_title)
+    async def limited_process_chunk_ontology_graphs(self, chunk, text_title, node_types=None):
+        # Concurrency is bounded per LLM call by self.rate_limiter
+        return await self._process_chunk_with_llm_ontology_graph(chunk, text_title, node_types=node_types)
 
     def _parse_llm_response(self, response_text: str, text_title) -> dict | None:
         """
-        Parses the LLM's raw string response into a dictionary,
-        handling malformed JSON with json-repair.
+        Parses the LLM's raw string response into a dictionary. Strict parsing is tried
+        first and json-repair only runs when it fails; the outcome is counted in parse_stats.
         """
 
         parsed_data = None
 
         try:
-            # Use json-repair to fix common LLM JSON errors, like unquoted keys
-            repaired_json_str = repair_json(response_text)
-            parsed_data = json.loads(repaired_json_str)
+            parsed_data, outcome = parse_llm_json(response_text)
 
             if not isinstance(parsed_data, dict):
                 raise ValueError("Parsed JSON is not a dictionary.")
@@ -295,16 +1163,23 @@ class AssociationalOntologyCreator:
             if "nodes" not in parsed_data or "relationships" not in parsed_data:
                 raise ValueError("JSON must contain 'nodes' and 'relationships' keys.")
             
-            for node in parsed_data.get("nodes", []):
-                node["document"] = text_title
+            for item in parsed_data.get("nodes", []) + parsed_data.get("relationships", []):
+                if isinstance(item, dict):
+                    item["document"] = text_title
             
+            self._record_parse(outcome)
             return parsed_data
         except Exception as e:
+            self._record_parse(PARSE_FAILED)
             logger.error(f"Failed to parse or repair JSON response: {e}")
-            print(parsed_data)
+            logger.debug(f"Parsed data: {parsed_data}")
             logger.debug(f"Original response: {response_text}")
             return None
 
+    def _record_parse(self, outcome: str):
+        self.parse_stats.record(outcome)
+        get_parse_stats().record(outcome)
+
     @staticmethod
     def merge_graph_documents(gd_dicts: List[Dict[str, Any]]) -> GraphDocument:
         """
@@ -312,72 +1187,11 @@ class AssociationalOntologyCreator:
         This method de-duplicates nodes and merges relationships.
         """
         logger.info(f"Starting merge_graph_documents with {len(gd_dicts)} documents.")
-        
-        all_nodes = {}
-        all_relationships = []
 
-        # Pass 1: Collect all nodes from all documents
+        merger = IncrementalGraphMerger(normalize_id=EntityResolver().resolve)
         for gd_dict in gd_dicts:
-            if not isinstance(gd_dict, dict):
-                logger.warning(f"Received non-dictionary item in gd_dicts: {gd_dict}. Skipping.")
-                continue
-
-            for node_data in gd_dict.get("nodes", []):
-                if "id" in node_data and "type" in node_data:
-                    properties = {}
-                    if "document" in node_data:
-                        properties["document"] = {node_data["document"]}
-                    
-                    node = Node(
-                        id=node_data["id"],
-                        type=node_data["type"],
-                        properties=properties
-                    )
-                    if node.id in all_nodes:
-                        #all nodes should have a document so no need to protect this
-                        all_nodes[node.id].properties["document"].add(node_data["document"])
-                    else:
-                        all_nodes[node.id] = node
-                else:
-                    logger.warning(f"Skipping malformed node data: {node_data}")
-
-        # Pass 2: Collect all relationships, now that all nodes are available
-        for gd_dict in gd_dicts:
-            if not isinstance(gd_dict, dict):
-                continue
-
-            for rel_data in gd_dict.get("relationships", []):
-                try:
-                    source_id = rel_data.get("source")
-                    target_id = rel_data.get("target")
-                    rel_type = rel_data.get("type")
-
-                    # Explicitly check that source and target nodes exist in our set of all_nodes
-                    if source_id in all_nodes and target_id in all_nodes:
-                        source_node = all_nodes[source_id]
-                        target_node = all_nodes[target_id]
-                        
-                        # Use a try...except block to gracefully handle Pydantic validation errors
-                        try:
-                            relationship = Relationship(
-                                source=source_node,
-                                target=target_node,
-                                type=rel_type
-                            )
-                            all_relationships.append(relationship)
-                        except Exception as pydantic_error:
-                            logger.warning(f"Failed to create Pydantic Relationship object: {rel_data}. Error: {pydantic_error}")
-                            continue
-                    else:
-                        logger.warning(f"Skipping relationship due to missing node: {rel_data}")
-                except Exception as e:
-                    logger.error(f"Error processing relationship data: {rel_data}. Error: {e}")
-                    continue
-        
-        logger.info(f"Merged graph contains {len(all_nodes)} nodes and {len(all_relationships)} relationships.")
-        # Corrected line to add the 'source' field, which is required by GraphDocument
-        source_document = Document(page_content="User provided content", metadata={"type": "user_input"}) #used to track where graph comes from/which document
-        return GraphDocument(nodes=list(all_nodes.values()), relationships=all_relationships, source=source_document)
+            merger.add(gd_dict)
+        return merger.to_graph_document()
 
 
 # --- For testing purposes only ---
@@ -0,0 +1,132 @@
+# knowledge_graph_project/src/chunk_dedup.py
+import asyncio
+import copy
+import hashlib
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Chunks whose 64-bit SimHash fingerprints differ in at most this many bits are duplicates
+SIMHASH_MAX_DISTANCE = 4
+SHINGLE_SIZE = 3
+
+_WORD = re.compile(r"\w+")
+
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> int:
+    """
+    Returns the 64-bit SimHash of text over lower-cased word shingles. Texts that share
+    most of their shingles get fingerprints a few bits apart.
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) <= shingle_size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    # Each fingerprint bit is the majority vote of that bit across shingle hashes
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+
+class NearDuplicateIndex:
+    """
+    Clusters texts by SimHash Hamming distance.
+
+    Fingerprints are split into max_distance + 1 bit bands; by the pigeonhole principle
+    two fingerprints within max_distance bits agree exactly on at least one band, so
+    only texts sharing a band bucket are compared.
+    """
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max(0, min(max_distance, 63))
+        bands = self.max_distance + 1
+        self._band_bounds = [(i * 64 // bands, (i + 1) * 64 // bands) for i in range(bands)]
+        self._fingerprints: List[int] = []
+        self._buckets: Dict[Tuple[int, int], List[int]] = {}
+
+    def _band_keys(self, fingerprint: int):
+        for band, (start, end) in enumerate(self._band_bounds):
+            yield band, (fingerprint >> start) & ((1 << (end - start)) - 1)
+
+    def add(self, text: str) -> Tuple[int, bool]:
+        """
+        Returns (cluster_id, is_new). A text within max_distance bits of an earlier one
+        joins that text's cluster; otherwise it starts a new cluster.
+        """
+        fingerprint = simhash(text)
+        band_keys = list(self._band_keys(fingerprint))
+        for band_key in band_keys:
+            for cluster_id in self._buckets.get(band_key, ()):
+                if (fingerprint ^ self._fingerprints[cluster_id]).bit_count() <= self.max_distance:
+                    return cluster_id, False
+
+        cluster_id = len(self._fingerprints)
+        self._fingerprints.append(fingerprint)
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, []).append(cluster_id)
+        return cluster_id, True
+
+
+ChunkJob = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+
+
+def relabel_copy(result: Dict[str, Any], text_title) -> Dict[str, Any]:
+    """Returns a deep copy of a chunk result with every item attributed to text_title."""
+    result = copy.deepcopy(result)
+    for item in result.get("nodes", []) + result.get("relationships", []):
+        if isinstance(item, dict):
+            item["document"] = text_title
+    return result
+
+
+class ChunkDeduplicator:
+    """
+    Lets one LLM job run per near-duplicate cluster of chunks within a run. Later members of
+    a cluster wait for the representative's result and get a copy attributed to their
+    own document, so node and relationship "document" values stay correct.
+    """
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.index = NearDuplicateIndex(max_distance)
+        self.duplicates = 0
+        self._results: Dict[int, asyncio.Future] = {}
+        self._duplicate_titles: Dict[int, List[Any]] = {}
+
+    def claim(self, text_chunk: str, text_title) -> Tuple[int, Optional[ChunkJob]]:
+        """
+        Registers a chunk and returns (cluster_id, duplicate_job). duplicate_job is None for
+        the first chunk of a cluster, whose result must then be handed to publish();
+        otherwise it is a job that waits for that result. Must be called on the running
+        event loop, in the order chunks are scheduled.
+        """
+        cluster_id, is_new = self.index.add(text_chunk)
+        if is_new:
+            self._results[cluster_id] = asyncio.get_running_loop().create_future()
+            return cluster_id, None
+
+        self.duplicates += 1
+        self._duplicate_titles.setdefault(cluster_id, []).append(text_title)
+        future = self._results[cluster_id]
+
+        async def run_duplicate():
+            result = await asyncio.shield(future)
+            if result is None:
+                return None
+            return relabel_copy(result, text_title)
+        return cluster_id, run_duplicate
+
+    def duplicate_titles(self, cluster_id: int) -> List[Any]:
+        """Document names of the later members of a cluster, one per duplicate chunk."""
+        return list(self._duplicate_titles.get(cluster_id, ()))
+
+    def publish(self, cluster_id: int, result: Optional[Dict[str, Any]]):
+        future = self._results[cluster_id]
+        if not future.done():
+            future.set_result(result)
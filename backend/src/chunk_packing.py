@@ -0,0 +1,117 @@
+# knowledge_graph_project/src/chunk_packing.py
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Chunks shorter than this fraction of chunk_size are packed together into one request
+PACK_SMALL_CHUNK_RATIO = 0.5
+# More segments per request make segment attribution less reliable
+PACK_MAX_SEGMENTS = 8
+
+SEGMENT_HEADER = "### SEGMENT {index}"
+# Tokens added per segment by its header line
+_SEGMENT_HEADER_TOKENS = 8
+
+
+def pack_text(chunks: List[str]) -> str:
+    """Joins chunks under numbered segment headers, starting at 1."""
+    return "\n\n".join(f"{SEGMENT_HEADER.format(index=i)}\n{chunk}" for i, chunk in enumerate(chunks, start=1))
+
+
+class ChunkPacker:
+    """
+    Collects short chunks into packs of at most budget_tokens and PACK_MAX_SEGMENTS
+    segments. Chunks with different keys (e.g. different node types) never share a pack.
+    """
+
+    def __init__(self, budget_tokens: int):
+        self.budget_tokens = budget_tokens
+        self._packs: Dict[Hashable, List[Any]] = {}
+        self._pack_tokens: Dict[Hashable, int] = {}
+
+    def is_small(self, tokens: int) -> bool:
+        return tokens < self.budget_tokens * PACK_SMALL_CHUNK_RATIO
+
+    def add(self, key: Hashable, member: Any, tokens: int) -> Optional[List[Any]]:
+        """
+        Adds a member to the open pack for key. Returns the previous pack if the member
+        did not fit and sealed it, otherwise None.
+        """
+        tokens += _SEGMENT_HEADER_TOKENS
+        sealed = None
+        pack = self._packs.get(key)
+        if pack and (self._pack_tokens[key] + tokens > self.budget_tokens or len(pack) >= PACK_MAX_SEGMENTS):
+            sealed = self._packs.pop(key)
+            del self._pack_tokens[key]
+        self._packs.setdefault(key, []).append(member)
+        self._pack_tokens[key] = self._pack_tokens.get(key, 0) + tokens
+        return sealed
+
+    def seal_where(self, predicate: Callable[[Any], bool]) -> List[Tuple[Hashable, List[Any]]]:
+        """Seals and returns (key, pack) for the open packs with a member matching predicate."""
+        keys = [key for key, pack in self._packs.items() if any(predicate(member) for member in pack)]
+        sealed = []
+        for key in keys:
+            del self._pack_tokens[key]
+            sealed.append((key, self._packs.pop(key)))
+        return sealed
+
+    def flush(self) -> List[Tuple[Hashable, List[Any]]]:
+        """Seals and returns (key, pack) for every open pack."""
+        return self.seal_where(lambda member: True)
+
+
+def _segment_index(value: Any, segment_count: int) -> Optional[int]:
+    try:
+        index = int(str(value).strip().split()[-1]) - 1
+    except (ValueError, IndexError):
+        return None
+    return index if 0 <= index < segment_count else None
+
+
+def split_packed_result(parsed: Dict[str, Any], segments: List[str]) -> List[Dict[str, list]]:
+    """
+    Splits one parsed graph dict for a pack into one graph dict per segment, using each
+    item's "segment" field. Nodes without a usable segment go to the segments whose text
+    mentions their id; relationships without one follow their source node, or else their
+    target. Items that cannot be placed this way are left out rather than credited to
+    segments, and so documents, they may not come from.
+    """
+    results = [{"nodes": [], "relationships": []} for _ in segments]
+    lowered = [segment.lower() for segment in segments]
+    node_segments: Dict[str, List[int]] = {}
+
+    for node in parsed.get("nodes", []):
+        if not isinstance(node, dict):
+            continue
+        index = _segment_index(node.pop("segment", None), len(segments))
+        if index is not None:
+            indexes = [index]
+        else:
+            node_text = str(node.get("id", "")).lower()
+            indexes = [i for i, text in enumerate(lowered) if node_text and node_text in text]
+        node_segments.setdefault(str(node.get("id")), []).extend(indexes)
+        for i in indexes:
+            results[i]["nodes"].append(dict(node))
+
+    for rel in parsed.get("relationships", []):
+        if not isinstance(rel, dict):
+            continue
+        index = _segment_index(rel.pop("segment", None), len(segments))
+        if index is not None:
+            indexes = [index]
+        else:
+            indexes = node_segments.get(str(rel.get("source"))) or node_segments.get(str(rel.get("target"))) or []
+        for i in dict.fromkeys(indexes):
+            results[i]["relationships"].append(dict(rel))
+
+    return results
+
+
+def combine_results(results: List[Optional[Dict[str, list]]]) -> Optional[Dict[str, list]]:
+    """Concatenates per-segment graph dicts into one, or None if every segment failed."""
+    valid = [result for result in results if result is not None]
+    if not valid:
+        return None
+    return {
+        "nodes": [node for result in valid for node in result.get("nodes", [])],
+        "relationships": [rel for result in valid for rel in result.get("relationships", [])],
+    }
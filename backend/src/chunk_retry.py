@@ -0,0 +1,67 @@
+# knowledge_graph_project/src/chunk_retry.py
+import os
+import re
+import time
+from typing import Any, Dict
+
+# Failed chunks re-extracted per run, and the time the whole retry stage may take
+RETRY_MAX_CHUNKS = int(os.getenv("KG_RETRY_MAX_CHUNKS", "20"))
+RETRY_TIME_BUDGET_SECONDS = float(os.getenv("KG_RETRY_TIME_BUDGET_SECONDS", "120"))
+# A failed chunk is re-split into pieces of chunk_size // RETRY_SPLIT_FACTOR tokens
+RETRY_SPLIT_FACTOR = 2
+RETRY_MIN_CHUNK_SIZE = 200
+
+DROP_REASON_FAILED = "extraction failed"
+DROP_REASON_RETRY_FAILED = "extraction failed after retry"
+DROP_REASON_BUDGET = "retry budget exhausted"
+DROP_REASON_TIMEOUT = "retry time budget exhausted"
+DROP_REASON_DEADLINE = "deadline reached before retry"
+
+_PREVIEW_CHARS = 120
+_WHITESPACE = re.compile(r"\s+")
+
+
+class RetryBudget:
+    """
+    Per-run cap on how many failed chunks are re-extracted and how long the retry
+    stage may run. The clock starts at the first take().
+    """
+
+    def __init__(self, max_chunks: int = RETRY_MAX_CHUNKS,
+                 time_budget_seconds: float = RETRY_TIME_BUDGET_SECONDS):
+        self.max_chunks = max_chunks
+        self.time_budget_seconds = time_budget_seconds
+        self.used = 0
+        self._deadline = None
+
+    def remaining_seconds(self) -> float:
+        if self._deadline is None:
+            return self.time_budget_seconds
+        return max(0.0, self._deadline - time.monotonic())
+
+    def take(self) -> bool:
+        """Claims one retry. Returns False once either budget is spent."""
+        if self._deadline is None:
+            self._deadline = time.monotonic() + self.time_budget_seconds
+        if self.used >= self.max_chunks or self.remaining_seconds() <= 0:
+            return False
+        self.used += 1
+        return True
+
+
+def dropped_chunk_entry(text_chunk: str, text_title, reason: str, duplicates: int = 0) -> Dict[str, Any]:
+    """
+    Describes a chunk that is missing from the graph, for logs and API responses:
+    its document, size, a one-line preview, why it was dropped and how many
+    near-duplicate chunks went with it.
+    """
+    preview = _WHITESPACE.sub(" ", text_chunk).strip()
+    if len(preview) > _PREVIEW_CHARS:
+        preview = preview[:_PREVIEW_CHARS - 3] + "..."
+    return {
+        "document": str(text_title),
+        "chars": len(text_chunk),
+        "preview": preview,
+        "reason": reason,
+        "duplicates": duplicates,
+    }
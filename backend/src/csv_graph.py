@@ -0,0 +1,144 @@
+# knowledge_graph_project/src/csv_graph.py
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from langchain_core.prompts import ChatPromptTemplate
+
+logger = logging.getLogger(__name__)
+
+# "schema": one LLM call on the header and sample rows picks entity and relationship columns
+# "heuristic": columns are picked from dtypes and value lengths without any LLM call
+# "text": the table is flattened to text and extracted chunk by chunk like any document
+CSV_MODES = ("schema", "heuristic", "text")
+
+CSV_SAMPLE_ROWS = 20
+# Columns whose values are longer than this on average are free text, not entity names
+MAX_ENTITY_VALUE_LENGTH = 80
+MAX_ENTITY_COLUMNS = 10
+# Rows used to estimate value lengths of a column
+_LENGTH_SAMPLE_ROWS = 1000
+
+CSV_SCHEMA_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a sophisticated AI that designs knowledge graph schemas for tables. "
+     "Given the header and sample rows of a CSV file, decide which columns contain entities and how they relate. "
+     "Respond exclusively with a JSON object. "
+     "Do not add any additional text, markdown, or explanations."
+     "The JSON object must have two keys: 'nodes' and 'relationships'. "
+     "Each node must have a 'column' (an exact column name from the header) and a 'type' for the entities in that column. "
+     "Each relationship must have a 'source' column, a 'target' column, and a 'type'. Both columns must also be listed in 'nodes'. "
+     "Skip free-text, numeric measurement and date columns. "
+     "Relationships should be verbs or short phrases that describe the connection, like 'WORKS_AT', 'IS_A', 'LOCATED_IN', etc."),
+    ("user", "{sample}")
+])
+
+
+def csv_sample(df: pd.DataFrame) -> str:
+    """Returns the header and first CSV_SAMPLE_ROWS rows as CSV text for the schema prompt."""
+    return df.head(CSV_SAMPLE_ROWS).to_csv(index=False)
+
+
+def _type_name(column: Any) -> str:
+    words = re.split(r"[^0-9A-Za-z]+", str(column))
+    return "".join(word[:1].upper() + word[1:] for word in words if word) or "Entity"
+
+
+def _relationship_type(column: Any) -> str:
+    words = re.split(r"[^0-9A-Za-z]+", str(column))
+    return "HAS_" + ("_".join(word.upper() for word in words if word) or "VALUE")
+
+
+def infer_csv_schema(df: pd.DataFrame) -> Dict[str, List[Dict[str, str]]]:
+    """
+    Picks entity columns from dtypes and value lengths: non-numeric columns with short
+    values and at least two distinct values. The column with the most distinct values is
+    treated as the row's subject and linked to every other entity column.
+    """
+    candidates = []
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+            continue
+        sample = series.dropna().head(_LENGTH_SAMPLE_ROWS).astype(str)
+        if sample.empty or sample.str.len().mean() > MAX_ENTITY_VALUE_LENGTH:
+            continue
+        distinct = series.nunique(dropna=True)
+        if distinct < 2:
+            continue
+        candidates.append((column, distinct))
+
+    candidates = candidates[:MAX_ENTITY_COLUMNS]
+    nodes = [{"column": column, "type": _type_name(column)} for column, _ in candidates]
+    relationships = []
+    if len(candidates) > 1:
+        subject = max(candidates, key=lambda candidate: candidate[1])[0]
+        relationships = [
+            {"source": subject, "target": column, "type": _relationship_type(column)}
+            for column, _ in candidates if column != subject
+        ]
+    return {"nodes": nodes, "relationships": relationships}
+
+
+def validate_csv_schema(schema: Any, columns) -> Optional[Dict[str, List[Dict[str, str]]]]:
+    """
+    Keeps the schema entries that reference real columns. Returns None if no entity
+    column is left, so callers can fall back to infer_csv_schema.
+    """
+    if not isinstance(schema, dict):
+        return None
+    by_name = {str(column): column for column in columns}
+
+    nodes = []
+    for spec in schema.get("nodes") or []:
+        if isinstance(spec, dict) and str(spec.get("column")) in by_name and spec.get("type"):
+            nodes.append({"column": by_name[str(spec["column"])], "type": str(spec["type"])})
+    if not nodes:
+        return None
+
+    node_columns = {spec["column"] for spec in nodes}
+    relationships = []
+    for spec in schema.get("relationships") or []:
+        if not isinstance(spec, dict) or not isinstance(spec.get("type"), str) or not spec["type"].strip():
+            continue
+        source = by_name.get(str(spec.get("source")))
+        target = by_name.get(str(spec.get("target")))
+        if source in node_columns and target in node_columns and source != target:
+            relationships.append({"source": source, "target": target, "type": spec["type"]})
+    return {"nodes": nodes, "relationships": relationships}
+
+
+def csv_to_graph_dict(df: pd.DataFrame, schema: Dict[str, List[Dict[str, str]]], document) -> Dict[str, list]:
+    """
+    Builds one chunk-style graph dict for the whole table with vectorized pandas operations.
+    Nodes are the distinct values of each entity column; relationships are the distinct
+    (source, target) value pairs per row, with "count" holding the number of rows.
+    """
+    cleaned: Dict[Any, pd.Series] = {}
+
+    def values(column) -> pd.Series:
+        if column not in cleaned:
+            series = df[column].astype("string").str.strip()
+            cleaned[column] = series.mask(series == "")
+        return cleaned[column]
+
+    nodes = []
+    for spec in schema["nodes"]:
+        nodes.extend(
+            {"id": value, "type": spec["type"], "document": document}
+            for value in values(spec["column"]).dropna().unique()
+        )
+
+    relationships = []
+    for spec in schema["relationships"]:
+        pairs = pd.DataFrame({"source": values(spec["source"]), "target": values(spec["target"])}).dropna()
+        counts = pairs.groupby(["source", "target"], sort=False).size()
+        relationships.extend(
+            {"source": source, "target": target, "type": spec["type"], "count": int(count), "document": document}
+            for (source, target), count in counts.items()
+        )
+
+    logger.info(f"Table '{document}' mapped to {len(nodes)} nodes and {len(relationships)} relationships "
+                f"from {len(df)} rows.")
+    return {"nodes": nodes, "relationships": relationships}
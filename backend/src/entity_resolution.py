@@ -0,0 +1,152 @@
+# knowledge_graph_project/src/entity_resolution.py
+import hashlib
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.text_utils import cleanUpText
+
+_SEPARATORS = re.compile(r"[\s_\-]+")
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def _singular(word: str) -> str:
+    """
+    Conservative English plural stripping, so "companies" and "company" fold together
+    without mangling words like "class", "status" or "analysis".
+    """
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "ches", "shes", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def canonicalize(text: Any) -> str:
+    """
+    Folds case, whitespace, underscores and hyphens and strips a plural from the last word.
+    Two ids that cleanUpText renders identically always share a canonical key.
+    """
+    folded = _SEPARATORS.sub(" ", cleanUpText(text).lower()).strip()
+    if not folded:
+        return folded
+    words = folded.split(" ")
+    words[-1] = _singular(words[-1])
+    return " ".join(words)
+
+
+def _char_ngrams(text: str, n: int) -> Set[str]:
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class EntityResolver:
+    """
+    Alias index that maps raw node ids to one resolved id per entity.
+
+    Exact resolution goes through canonicalize(). Optional fuzzy resolution compares
+    character n-gram sets, using MinHash signatures split into LSH bands as blocking
+    keys so only ids that share a band bucket are ever compared (no all-pairs scan).
+    """
+
+    def __init__(self,
+                 fuzzy: bool = False,
+                 similarity_threshold: float = 0.8,
+                 ngram_size: int = 3,
+                 num_hashes: int = 32,
+                 bands: int = 16,
+                 min_fuzzy_length: int = 5):
+        """
+        Args:
+            fuzzy (bool): Also merge ids whose n-gram Jaccard similarity reaches similarity_threshold.
+            ngram_size (int): Character n-gram size used for fuzzy matching.
+            num_hashes (int): MinHash signature length; must be divisible by bands.
+            bands (int): Number of LSH bands. More bands find more candidates at lower similarity.
+            min_fuzzy_length (int): Shorter canonical keys are only resolved exactly.
+        """
+        if num_hashes % bands:
+            raise ValueError("num_hashes must be divisible by bands")
+        self.fuzzy = fuzzy
+        self.similarity_threshold = similarity_threshold
+        self.ngram_size = ngram_size
+        self.bands = bands
+        self.rows_per_band = num_hashes // bands
+        self.min_fuzzy_length = min_fuzzy_length
+
+        self._alias_to_id: Dict[str, str] = {}
+        self._canonical_to_id: Dict[str, str] = {}
+        self._ngrams: Dict[str, Set[str]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+
+        # Fixed seeds keep fuzzy decisions reproducible between runs
+        self._hash_params = [
+            (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME | 1,
+             int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME)
+            for i in range(num_hashes)
+        ]
+
+    def resolve(self, raw_id: Any) -> str:
+        """
+        Returns the resolved id for a raw node id, registering it as a new entity if needed.
+        New entities are named by the cleanUpText form of their first alias.
+        """
+        raw = str(raw_id)
+        resolved = self._alias_to_id.get(raw)
+        if resolved is not None:
+            return resolved
+
+        key = canonicalize(raw)
+        resolved = self._canonical_to_id.get(key)
+        if resolved is None and self.fuzzy and len(key) >= self.min_fuzzy_length:
+            resolved = self._fuzzy_match(key)
+            if resolved is not None:
+                self._canonical_to_id[key] = resolved
+        if resolved is None:
+            resolved = cleanUpText(raw)
+            self._canonical_to_id[key] = resolved
+            if self.fuzzy and len(key) >= self.min_fuzzy_length:
+                self._index(key)
+
+        self._alias_to_id[raw] = resolved
+        return resolved
+
+    def aliases(self) -> Dict[str, Set[str]]:
+        """Returns resolved id -> raw aliases seen so far."""
+        grouped: Dict[str, Set[str]] = {}
+        for alias, resolved in self._alias_to_id.items():
+            grouped.setdefault(resolved, set()).add(alias)
+        return grouped
+
+    def _signature(self, grams: Set[str]) -> List[int]:
+        gram_hashes = [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big") for g in grams]
+        return [min((a * h + b) % _MERSENNE_PRIME for h in gram_hashes) for a, b in self._hash_params]
+
+    def _band_keys(self, signature: List[int]):
+        for band in range(self.bands):
+            start = band * self.rows_per_band
+            yield band, tuple(signature[start:start + self.rows_per_band])
+
+    def _index(self, key: str):
+        grams = _char_ngrams(key, self.ngram_size)
+        self._ngrams[key] = grams
+        for band_key in self._band_keys(self._signature(grams)):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def _fuzzy_match(self, key: str) -> Optional[str]:
+        grams = _char_ngrams(key, self.ngram_size)
+        candidates = set()
+        for band_key in self._band_keys(self._signature(grams)):
+            candidates.update(self._buckets.get(band_key, ()))
+
+        best_key, best_score = None, self.similarity_threshold
+        for candidate in candidates:
+            candidate_grams = self._ngrams[candidate]
+            score = len(grams & candidate_grams) / len(grams | candidate_grams)
+            if score >= best_score:
+                best_key, best_score = candidate, score
+        return self._canonical_to_id[best_key] if best_key is not None else None
@@ -1,6 +1,11 @@
 import pandas as pd
-import io
+import multiprocessing
+import os
+import tempfile
+import threading
 import warnings
+from typing import Iterator
+from concurrent.futures import ProcessPoolExecutor
 
 # Use pypdf as it is more robust for RAG/Graph applications
 # Ensure 'pypdf' is in your requirements.txt
@@ -11,6 +16,17 @@ except ImportError:
     pypdf_available = False
     print("Warning: 'pypdf' library not found. PDF reading will fail.")
 
+# PDFs with at least this many pages are extracted in parallel, in page ranges of PDF_PAGES_PER_TASK
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("KG_PDF_PARALLEL_MIN_PAGES", "40"))
+PDF_PAGES_PER_TASK = int(os.getenv("KG_PDF_PAGES_PER_TASK", "20"))
+PDF_WORKERS = int(os.getenv("KG_PDF_WORKERS", str(os.cpu_count() or 1)))
+
+_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+# Parsed PDFs kept per worker process, by temporary file path, for the ranges that follow
+_WORKER_PDF_READERS = 2
+_worker_pdf_readers = {}
+
 # --- For .doc/.docx files ---
 try:
     import docx
@@ -50,6 +66,99 @@ def read_csv_file(file_obj) -> pd.DataFrame | None:
         return None
 
 
+def _get_pdf_executor():
+    """
+    Returns the shared process pool for PDF page extraction, created on first use.
+    Uses the spawn start method because the server process runs threads.
+    """
+    global _pdf_executor
+    with _pdf_executor_lock:
+        if _pdf_executor is None:
+            _pdf_executor = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_executor
+
+
+def _worker_pdf_reader(pdf_path: str):
+    """The parsed PDF at pdf_path, read and parsed once per worker process."""
+    reader = _worker_pdf_readers.pop(pdf_path, None)
+    if reader is None:
+        reader = PdfReader(pdf_path)
+        while len(_worker_pdf_readers) >= _WORKER_PDF_READERS:
+            _worker_pdf_readers.pop(next(iter(_worker_pdf_readers)))
+    _worker_pdf_readers[pdf_path] = reader
+    return reader
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> list:
+    """Extracts the text of pages [start, end) in a worker process."""
+    reader = _worker_pdf_reader(pdf_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _iter_pages_parallel(pdf_bytes: bytes, page_count: int) -> Iterator[str]:
+    """
+    Yields page texts in order as each page range finishes in the process pool.
+    The PDF is written to a temporary file once and tasks only carry its path.
+    """
+    executor = _get_pdf_executor()
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+        pdf_file.write(pdf_bytes)
+    futures = []
+    try:
+        futures = [
+            executor.submit(_extract_page_range, pdf_file.name, start, min(start + PDF_PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, PDF_PAGES_PER_TASK)
+        ]
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        try:
+            os.remove(pdf_file.name)
+        except OSError:
+            pass
+
+
+def iter_pdf_pages(file_obj) -> Iterator[str]:
+    """
+    Yields the text of each non-empty PDF page, so callers can start on the first
+    pages while the rest are still being extracted.
+    Large PDFs are split into page ranges that are extracted across a process pool.
+    """
+    if not pypdf_available:
+        raise ImportError("'pypdf' is not installed.")
+
+    # Reset cursor to start is CRITICAL for pypdf
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+
+    reader = PdfReader(file_obj)
+    page_count = len(reader.pages)
+    next_page = 0
+
+    if page_count >= PDF_PARALLEL_MIN_PAGES and PDF_WORKERS > 1:
+        try:
+            if hasattr(file_obj, 'getvalue'):
+                pdf_bytes = file_obj.getvalue()
+            else:
+                file_obj.seek(0)
+                pdf_bytes = file_obj.read()
+            for content in _iter_pages_parallel(pdf_bytes, page_count):
+                next_page += 1
+                if content:
+                    yield content
+        except Exception as e:
+            print(f"Parallel PDF extraction failed at page {next_page}, continuing serially: {e}")
+
+    # Iterate over the pages not extracted in parallel
+    for page in reader.pages[next_page:]:
+        content = page.extract_text()
+        if content:
+            yield content
+
+
 def read_pdf_file(file_obj) -> str:
     """
     Reads content from a PDF file using pypdf.
@@ -59,18 +168,8 @@ def read_pdf_file(file_obj) -> str:
         return ""
         
     try:
-        # Reset cursor to start is CRITICAL for pypdf
-        if hasattr(file_obj, 'seek'):
-            file_obj.seek(0)
-            
-        reader = PdfReader(file_obj)
-        text = ""
-        
-        # Iterate over pages
-        for i, page in enumerate(reader.pages):
-            content = page.extract_text()
-            if content:
-                text += content + "\n"
+        # Build the text with a single join instead of repeated concatenation
+        text = "".join(content + "\n" for content in iter_pdf_pages(file_obj))
         
         print(f"Successfully extracted {len(text)} characters from PDF")
         return text
@@ -1,69 +1,15 @@
-import asyncio
-import os
+import json
 import traceback
 from typing import List
 
 from langchain_community.graphs.graph_document import GraphDocument
-from pyvis.network import Network
-from playwright.async_api import async_playwright
-from pathlib import Path
 
+from src.graph_export import export_graph_html, export_graphs_html
+from src.graph_layout import PRECOMPUTE_LAYOUT, force_directed_layout
+from src.graph_template import render_graph_html
+from src.text_utils import cleanUpText
 
-def visualize_graph(graph_document: GraphDocument) -> str | None:
-    """
-    Visualizes a knowledge graph using PyVis based on the extracted graph documents.
-    This function now expects to receive already processed GraphDocument objects.
-    """
-    
-    if not graph_document:
-        return None
-    
-    if not isinstance(graph_document, GraphDocument):
-        return None
-
-    net = Network(height="3000px", width="4000px", directed=True,
-                     notebook=False, bgcolor="#222222", font_color="white", filter_menu=False, cdn_resources='remote')
-
-    nodes = graph_document.nodes
-    relationships = graph_document.relationships
-
-    if not nodes and not relationships:
-        return None
-
-    node_dict = cleanNodes(nodes)
-
-    valid_edges = []
-    valid_node_ids = set()
-    for rel in relationships:
-        if hasattr(rel.source, 'id') and hasattr(rel.target, 'id'):
-            rel.source.id = cleanUpText(rel.source.id)
-            rel.target.id = cleanUpText(rel.target.id)
-            if rel.source.id in node_dict and rel.target.id in node_dict:   
-                node_dict[rel.target.id].properties['node_weight'] += 1
-                node_dict[rel.source.id].properties['edge_weight'] += 1
-                valid_edges.append(rel)
-                valid_node_ids.update([rel.source.id, rel.target.id])
-
-    for node_id in valid_node_ids:
-        node = node_dict[node_id]
-        try:
-            docString = ""
-            for doc in node.properties["document"]:
-                docString += doc + ' '
-            
-            net.add_node(node.id, label=node.id, title=docString, group=node.type, node_weight=node.properties['node_weight'],
-                          font={'size': 18, 'face': 'Arial', 'color': 'white', 'strokeWidth': 2, 'strokeColor': '#000000'})
-        except Exception as e:
-            continue
-
-    for rel in valid_edges:
-        try:
-            net.add_edge(rel.source.id, rel.target.id, label=rel.type.lower(), edge_weight=node_dict[rel.target.id].properties['edge_weight'],
-                          font={'size': 14, 'face': 'Arial', 'color': 'lightgray', 'strokeWidth': 1, 'strokeColor': '#000000'})
-        except Exception as e:
-            continue
-
-    net.set_options("""
+GRAPH_OPTIONS = """
         {
             "physics": {
                 "enabled": true,
@@ -109,297 +55,116 @@ def visualize_graph(graph_document: GraphDocument) -> str | None:
                 }
             }
         }
-    """)
-    
-    net.save_graph("temp_graph.html")
-    html_file = Path("temp_graph.html")
-    with open(html_file, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-
-    custom_filter_html = """
-    <div class="card" style="width: 100%; margin-bottom: 10px;">
-        <div class="card-header" style="background-color: #333; padding: 15px;">
-            <div style="display: flex; gap: 10px; align-items: center; flex-wrap: wrap;">
-                <select id="filterItem" style="padding: 8px; min-width: 150px;">
-                    <option value="node" selected>Node</option>
-                    <option value="edge">Edge</option>
-                </select>
-                <select id="filterProperty" style="padding: 8px; min-width: 150px;">
-                    <option value="">Select Property</option>
-                </select>
-                <select id="filterValue" multiple style="padding: 8px; min-width: 200px; height: 100px;">
-                    <option value="">Select a property first</option>
-                </select>
-                <button onclick="addCurrentFilter()" style="padding: 8px 20px; background-color: #007bff; color: white; border: none; cursor: pointer; border-radius: 4px;">Add Filter</button>
-                <button onclick="resetAllFilters()" style="padding: 8px 20px; background-color: #6c757d; color: white; border: none; cursor: pointer; border-radius: 4px;">Reset</button>
-            </div>
-            <div id="active-filters" style="margin-top:10px; color:white;"></div>
-        </div>
-    </div>
 """
-    
-    custom_filter_js = """
-<script>
-(function(){
-  let stabilizationFired = false;
-
-  document.addEventListener("DOMContentLoaded", function() {
-    const waitForNetwork = setInterval(() => {
-      const netReady = (typeof network !== "undefined");
-      const nodesReady = (typeof nodes !== "undefined");
-      const edgesReady = (typeof edges !== "undefined");
-
-      if (netReady && nodesReady && edgesReady) {
-        clearInterval(waitForNetwork);
-
-        // Set initial view after stabilization
-        network.once("stabilizationIterationsDone", () => {
-          stabilizationFired = true;
-          setInitialView();
-        });
-
-        network.on("stabilized", (params) => {
-          if (!stabilizationFired) {
-            setInitialView();
-          }
-        });
-
-        // Fallback in case stabilization events don't fire
-        setTimeout(() => {
-          if (!stabilizationFired) {
-            setInitialView();
-          }
-        }, 3000);
-
-        initFilterMenu();
-      }
-    }, 300);
-  });
-
-  function setInitialView() {
-    if (typeof network === "undefined") return;
-
-    // Set the initial view to coordinates (3036, 2620) with scale 0.50
-    network.moveTo({
-      position: { x: 3036, y: 2620 },
-      scale: 0.50,
-      animation: { duration: 800, easingFunction: "easeInOutQuad" }
-    });
-  }
-
-  function initFilterMenu() {
-    let filters = [];
-    let filter = { item: 'node', property: '', value: [] };
-
-    document.getElementById('filterItem').addEventListener('change', function() {
-      filter.item = this.value;
-      rebuildPropertyOptions();
-    });
-
-    document.getElementById('filterProperty').addEventListener('change', function() {
-      filter.property = this.value;
-      const valueSelect = document.getElementById('filterValue');
-      valueSelect.innerHTML = '<option value="">Loading...</option>';
-
-      if (!filter.property) {
-        valueSelect.innerHTML = '<option value="">Select a property first</option>';
-        return;
-      }
-
-      const allItems = (filter.item === 'node') ? nodes.get() : edges.get();
-      const uniqueValues = new Set();
-      allItems.forEach(item => {
-        const val = item[filter.property];
-        if (val !== undefined && val !== null) uniqueValues.add(String(val));
-      });
-
-      const sortedValues = Array.from(uniqueValues).sort((a, b) => {
-        const numA = parseFloat(a), numB = parseFloat(b);
-        if (!isNaN(numA) && !isNaN(numB)) return numA - numB;
-        return a.localeCompare(b);
-      });
-
-      valueSelect.innerHTML = '';
-      sortedValues.forEach(value => {
-        const option = document.createElement('option');
-        option.value = value;
-        option.textContent = value;
-        valueSelect.appendChild(option);
-      });
-    });
 
-    function rebuildPropertyOptions() {
-      const propertySelect = document.getElementById('filterProperty');
-      propertySelect.innerHTML = '<option value="">Select Property</option>';
-      const sample = (filter.item === 'node') ? nodes.get()[0] : edges.get()[0];
-      if (!sample) return;
-      Object.keys(sample).forEach(key => {
-        const opt = document.createElement('option');
-        opt.value = key;
-        opt.textContent = key;
-        propertySelect.appendChild(opt);
-      });
-    }
 
-    window.addCurrentFilter = function() {
-      const valueSelect = document.getElementById('filterValue');
-      filter.value = Array.from(valueSelect.selectedOptions).map(opt => opt.value);
-      if (!filter.property || filter.value.length === 0) {
-        alert('Please select a property and at least one value.');
-        return;
-      }
-
-      filters.push({ item: filter.item, property: filter.property, value: [...filter.value] });
-      applyFilters();
-      renderActiveFilters();
-    }
-
-    function applyFilters() {
-      const allNodes = nodes.get({ returnType: "Object" });
-      const allEdges = edges.get({ returnType: "Object" });
+def visualize_graph(graph_document: GraphDocument, precompute_layout: bool = PRECOMPUTE_LAYOUT) -> str | None:
+    """
+    Visualizes a knowledge graph as a vis-network HTML page, based on the extracted graph documents.
+    This function now expects to receive already processed GraphDocument objects.
+    """
+    vis_graph = build_vis_graph(graph_document, precompute_layout=precompute_layout)
+    if vis_graph is None:
+        return None
+    return render_vis_graph(vis_graph)
 
-      let visibleNodes = new Set(Object.keys(allNodes));
-      let visibleEdges = new Set(Object.keys(allEdges));
 
-      filters.forEach(f => {
-        const passingNodes = new Set();
-        const passingEdges = new Set();
+def render_vis_graph(vis_graph: dict) -> str:
+    """
+    Renders a graph from build_vis_graph as a standalone HTML page. The page is rendered
+    in memory by src.graph_template, so concurrent requests never share a file.
+    """
+    nodes = []
+    for node in vis_graph["nodes"]:
+        node = dict(node)
+        node["title"] = " ".join(node.pop("documents")) + " "
+        nodes.append(node)
+    return render_graph_html(nodes, vis_graph["edges"], vis_graph["options"])
 
-        if (f.item === 'node') {
-          for (let id in allNodes) {
-            const val = allNodes[id][f.property];
-            if (val !== undefined && f.value.includes(String(val))) {
-              passingNodes.add(id);
-            }
-          }
-        } else if (f.item === 'edge') {
-          for (let id in allEdges) {
-            const val = allEdges[id][f.property];
-            if (val !== undefined && f.value.includes(String(val))) {
-              passingEdges.add(id);
-              passingNodes.add(allEdges[id].from);
-              passingNodes.add(allEdges[id].to);
-            }
-          }
-        }
 
-        visibleNodes = new Set([...visibleNodes].filter(id => passingNodes.has(id)));
-        visibleEdges = new Set([...visibleEdges].filter(id => passingEdges.has(id)));
-      });
+def build_vis_graph(graph_document: GraphDocument, precompute_layout: bool = PRECOMPUTE_LAYOUT) -> dict | None:
+    """
+    Cleans a GraphDocument into vis-network items: {"nodes", "edges", "options"}, where
+    each node lists its sorted "documents". Shared by the HTML page and the compact
+    payload of src.graph_payload. With precompute_layout, node positions come from
+    src.graph_layout and physics is off, so the browser draws the graph without a
+    stabilization phase.
+    """
+    
+    if not graph_document:
+        return None
+    
+    if not isinstance(graph_document, GraphDocument):
+        return None
 
-      const updateNodeArray = [];
-      for (let id in allNodes) {
-        allNodes[id].hidden = filters.length > 0 && !visibleNodes.has(id);
-        updateNodeArray.push(allNodes[id]);
-      }
-      nodes.update(updateNodeArray);
+    nodes = graph_document.nodes
+    relationships = graph_document.relationships
 
-      const updateEdgeArray = [];
-      for (let id in allEdges) {
-        const e = allEdges[id];
-        const bothVisible = visibleNodes.has(e.from) && visibleNodes.has(e.to);
-        const shouldShow =
-          filters.length === 0 ||
-          visibleEdges.has(id) ||
-          bothVisible;
+    if not nodes and not relationships:
+        return None
 
-        updateEdgeArray.push({
-          ...e,
-          hidden: !shouldShow
-        });
-      }
-      edges.update(updateEdgeArray);
-    }
+    node_dict = cleanNodes(nodes)
 
-    window.resetAllFilters = function() {
-      filters = [];
-      const allNodes = nodes.get({ returnType: "Object" });
-      const allEdges = edges.get({ returnType: "Object" });
-      const nodeUpdates = Object.values(allNodes).map(n => ({ ...n, hidden: false }));
-      const edgeUpdates = Object.values(allEdges).map(e => ({ ...e, hidden: false }));
-      nodes.update(nodeUpdates);
-      edges.update(edgeUpdates);
-      renderActiveFilters();
-    }
+    valid_edges = []
+    valid_node_ids = set()
+    for rel in relationships:
+        if hasattr(rel.source, 'id') and hasattr(rel.target, 'id'):
+            rel.source.id = cleanUpText(rel.source.id)
+            rel.target.id = cleanUpText(rel.target.id)
+            if rel.source.id in node_dict and rel.target.id in node_dict:   
+                # Merged relationships carry how many times they were extracted
+                occurrences = rel.properties.get('count', 1)
+                node_dict[rel.target.id].properties['node_weight'] += occurrences
+                node_dict[rel.source.id].properties['edge_weight'] += occurrences
+                valid_edges.append(rel)
+                valid_node_ids.update([rel.source.id, rel.target.id])
 
-    function renderActiveFilters() {
-      const container = document.getElementById('active-filters');
-      if (filters.length === 0) {
-        container.innerHTML = "<i>No active filters</i>";
-        return;
-      }
+    # Sorted so the same graph always gets the same layout
+    layout_node_ids = sorted(valid_node_ids)
+    positions = {}
+    if precompute_layout:
+        positions = force_directed_layout(layout_node_ids, [(rel.source.id, rel.target.id) for rel in valid_edges])
 
-      container.innerHTML = filters.map((f, i) =>
-        `<span style="color:white; background:#555; padding:3px 6px; border-radius:4px; margin-right:5px;">
-          ${f.item}.${f.property}: ${f.value.join(', ')}
-          <button onclick='removeFilter(${i})' style='margin-left:5px; background:red; color:white; border:none; border-radius:3px; cursor:pointer;'>×</button>
-        </span>`
-      ).join('');
-    }
+    # Fonts, shape and arrows are the same for every item and come from GRAPH_OPTIONS;
+    # the page labels each node with its id
+    vis_nodes = []
+    for node_id in layout_node_ids:
+        node = node_dict[node_id]
+        try:
+            vis_node = {'id': node.id, 'documents': sorted(node.properties["document"]), 'group': node.type,
+                        'node_weight': node.properties['node_weight']}
+            if node_id in positions:
+                vis_node['x'], vis_node['y'] = positions[node_id]
+            vis_nodes.append(vis_node)
+        except Exception as e:
+            continue
 
-    window.removeFilter = function(index) {
-      filters.splice(index, 1);
-      applyFilters();
-      renderActiveFilters();
-    }
+    vis_edges = []
+    for rel in valid_edges:
+        try:
+            vis_edges.append({'from': rel.source.id, 'to': rel.target.id, 'label': rel.type.lower(),
+                              'edge_weight': node_dict[rel.target.id].properties['edge_weight']})
+        except Exception as e:
+            continue
 
-    rebuildPropertyOptions();
-  }
-})();
-</script>
-"""
+    options = json.loads(GRAPH_OPTIONS)
+    if positions:
+        # Positions are final: no physics, and straight edges instead of dynamic
+        # smoothing, which would add a hidden physics node per edge
+        options["physics"] = {"enabled": False}
+        options["edges"]["smooth"] = {"enabled": False}
 
-    network_div_marker = '<div id="mynetwork"'
-    if network_div_marker in html_content:
-        html_content = html_content.replace(network_div_marker, custom_filter_html + network_div_marker)
-    
-    body_close_marker = '</body>'
-    if body_close_marker in html_content:
-        html_content = html_content.replace(body_close_marker, custom_filter_js + body_close_marker)
-    
-    if html_file.exists():
-        os.remove(html_file)
-        
-    return html_content
+    return {"nodes": vis_nodes, "edges": vis_edges, "options": options}
 
-async def _save_graph_as(html_filepath: str, file_type: str) -> bytes | None:
-    """A helper function to save the HTML graph to a specified format using Playwright."""
-    try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
-            
-            await page.goto(f"file://{os.path.abspath(html_filepath)}")
-            await page.wait_for_load_state('networkidle')
-            
-            export_path = f"{Path(html_filepath).stem}.{file_type}"
-            
-            if file_type == "jpeg":
-                bytes_data = await page.screenshot(path=export_path, type="jpeg", quality=100, full_page=True)
-            elif file_type == "pdf":
-                bytes_data = await page.pdf(path=export_path, format="A4", print_background=True)
-            else:
-                bytes_data = None
-            
-            await browser.close()
-            
-            if bytes_data and Path(export_path).exists():
-                with open(export_path, 'rb') as f:
-                    file_content = f.read()
-                os.remove(export_path)
-                return file_content
-            else:
-                return None
-    except Exception as e:
-        print(f"DEBUG: Error in _save_graph_as: {e}")
-        traceback.print_exc()
-        return None
+def _read_graph_html(html_filepath: str) -> str:
+    with open(html_filepath, 'r', encoding='utf-8') as f:
+        return f.read()
 
 def save_graph_as_pdf(html_filepath: str) -> bytes | None:
     """Public function to save the graph as a PDF."""
     try:
-        # We need to run the async function in a synchronous context
-        return asyncio.run(_save_graph_as(html_filepath, "pdf"))
+        # Rendered by the warm browser pool on the shared job loop
+        return export_graph_html(_read_graph_html(html_filepath), "pdf")
     except Exception as e:
         print(f"DEBUG: Error saving PDF: {e}")
         traceback.print_exc()
@@ -408,42 +173,27 @@ def save_graph_as_pdf(html_filepath: str) -> bytes | None:
 def save_graph_as_jpeg(html_filepath: str) -> bytes | None:
     """Public function to save the graph as a JPEG."""
     try:
-        # We need to run the async function in a synchronous context
-        return asyncio.run(_save_graph_as(html_filepath, "jpeg"))
+        # Rendered by the warm browser pool on the shared job loop
+        return export_graph_html(_read_graph_html(html_filepath), "jpeg")
     except Exception as e:
         print(f"DEBUG: Error saving JPEG: {e}")
         traceback.print_exc()
         return None
-    
-def cleanUpText(string):
-    if not isinstance(string, str):
-        string = str(string)
-
-    cap = True
-    newString = ""
-
-
-    for i in string:
-        if i in {" ", "_"}:
-            newString += " "
-            cap = True
-        elif i.isalpha():
-            if cap:
-                newString += i.upper()
-                cap = False
-            else:
-                newString += i.lower()
-        else:
-            newString += i
-        
-    return newString.strip()
 
+def save_graphs_as(html_filepaths: List[str], file_type: str) -> List[bytes | None]:
+    """Exports several graphs as "pdf" or "jpeg", rendering up to KG_EXPORT_MAX_PAGES at once."""
+    return export_graphs_html([_read_graph_html(path) for path in html_filepaths], file_type)
+    
 def cleanNodes(nodeList):
 
     nodeDict = {}
     
     for node in nodeList:
         node.id = cleanUpText(node.id)
+        if node.id in nodeDict:
+            # Two ids that clean to the same text are the same entity; keep both documents
+            nodeDict[node.id].properties.setdefault("document", set()).update(node.properties.get("document", set()))
+            continue
         node.properties["node_weight"] = 0
         node.properties["edge_weight"] = 0
         nodeDict[node.id] = node
@@ -0,0 +1,154 @@
+# knowledge_graph_project/src/graph_export.py
+import asyncio
+import logging
+import os
+import threading
+from typing import List, Optional, Sequence
+
+from playwright.async_api import async_playwright
+
+from src.job_queue import get_job_manager
+
+logger = logging.getLogger(__name__)
+
+# Pages rendering at the same time; idle pages stay open for the next export
+EXPORT_MAX_PAGES = int(os.getenv("KG_EXPORT_MAX_PAGES", "4"))
+EXPORT_TIMEOUT_SECONDS = float(os.getenv("KG_EXPORT_TIMEOUT_SECONDS", "60"))
+
+EXPORT_FORMATS = ("pdf", "jpeg")
+
+
+class BrowserPool:
+    """
+    One long-lived headless Chromium with up to max_pages reusable pages. Graph HTML
+    is loaded with set_content and the export comes back as bytes, so nothing touches
+    the file system. All methods run on the job loop (see get_job_manager), which
+    owns the Playwright connection; the browser is launched on first use and
+    relaunched if it disconnects.
+    """
+
+    def __init__(self, max_pages: int = EXPORT_MAX_PAGES, timeout_seconds: float = EXPORT_TIMEOUT_SECONDS):
+        self.max_pages = max_pages
+        self.timeout_seconds = timeout_seconds
+        self._playwright = None
+        self._browser = None
+        self._idle_pages = []
+        # Created on the job loop by the first export
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._page_slots: Optional[asyncio.Semaphore] = None
+        self.exports = 0
+        self.launches = 0
+
+    async def _ensure_browser(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            self._page_slots = asyncio.Semaphore(self.max_pages)
+        async with self._start_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._idle_pages = []
+            self._browser = await self._playwright.chromium.launch()
+            self.launches += 1
+            logger.info(f"Launched export browser (launch {self.launches}).")
+            return self._browser
+
+    async def _render(self, page, html: str, file_type: str) -> bytes:
+        await page.set_content(html, wait_until="networkidle", timeout=self.timeout_seconds * 1000)
+        if file_type == "jpeg":
+            return await page.screenshot(type="jpeg", quality=100, full_page=True)
+        return await page.pdf(format="A4", print_background=True)
+
+    async def export(self, html: str, file_type: str) -> bytes:
+        """
+        Renders one graph page as PDF or JPEG bytes.
+
+        Raises:
+            ValueError: If file_type is not one of EXPORT_FORMATS.
+        """
+        if file_type not in EXPORT_FORMATS:
+            raise ValueError(f"file_type must be one of {', '.join(EXPORT_FORMATS)}")
+        browser = await self._ensure_browser()
+        async with self._page_slots:
+            page = self._idle_pages.pop() if self._idle_pages else await browser.new_page()
+            reusable = False
+            try:
+                data = await self._render(page, html, file_type)
+                reusable = True
+                self.exports += 1
+                return data
+            finally:
+                # A page that failed mid-render may be in any state, so it is not reused
+                if reusable and browser is self._browser and not page.is_closed():
+                    self._idle_pages.append(page)
+                else:
+                    await self._close_page(page)
+
+    async def export_many(self, htmls: Sequence[str], file_type: str) -> List[Optional[bytes]]:
+        """
+        Renders several graph pages, at most max_pages at a time. Returns the bytes
+        for each page in order, or None for a page that failed to render.
+        """
+        results = await asyncio.gather(*(self.export(html, file_type) for html in htmls), return_exceptions=True)
+        exports = []
+        for result in results:
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                logger.warning(f"Graph export failed: {result}")
+                exports.append(None)
+            else:
+                exports.append(result)
+        return exports
+
+    @staticmethod
+    async def _close_page(page):
+        try:
+            await page.close()
+        except Exception:
+            pass
+
+    async def close(self):
+        """Closes the browser and the Playwright connection."""
+        if self._start_lock is None:
+            return
+        async with self._start_lock:
+            self._idle_pages = []
+            if self._browser is not None:
+                await self._browser.close()
+                self._browser = None
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    def stats(self):
+        return {
+            "exports": self.exports,
+            "browser_launches": self.launches,
+            "idle_pages": len(self._idle_pages),
+            "max_pages": self.max_pages,
+        }
+
+
+_browser_pool: Optional[BrowserPool] = None
+_browser_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Returns the process-wide export browser pool."""
+    global _browser_pool
+    with _browser_pool_lock:
+        if _browser_pool is None:
+            _browser_pool = BrowserPool()
+        return _browser_pool
+
+
+def export_graph_html(html: str, file_type: str) -> bytes:
+    """Synchronous export of one graph page on the shared job loop."""
+    return get_job_manager().run(get_browser_pool().export(html, file_type))
+
+
+def export_graphs_html(htmls: Sequence[str], file_type: str) -> List[Optional[bytes]]:
+    """Synchronous batch export on the shared job loop; None marks a failed page."""
+    return get_job_manager().run(get_browser_pool().export_many(htmls, file_type))
@@ -0,0 +1,135 @@
+# knowledge_graph_project/src/graph_layout.py
+import math
+import os
+from typing import Dict, Hashable, Sequence, Tuple
+
+import numpy as np
+
+# Compute node positions on the server so the browser can skip physics stabilization
+PRECOMPUTE_LAYOUT = os.getenv("KG_PRECOMPUTE_LAYOUT", "true").lower() in ("1", "true", "yes", "on")
+
+LAYOUT_ITERATIONS = 120
+# Above this many nodes, repulsion comes from grid cell centroids instead of every node
+LAYOUT_EXACT_MAX_NODES = 300
+# Average number of nodes per grid cell in the approximate mode
+LAYOUT_NODES_PER_CELL = 32
+# Pixels per unit of ideal edge length
+LAYOUT_NODE_SPACING = 150.0
+LAYOUT_SEED = 42
+
+# Pull towards the centre, keeps disconnected components from drifting apart
+_GRAVITY = 0.02
+# Rows per block when computing pairwise forces, bounds memory to a few _BLOCK * n arrays
+_BLOCK = 256
+_MIN_DIST2 = 1e-4
+
+
+def _pairwise_repulsion(pos: np.ndarray, sources: np.ndarray, masses: np.ndarray | None = None) -> np.ndarray:
+    """
+    Fruchterman-Reingold repulsion (k^2 / d, with k = 1) on every row of pos from every
+    row of sources, optionally weighted by masses. Computed in blocks of rows.
+    """
+    disp = np.empty_like(pos)
+    source_x, source_y = sources[:, 0], sources[:, 1]
+    for start in range(0, len(pos), _BLOCK):
+        block = pos[start:start + _BLOCK]
+        dx = block[:, 0:1] - source_x
+        dy = block[:, 1:2] - source_y
+        weights = dx * dx
+        weights += dy * dy
+        np.maximum(weights, _MIN_DIST2, out=weights)
+        np.reciprocal(weights, out=weights)
+        if masses is not None:
+            weights *= masses
+        disp[start:start + _BLOCK, 0] = (dx * weights).sum(axis=1)
+        disp[start:start + _BLOCK, 1] = (dy * weights).sum(axis=1)
+    return disp
+
+
+def _grid_repulsion(pos: np.ndarray, cells_per_side: int) -> np.ndarray:
+    """
+    Approximate repulsion: each node is pushed by the centroid of every occupied grid
+    cell, weighted by the cell's node count. For the node's own cell the node itself is
+    left out of the centroid, so it still spreads away from its cell mates.
+    """
+    mins = pos.min(axis=0)
+    span = float((pos.max(axis=0) - mins).max()) or 1.0
+    cells = np.minimum(((pos - mins) / span * cells_per_side).astype(np.int64), cells_per_side - 1)
+    cell_ids = cells[:, 0] * cells_per_side + cells[:, 1]
+
+    cell_count = cells_per_side * cells_per_side
+    mass = np.bincount(cell_ids, minlength=cell_count).astype(float)
+    sums = np.stack([np.bincount(cell_ids, weights=pos[:, dim], minlength=cell_count) for dim in (0, 1)], axis=1)
+    occupied = np.flatnonzero(mass)
+    centroids = sums[occupied] / mass[occupied, None]
+
+    disp = _pairwise_repulsion(pos, centroids, mass[occupied])
+
+    # Replace the own cell's term (which includes the node) with one for its cell mates
+    own_mass = mass[cell_ids]
+    own_delta = pos - sums[cell_ids] / own_mass[:, None]
+    own_dist2 = np.maximum((own_delta * own_delta).sum(axis=1), _MIN_DIST2)
+    disp -= own_delta * (own_mass / own_dist2)[:, None]
+
+    others = own_mass > 1
+    mates_mass = own_mass[others] - 1
+    mates_delta = pos[others] - (sums[cell_ids[others]] - pos[others]) / mates_mass[:, None]
+    mates_dist2 = np.maximum((mates_delta * mates_delta).sum(axis=1), _MIN_DIST2)
+    disp[others] += mates_delta * (mates_mass / mates_dist2)[:, None]
+    return disp
+
+
+def force_directed_layout(node_ids: Sequence[Hashable], edges: Sequence[Tuple[Hashable, Hashable]],
+                          iterations: int = LAYOUT_ITERATIONS,
+                          seed: int = LAYOUT_SEED) -> Dict[Hashable, Tuple[float, float]]:
+    """
+    Computes 2D positions with a vectorized Fruchterman-Reingold layout and returns
+    {node_id: (x, y)} in pixels, centred on the origin. Graphs above
+    LAYOUT_EXACT_MAX_NODES nodes use grid-approximated repulsion. The result only
+    depends on the order of node_ids and edges, so pass them in a stable order.
+    """
+    n = len(node_ids)
+    if n == 0:
+        return {}
+    if n == 1:
+        return {node_ids[0]: (0.0, 0.0)}
+
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    pairs = np.array(
+        [(index[source], index[target]) for source, target in edges
+         if source in index and target in index and source != target],
+        dtype=np.int64
+    ).reshape(-1, 2)
+
+    rng = np.random.default_rng(seed)
+    # Area of about n * k^2, so nodes start near their ideal spacing
+    side = math.sqrt(n)
+    pos = rng.uniform(-side / 2, side / 2, size=(n, 2))
+    cells_per_side = max(2, math.ceil(math.sqrt(n / LAYOUT_NODES_PER_CELL)))
+
+    temperature = side / 4
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        if n <= LAYOUT_EXACT_MAX_NODES:
+            disp = _pairwise_repulsion(pos, pos)
+        else:
+            disp = _grid_repulsion(pos, cells_per_side)
+
+        if len(pairs):
+            # Attraction d^2 / k along each edge
+            delta = pos[pairs[:, 0]] - pos[pairs[:, 1]]
+            pull = delta * np.sqrt((delta * delta).sum(axis=1))[:, None]
+            for dim in (0, 1):
+                disp[:, dim] -= np.bincount(pairs[:, 0], weights=pull[:, dim], minlength=n)
+                disp[:, dim] += np.bincount(pairs[:, 1], weights=pull[:, dim], minlength=n)
+
+        disp -= _GRAVITY * pos * np.sqrt(n)
+
+        # Move each node along its displacement, by at most the current temperature
+        length = np.sqrt((disp * disp).sum(axis=1))
+        pos += disp * (np.minimum(length, temperature) / np.maximum(length, 1e-9))[:, None]
+        temperature -= cooling
+
+    pos -= pos.mean(axis=0)
+    pos *= LAYOUT_NODE_SPACING
+    return {node_id: (round(float(x), 1), round(float(y), 1)) for node_id, (x, y) in zip(node_ids, pos)}
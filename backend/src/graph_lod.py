@@ -0,0 +1,191 @@
+# knowledge_graph_project/src/graph_lod.py
+import os
+import random
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+# Graphs with more nodes than this are shown as an overview with expandable clusters
+LOD_MAX_NODES = int(os.getenv("KG_LOD_MAX_NODES", "1500"))
+# Share of the node budget that goes to cluster supernodes rather than individual nodes
+LOD_CLUSTER_SHARE = 0.2
+LPA_MAX_ITERATIONS = 20
+LPA_SEED = 42
+
+# Entity ids are capitalized by cleanUpText, so this lowercase prefix never collides with one
+CLUSTER_ID_PREFIX = "cluster:"
+CLUSTER_GROUP = "Cluster"
+
+
+def label_propagation(node_ids: Sequence[Hashable], edges: Sequence[Tuple[Hashable, Hashable]],
+                      max_iterations: int = LPA_MAX_ITERATIONS, seed: int = LPA_SEED) -> Dict[Hashable, int]:
+    """
+    Community detection by label propagation on the undirected graph: every node
+    repeatedly takes the label most common among its neighbours until no label
+    changes. Visiting order and ties are drawn from a seeded generator, so the same
+    input always gives the same communities. Returns {node_id: community}.
+    """
+    index = {node_id: i for i, node_id in enumerate(node_ids)}
+    neighbours: List[List[int]] = [[] for _ in node_ids]
+    for source, target in edges:
+        if source in index and target in index and source != target:
+            neighbours[index[source]].append(index[target])
+            neighbours[index[target]].append(index[source])
+
+    labels = list(range(len(node_ids)))
+    rng = random.Random(seed)
+    order = [i for i in range(len(node_ids)) if neighbours[i]]
+    for _ in range(max_iterations):
+        rng.shuffle(order)
+        changed = False
+        for i in order:
+            counts: Dict[int, int] = {}
+            for neighbour in neighbours[i]:
+                label = labels[neighbour]
+                counts[label] = counts.get(label, 0) + 1
+            best = max(counts.values())
+            if counts.get(labels[i]) == best:
+                continue
+            labels[i] = rng.choice([label for label, count in counts.items() if count == best])
+            changed = True
+        if not changed:
+            break
+
+    # Renumber communities 0..n-1 in order of first appearance
+    renumbered: Dict[int, int] = {}
+    return {node_id: renumbered.setdefault(labels[i], len(renumbered)) for node_id, i in index.items()}
+
+
+def _merged_node(node_id: str, label: str, members: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """A supernode standing in for members, placed at their centroid when they have positions."""
+    node = {
+        "id": node_id,
+        "documents": sorted({doc for member in members for doc in member["documents"]}),
+        "group": CLUSTER_GROUP,
+        "node_weight": sum(member["node_weight"] for member in members),
+        "cluster": {"label": label, "members": len(members)},
+    }
+    if all("x" in member for member in members):
+        node["x"] = round(sum(member["x"] for member in members) / len(members), 1)
+        node["y"] = round(sum(member["y"] for member in members) / len(members), 1)
+    return node
+
+
+def _aggregated_edges(edges: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+    """One edge per (from, to) pair, labelled with the relation or the number of relations."""
+    pairs: Dict[Tuple[str, str], List[str]] = {}
+    for source, target, label in edges:
+        pairs.setdefault((source, target), []).append(label)
+    aggregated = []
+    for (source, target), labels in pairs.items():
+        distinct = set(labels)
+        label = labels[0] if len(distinct) == 1 else f"{len(labels)} relations"
+        aggregated.append({"from": source, "to": target, "label": label, "edge_weight": len(labels)})
+    return aggregated
+
+
+def _hidden_communities(node_by_id: Dict[str, Dict[str, Any]], edges: List[Dict[str, Any]], kept: set,
+                        cluster_budget: int) -> Dict[str, int]:
+    """
+    Communities of the nodes that are not kept. Label propagation leaves many small
+    communities on sparse graphs, so while there are more than cluster_budget it is run
+    again on the graph of communities (parallel edges acting as weights), merging
+    communities that are densely connected to each other.
+    """
+    communities = label_propagation(list(node_by_id), [(edge["from"], edge["to"]) for edge in edges])
+    hidden = [node_id for node_id in node_by_id if node_id not in kept]
+    hidden_edges = [(edge["from"], edge["to"]) for edge in edges if edge["from"] not in kept and edge["to"] not in kept]
+    while len({communities[node_id] for node_id in hidden}) > cluster_budget:
+        labels = sorted({communities[node_id] for node_id in hidden})
+        merged = label_propagation(labels, [(communities[source], communities[target]) for source, target in hidden_edges])
+        if len(set(merged.values())) == len(labels):
+            break
+        communities = {node_id: merged[communities[node_id]] for node_id in hidden}
+    return communities
+
+
+def build_level_of_detail(vis_graph: Dict[str, Any],
+                          max_nodes: int = LOD_MAX_NODES) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+    """
+    Reduces a graph from build_vis_graph to at most max_nodes nodes. The highest scoring
+    nodes (degree plus node_weight) are kept as they are; the rest are grouped by
+    label-propagation community into supernodes, and edges to hidden nodes are rerouted
+    to their supernode and aggregated per node pair.
+
+    Returns None if the graph already fits, otherwise (overview, expansions).
+    expansions maps each supernode id to the graph that replaces it: its members, every
+    edge touching them with the original endpoints, and "external", which maps each
+    endpoint outside the cluster to its own supernode id (None for kept nodes).
+    """
+    nodes, edges = vis_graph["nodes"], vis_graph["edges"]
+    if len(nodes) <= max_nodes:
+        return None
+
+    node_by_id = {node["id"]: node for node in nodes}
+    edges = [edge for edge in edges if edge["from"] in node_by_id and edge["to"] in node_by_id]
+    score = {node["id"]: node["node_weight"] for node in nodes}
+    for edge in edges:
+        score[edge["from"]] += 1
+        score[edge["to"]] += 1
+
+    cluster_budget = max(1, int(max_nodes * LOD_CLUSTER_SHARE))
+    ranked = sorted(node_by_id, key=lambda node_id: (-score[node_id], node_id))
+    kept = set(ranked[:max(0, max_nodes - cluster_budget)])
+
+    communities = _hidden_communities(node_by_id, edges, kept, cluster_budget)
+    hidden_by_community: Dict[int, List[str]] = {}
+    for node_id in ranked:
+        if node_id not in kept:
+            hidden_by_community.setdefault(communities[node_id], []).append(node_id)
+
+    # Strongest communities first; past the budget, the remainder share one supernode
+    groups = sorted(hidden_by_community.values(), key=lambda members: (-sum(score[m] for m in members), members[0]))
+    if len(groups) > cluster_budget:
+        rest = [node_id for group in groups[cluster_budget - 1:] for node_id in group]
+        groups = groups[:cluster_budget - 1] + [sorted(rest, key=lambda node_id: (-score[node_id], node_id))]
+    # A community of one takes a slot either way, so it is shown as the node itself
+    kept.update(members[0] for members in groups if len(members) == 1)
+    groups = [members for members in groups if len(members) > 1]
+
+    representative: Dict[str, str] = {node_id: node_id for node_id in kept}
+    supernodes, cluster_members = [], {}
+    for i, members in enumerate(groups):
+        cluster_id = f"{CLUSTER_ID_PREFIX}{i}"
+        # Members are sorted by score, so the label names the cluster's strongest node
+        label = f"{members[0]} +{len(members) - 1}"
+        supernodes.append(_merged_node(cluster_id, label, [node_by_id[m] for m in members]))
+        cluster_members[cluster_id] = members
+        for member in members:
+            representative[member] = cluster_id
+
+    overview_edges, rerouted, touching = [], [], {cluster_id: [] for cluster_id in cluster_members}
+    for edge in edges:
+        source, target = representative[edge["from"]], representative[edge["to"]]
+        if source == edge["from"] and target == edge["to"]:
+            overview_edges.append(edge)
+        elif source != target:
+            rerouted.append((source, target, edge["label"]))
+        for cluster_id in {source, target} & touching.keys():
+            touching[cluster_id].append(edge)
+    overview_edges.extend(_aggregated_edges(rerouted))
+
+    overview = {
+        "nodes": [node for node in nodes if node["id"] in kept] + supernodes,
+        "edges": overview_edges,
+        "options": vis_graph["options"],
+    }
+
+    expansions = {}
+    for cluster_id, members in cluster_members.items():
+        member_set = set(members)
+        external = {}
+        for edge in touching[cluster_id]:
+            for endpoint in (edge["from"], edge["to"]):
+                if endpoint not in member_set:
+                    rep = representative[endpoint]
+                    external[endpoint] = None if rep == endpoint else rep
+        expansions[cluster_id] = {
+            "nodes": [node_by_id[member] for member in sorted(members)],
+            "edges": touching[cluster_id],
+            "options": vis_graph["options"],
+            "external": external,
+        }
+    return overview, expansions
@@ -0,0 +1,268 @@
+# knowledge_graph_project/src/graph_merger.py
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_community.graphs.graph_document import GraphDocument, Node, Relationship
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+EdgeKey = Tuple[str, str, str]
+
+
+class IncrementalGraphMerger:
+    """
+    Folds chunk graph dicts into one graph as they arrive.
+
+    Nodes are kept once per id with the set of documents that mention them.
+    Relationships are de-duplicated by (source, target, type) with an occurrence
+    count and the set of supporting documents; a relationship dict may carry a "count"
+    when it stands for several occurrences. Relationships whose two different ids
+    normalize to the same node are dropped rather than kept as self-loops. An edge
+    whose endpoint has not been seen yet waits until that node arrives from a later
+    chunk, so arrival order does not matter. Pydantic GraphDocument objects are only
+    built in to_graph_document().
+
+    Occurrences are also counted per document, so remove_document() can take one
+    document's contribution out again at a cost proportional to that document.
+    """
+
+    def __init__(self, normalize_id: Optional[Callable[[Any], str]] = None):
+        """
+        Args:
+            normalize_id (callable): Optional, maps a raw node id to the id it is merged under.
+        """
+        self.normalize_id = normalize_id or str
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.edges: Dict[EdgeKey, Dict[str, Any]] = {}
+        self._pending_edges: Dict[EdgeKey, Dict[str, Any]] = {}
+        self._edges_waiting_on: Dict[str, List[EdgeKey]] = {}
+        # Provenance: what each document contributed, and the complete edges at each node
+        self._nodes_by_document: Dict[Any, Set[str]] = {}
+        self._edges_by_document: Dict[Any, Set[EdgeKey]] = {}
+        self._edges_by_node: Dict[str, Set[EdgeKey]] = {}
+        self.chunks_merged = 0
+
+    def add(self, gd_dict: Dict[str, Any]) -> Dict[str, list]:
+        """
+        Merges one chunk result.
+
+        Returns:
+            dict: {"nodes": [...], "edges": [...]} with the ids of nodes that are new or
+            gained a document, and the keys of edges that became complete with this chunk.
+        """
+        if not isinstance(gd_dict, dict):
+            logger.warning(f"Received non-dictionary item in gd_dicts: {gd_dict}. Skipping.")
+            return {"nodes": [], "edges": []}
+        self.chunks_merged += 1
+
+        changed_nodes: Dict[str, None] = {}
+        for node_data in gd_dict.get("nodes", []):
+            if not isinstance(node_data, dict) or "id" not in node_data or "type" not in node_data:
+                logger.warning(f"Skipping malformed node data: {node_data}")
+                continue
+
+            node_id = self.normalize_id(node_data["id"])
+            node = self.nodes.get(node_id)
+            if node is None:
+                node = {"type": str(node_data["type"]), "documents": set()}
+                self.nodes[node_id] = node
+                changed_nodes[node_id] = None
+
+            document = node_data.get("document")
+            if document is not None and document not in node["documents"]:
+                node["documents"].add(document)
+                self._nodes_by_document.setdefault(document, set()).add(node_id)
+                changed_nodes[node_id] = None
+
+        new_edges: List[EdgeKey] = []
+        for rel_data in gd_dict.get("relationships", []):
+            if not isinstance(rel_data, dict):
+                logger.warning(f"Skipping malformed relationship data: {rel_data}")
+                continue
+            source_id = rel_data.get("source")
+            target_id = rel_data.get("target")
+            rel_type = rel_data.get("type")
+            if source_id is None or target_id is None or not isinstance(rel_type, str) or not rel_type.strip():
+                logger.warning(f"Skipping malformed relationship data: {rel_data}")
+                continue
+
+            occurrences = rel_data.get("count", 1)
+            if not isinstance(occurrences, int) or occurrences < 1:
+                occurrences = 1
+
+            edge_key = (self.normalize_id(source_id), self.normalize_id(target_id), rel_type.strip().upper())
+            if edge_key[0] == edge_key[1] and str(source_id) != str(target_id):
+                # Both endpoints resolved to one entity, e.g. "Company" and "Companies"
+                logger.debug(f"Dropping relationship between aliases of {edge_key[0]}: {rel_data}")
+                continue
+            self._add_edge_occurrence(edge_key, rel_data.get("document"), new_edges, occurrences)
+
+        # Edges that were waiting on one of this chunk's nodes may now be complete
+        for node_id in changed_nodes:
+            for edge_key in self._edges_waiting_on.pop(node_id, []):
+                self._try_complete_edge(edge_key, new_edges)
+
+        return {"nodes": list(changed_nodes), "edges": new_edges}
+
+    def _add_edge_occurrence(self, edge_key: EdgeKey, document, new_edges: List[EdgeKey], occurrences: int = 1):
+        edge = self.edges.get(edge_key)
+        if edge is None:
+            edge = self._pending_edges.get(edge_key)
+        is_new = edge is None
+        if is_new:
+            edge = {"count": 0, "documents": set(), "document_counts": {}}
+            self._pending_edges[edge_key] = edge
+
+        edge["count"] += occurrences
+        if document is not None:
+            edge["documents"].add(document)
+            edge["document_counts"][document] = edge["document_counts"].get(document, 0) + occurrences
+            self._edges_by_document.setdefault(document, set()).add(edge_key)
+
+        if is_new:
+            self._try_complete_edge(edge_key, new_edges)
+
+    def _try_complete_edge(self, edge_key: EdgeKey, new_edges: List[EdgeKey]):
+        """
+        Moves a pending edge into the graph once both endpoints exist,
+        otherwise parks it under the first missing endpoint.
+        """
+        if edge_key not in self._pending_edges:
+            return
+        for endpoint in edge_key[:2]:
+            if endpoint not in self.nodes:
+                self._edges_waiting_on.setdefault(endpoint, []).append(edge_key)
+                return
+        self.edges[edge_key] = self._pending_edges.pop(edge_key)
+        for endpoint in edge_key[:2]:
+            self._edges_by_node.setdefault(endpoint, set()).add(edge_key)
+        new_edges.append(edge_key)
+
+    def documents(self) -> List[Any]:
+        """The documents that contributed nodes or relationships to the graph."""
+        return list(self._nodes_by_document.keys() | self._edges_by_document.keys())
+
+    def remove_document(self, document) -> Dict[str, list]:
+        """
+        Takes out everything one document contributed. Relationships lose the document's
+        occurrences and are removed when none are left; nodes are removed when no other
+        document mentions them. Their remaining relationships leave the graph but stay
+        pending, so they return if a later document brings the node back. Nodes and
+        relationships that were merged without a document are kept.
+
+        Returns:
+            dict: {"nodes": [...], "edges": [...]} with the ids of the removed nodes and
+            the keys of the removed edges.
+        """
+        removed_nodes: List[str] = []
+        removed_edges: List[EdgeKey] = []
+        for edge_key in self._edges_by_document.pop(document, ()):
+            edge = self.edges.get(edge_key) or self._pending_edges.get(edge_key)
+            if edge is None:
+                continue
+            edge["count"] -= edge["document_counts"].pop(document, 0)
+            edge["documents"].discard(document)
+            if edge["count"] <= 0:
+                self._drop_edge(edge_key, removed_edges)
+
+        for node_id in self._nodes_by_document.pop(document, ()):
+            node = self.nodes.get(node_id)
+            if node is None:
+                continue
+            node["documents"].discard(document)
+            if not node["documents"]:
+                del self.nodes[node_id]
+                removed_nodes.append(node_id)
+                # Edges other documents still support wait for the node to come back,
+                # as they would in a build without this document
+                for edge_key in list(self._edges_by_node.get(node_id, ())):
+                    self._park_edge(edge_key, removed_edges)
+                self._edges_by_node.pop(node_id, None)
+
+        logger.info(f"Removed document '{document}': {len(removed_nodes)} nodes and {len(removed_edges)} relationships.")
+        return {"nodes": removed_nodes, "edges": removed_edges}
+
+    def rename_document(self, document, new_document):
+        """
+        Attributes everything document contributed to new_document instead. new_document
+        must not have contributed anything yet.
+        """
+        node_ids = self._nodes_by_document.pop(document, set())
+        for node_id in node_ids:
+            documents = self.nodes[node_id]["documents"]
+            documents.discard(document)
+            documents.add(new_document)
+        if node_ids:
+            self._nodes_by_document[new_document] = node_ids
+
+        edge_keys = set()
+        for edge_key in self._edges_by_document.pop(document, ()):
+            edge = self.edges.get(edge_key) or self._pending_edges.get(edge_key)
+            if edge is None or document not in edge["document_counts"]:
+                continue
+            edge["documents"].discard(document)
+            edge["documents"].add(new_document)
+            edge["document_counts"][new_document] = edge["document_counts"].pop(document)
+            edge_keys.add(edge_key)
+        if edge_keys:
+            self._edges_by_document[new_document] = edge_keys
+
+    def _park_edge(self, edge_key: EdgeKey, removed_edges: List[EdgeKey]):
+        """Moves a complete edge back to pending, e.g. after one of its endpoints was removed."""
+        edge = self.edges.pop(edge_key, None)
+        if edge is None:
+            return
+        removed_edges.append(edge_key)
+        for endpoint in edge_key[:2]:
+            edges_at_node = self._edges_by_node.get(endpoint)
+            if edges_at_node is not None:
+                edges_at_node.discard(edge_key)
+        self._pending_edges[edge_key] = edge
+        self._try_complete_edge(edge_key, [])
+
+    def _drop_edge(self, edge_key: EdgeKey, removed_edges: List[EdgeKey]):
+        edge = self.edges.pop(edge_key, None)
+        if edge is None:
+            # Never complete, so never reported; its waiting list entry is skipped later
+            edge = self._pending_edges.pop(edge_key, None)
+            if edge is None:
+                return
+        else:
+            removed_edges.append(edge_key)
+            for endpoint in edge_key[:2]:
+                edges_at_node = self._edges_by_node.get(endpoint)
+                if edges_at_node is not None:
+                    edges_at_node.discard(edge_key)
+        for other_document in edge["documents"]:
+            self._edges_by_document.get(other_document, set()).discard(edge_key)
+
+    def to_graph_document(self) -> GraphDocument:
+        """
+        Builds the consolidated GraphDocument. Edges whose endpoints never appeared are dropped.
+        """
+        if self._pending_edges:
+            logger.warning(f"Dropping {len(self._pending_edges)} relationships that reference missing nodes.")
+
+        graph_nodes = {
+            node_id: Node(id=node_id, type=node["type"], properties={"document": set(node["documents"])})
+            for node_id, node in self.nodes.items()
+        }
+
+        graph_relationships = []
+        for (source_id, target_id, rel_type), edge in self.edges.items():
+            try:
+                graph_relationships.append(Relationship(
+                    source=graph_nodes[source_id],
+                    target=graph_nodes[target_id],
+                    type=rel_type,
+                    properties={"count": edge["count"], "documents": set(edge["documents"])}
+                ))
+            except Exception as pydantic_error:
+                logger.warning(f"Failed to create Pydantic Relationship object: {(source_id, target_id, rel_type)}. Error: {pydantic_error}")
+
+        logger.info(f"Merged graph contains {len(graph_nodes)} nodes and {len(graph_relationships)} relationships "
+                    f"from {self.chunks_merged} chunks.")
+        # GraphDocument requires a 'source' field; used to track where the graph comes from
+        source_document = Document(page_content="User provided content", metadata={"type": "user_input"})
+        return GraphDocument(nodes=list(graph_nodes.values()), relationships=graph_relationships, source=source_document)
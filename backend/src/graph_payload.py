@@ -0,0 +1,234 @@
+# knowledge_graph_project/src/graph_payload.py
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Rendered graphs kept for the /graphs/ endpoints, least recently used evicted first
+GRAPH_STORE_MAX_BYTES = int(os.getenv("KG_GRAPH_STORE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+PAYLOAD_FORMAT = "kg-columnar"
+PAYLOAD_VERSION = 1
+
+ENCODING_BROTLI = "br"
+ENCODING_GZIP = "gzip"
+ENCODING_IDENTITY = "identity"
+
+_GZIP_LEVEL = 6
+# Brotli's top qualities are too slow for multi-megabyte payloads on the request path
+_BROTLI_QUALITY = 5
+
+
+class _StringTable:
+    """Interns strings, handing out their index in insertion order."""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def add(self, value: str) -> int:
+        position = self.index.get(value)
+        if position is None:
+            position = self.index[value] = len(self.values)
+            self.values.append(value)
+        return position
+
+
+def encode_graph_payload(vis_graph: Dict[str, Any]) -> bytes:
+    """
+    Encodes a graph from build_vis_graph column by column: node ids, types, documents
+    and relation labels are stored once in string tables and referenced by integer
+    index, so nothing is repeated per node or edge. A node's documents are
+    docs[doc_offsets[i]:doc_offsets[i + 1]].
+
+    Graphs from src.graph_lod add two optional sections. "clusters" lists the
+    supernodes with their label, member count and the graph id of their expansion.
+    "external" gives, for each id in strings.ids past the last node (edge endpoints
+    outside an expansion), the supernode it is hidden in or null.
+    """
+    nodes = vis_graph["nodes"]
+    types, documents, relations = _StringTable(), _StringTable(), _StringTable()
+    node_index = {node["id"]: i for i, node in enumerate(nodes)}
+    external = vis_graph.get("external") or {}
+    for node_id in external:
+        node_index.setdefault(node_id, len(node_index))
+    edges = [edge for edge in vis_graph["edges"] if edge["from"] in node_index and edge["to"] in node_index]
+
+    doc_offsets, docs = [0], []
+    for node in nodes:
+        docs.extend(documents.add(doc) for doc in node["documents"])
+        doc_offsets.append(len(docs))
+
+    node_columns = {
+        "type": [types.add(node["group"]) for node in nodes],
+        "weight": [node["node_weight"] for node in nodes],
+        "doc_offsets": doc_offsets,
+        "docs": docs,
+    }
+    if nodes and all("x" in node for node in nodes):
+        node_columns["x"] = [node["x"] for node in nodes]
+        node_columns["y"] = [node["y"] for node in nodes]
+
+    payload = {
+        "format": PAYLOAD_FORMAT,
+        "version": PAYLOAD_VERSION,
+        "strings": {
+            "ids": list(node_index),
+            "types": types.values,
+            "documents": documents.values,
+            "relations": relations.values,
+        },
+        "nodes": node_columns,
+        "edges": {
+            "source": [node_index[edge["from"]] for edge in edges],
+            "target": [node_index[edge["to"]] for edge in edges],
+            "relation": [relations.add(edge["label"]) for edge in edges],
+            "weight": [edge["edge_weight"] for edge in edges],
+        },
+        "options": vis_graph["options"],
+    }
+    clustered = [(i, node["cluster"]) for i, node in enumerate(nodes) if "cluster" in node]
+    if clustered:
+        payload["clusters"] = {
+            "node": [i for i, _ in clustered],
+            "label": [cluster["label"] for _, cluster in clustered],
+            "members": [cluster["members"] for _, cluster in clustered],
+            "graph": [cluster.get("graph") for _, cluster in clustered],
+        }
+    if external:
+        payload["external"] = {"cluster": [external[node_id] for node_id in list(node_index)[len(nodes):]]}
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def decode_graph_payload(data: bytes) -> Dict[str, Any]:
+    """
+    Inverse of encode_graph_payload: rebuilds {"nodes", "edges", "options"}. The
+    optional "clusters" and "external" sections are not decoded.
+    """
+    payload = json.loads(data)
+    if payload.get("format") != PAYLOAD_FORMAT or payload.get("version") != PAYLOAD_VERSION:
+        raise ValueError("Unsupported graph payload format")
+
+    strings, node_columns, edge_columns = payload["strings"], payload["nodes"], payload["edges"]
+    ids, offsets = strings["ids"], node_columns["doc_offsets"]
+    nodes = []
+    for i, node_id in enumerate(ids[:len(node_columns["type"])]):
+        node = {
+            "id": node_id,
+            "group": strings["types"][node_columns["type"][i]],
+            "node_weight": node_columns["weight"][i],
+            "documents": [strings["documents"][doc] for doc in node_columns["docs"][offsets[i]:offsets[i + 1]]],
+        }
+        if "x" in node_columns:
+            node["x"], node["y"] = node_columns["x"][i], node_columns["y"][i]
+        nodes.append(node)
+
+    edges = [
+        {"from": ids[source], "to": ids[target], "label": strings["relations"][relation], "edge_weight": weight}
+        for source, target, relation, weight in zip(edge_columns["source"], edge_columns["target"],
+                                                    edge_columns["relation"], edge_columns["weight"])
+    ]
+    return {"nodes": nodes, "edges": edges, "options": payload["options"]}
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """Picks br, gzip or identity from an Accept-Encoding header."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        name, _, value = params.partition("=")
+        try:
+            quality = float(value) if name.strip() == "q" else 1.0
+        except ValueError:
+            quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    if brotli is not None and (ENCODING_BROTLI in accepted or "*" in accepted):
+        return ENCODING_BROTLI
+    if ENCODING_GZIP in accepted or "*" in accepted:
+        return ENCODING_GZIP
+    return ENCODING_IDENTITY
+
+
+class GraphPayloadStore:
+    """
+    Thread-safe, size-bounded LRU of encoded graph payloads. Payloads are addressed
+    by a hash of their content, which doubles as their ETag, and kept only in
+    compressed form; identity responses are decompressed on demand.
+    """
+
+    def __init__(self, max_bytes: int = GRAPH_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, bytes]]" = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def _size(entry: Dict[str, bytes]) -> int:
+        return sum(len(body) for body in entry.values())
+
+    def put(self, data: bytes) -> str:
+        """Stores an encoded payload and returns its graph id."""
+        graph_id = hashlib.sha256(data).hexdigest()[:32]
+        with self._lock:
+            if graph_id in self._entries:
+                self._entries.move_to_end(graph_id)
+                return graph_id
+
+        # Compress outside the lock, it is the slow part
+        entry = {ENCODING_GZIP: gzip.compress(data, compresslevel=_GZIP_LEVEL, mtime=0)}
+        if brotli is not None:
+            entry[ENCODING_BROTLI] = brotli.compress(data, quality=_BROTLI_QUALITY)
+
+        with self._lock:
+            if graph_id not in self._entries:
+                self._entries[graph_id] = entry
+                self._bytes += self._size(entry)
+            self._entries.move_to_end(graph_id)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+        return graph_id
+
+    def get(self, graph_id: str, encoding: str = ENCODING_IDENTITY) -> Optional[Tuple[bytes, str]]:
+        """
+        Returns (body, encoding) for a stored graph, in the requested encoding when it
+        is available, or None if the graph is unknown or was evicted.
+        """
+        with self._lock:
+            entry = self._entries.get(graph_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(graph_id)
+        if encoding in entry:
+            return entry[encoding], encoding
+        return gzip.decompress(entry[ENCODING_GZIP]), ENCODING_IDENTITY
+
+    def __contains__(self, graph_id: str) -> bool:
+        with self._lock:
+            return graph_id in self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"graphs": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+_graph_store: Optional[GraphPayloadStore] = None
+_graph_store_lock = threading.Lock()
+
+
+def get_graph_store() -> GraphPayloadStore:
+    """Returns the process-wide graph payload store."""
+    global _graph_store
+    with _graph_store_lock:
+        if _graph_store is None:
+            _graph_store = GraphPayloadStore()
+        return _graph_store
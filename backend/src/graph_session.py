@@ -0,0 +1,224 @@
+# knowledge_graph_project/src/graph_session.py
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_community.graphs.graph_document import GraphDocument
+
+from src.associational_algorithm import AssociationalOntologyCreator
+from src.graph_merger import IncrementalGraphMerger
+from src.ingest import stream_documents
+from src.request_cache import is_complete_run
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS = int(os.getenv("KG_GRAPH_SESSION_MAX", "100"))
+DEFAULT_SESSION_TTL_SECONDS = float(os.getenv("KG_GRAPH_SESSION_TTL_SECONDS", str(24 * 3600)))
+
+# Generation settings fixed when a session is created; every update extracts with them
+SESSION_SETTINGS = ("llm_name", "api_base", "temp", "chunk_size", "chunk_overlap", "ontology_scope",
+                    "fuzzy_entity_matching", "csv_mode")
+
+
+class GraphSessionLimitError(RuntimeError):
+    """Raised when max_sessions sessions are already open."""
+
+
+def _replaced(name: str) -> Tuple[str, str]:
+    """Merger key for the old version of a document while its replacement is extracted."""
+    return ("replaced", name)
+
+
+class GraphSession:
+    """
+    A graph that grows document by document. The merged state (nodes, de-duplicated
+    edges and their per-document provenance) lives in an IncrementalGraphMerger, so an
+    update only extracts the documents it adds and a removal needs no LLM calls.
+    Updates are serialized per session and run on the job loop.
+    """
+
+    def __init__(self, session_id: str, settings: Dict[str, Any]):
+        self.id = session_id
+        self.settings = {name: settings.get(name) for name in SESSION_SETTINGS}
+        self.merger: Optional[IncrementalGraphMerger] = None
+        # name -> content digest; None if the last extraction of the document was incomplete
+        self.documents: Dict[str, Optional[str]] = {}
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        # Created on the job loop by the first update
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _update_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _new_creator(self, api_key: Optional[str]) -> AssociationalOntologyCreator:
+        return AssociationalOntologyCreator(
+            llm_name=self.settings["llm_name"],
+            api_base=self.settings["api_base"],
+            api_key=api_key,
+            temperature=self.settings["temp"],
+            chunk_size=self.settings["chunk_size"],
+            chunk_overlap=self.settings["chunk_overlap"],
+            fuzzy_entity_matching=self.settings["fuzzy_entity_matching"],
+            csv_mode=self.settings["csv_mode"],
+        )
+
+    async def add_documents(self, files: List[Dict[str, Any]], api_key: Optional[str] = None,
+                            deadline_seconds: Optional[float] = None,
+                            progress_callback=None, result_callback=None, report_callback=None) -> Dict[str, List[str]]:
+        """
+        Extracts the given files and merges them into the session graph. A file whose name
+        is already in the session replaces that document; one with the same content digest
+        ("sha256") is skipped. If extraction fails or is cancelled, the graph is left as it
+        was: added files are taken out again and replaced documents keep their old version.
+
+        Returns:
+            dict: The file names by outcome: "added", "replaced" and "unchanged".
+        """
+        async with self._update_lock():
+            changes = {"added": [], "replaced": [], "unchanged": []}
+            changed_files = []
+            for file in files:
+                name = file["name"]
+                digest = file.get("sha256")
+                if digest is not None and self.documents.get(name) == digest:
+                    changes["unchanged"].append(name)
+                    continue
+                changes["replaced" if name in self.documents else "added"].append(name)
+                changed_files.append(file)
+            if not changed_files:
+                return changes
+
+            creator = self._new_creator(api_key)
+            if self.merger is None:
+                self.merger = creator.new_merger()
+            # The old version of a replaced document is set aside under a key no file name
+            # can take, and only removed once the new version has been extracted
+            for name in changes["replaced"]:
+                self.merger.rename_document(name, _replaced(name))
+            try:
+                await creator.create_associational_ontology_stream(
+                    stream_documents(changed_files),
+                    ontology_scope=self.settings["ontology_scope"],
+                    progress_callback=progress_callback,
+                    result_callback=result_callback,
+                    deadline_seconds=deadline_seconds,
+                    merger=self.merger,
+                )
+            except BaseException:
+                for file in changed_files:
+                    self.merger.remove_document(file["name"])
+                for name in changes["replaced"]:
+                    self.merger.rename_document(_replaced(name), name)
+                raise
+            finally:
+                if report_callback is not None:
+                    report_callback(creator.run_report())
+
+            for name in changes["replaced"]:
+                self.merger.remove_document(_replaced(name))
+            # A partly extracted document stays in the graph but is extracted again when re-sent
+            complete = is_complete_run(creator.run_report())
+            for file in changed_files:
+                self.documents[file["name"]] = file.get("sha256") if complete else None
+            self.updated_at = time.time()
+            logger.info(f"Session {self.id}: added {len(changes['added'])} and replaced {len(changes['replaced'])} "
+                        f"documents, skipped {len(changes['unchanged'])} unchanged.")
+            return changes
+
+    async def remove_documents(self, names: List[str]) -> List[str]:
+        """Takes the named documents out of the session graph. Returns the names that were in it."""
+        async with self._update_lock():
+            removed = [name for name in names if name in self.documents]
+            for name in removed:
+                if self.merger is not None:
+                    self.merger.remove_document(name)
+                del self.documents[name]
+            if removed:
+                self.updated_at = time.time()
+            return removed
+
+    def to_graph_document(self) -> Optional[GraphDocument]:
+        """The merged session graph, or None while it has no nodes."""
+        if self.merger is None or not self.merger.nodes:
+            return None
+        return self.merger.to_graph_document()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status view of the session."""
+        return {
+            "session_id": self.id,
+            "documents": sorted(self.documents),
+            "incomplete_documents": sorted(name for name, digest in self.documents.items() if digest is None),
+            "nodes": len(self.merger.nodes) if self.merger is not None else 0,
+            "edges": len(self.merger.edges) if self.merger is not None else 0,
+            "settings": self.settings,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class GraphSessionStore:
+    """
+    Thread-safe registry of graph sessions in memory. Sessions not updated for
+    ttl_seconds are dropped; at most max_sessions are open at once.
+    """
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, ttl_seconds: float = DEFAULT_SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, GraphSession] = {}
+
+    def create(self, settings: Dict[str, Any]) -> GraphSession:
+        """
+        Opens a new, empty session with the given generation settings.
+        Raises GraphSessionLimitError when max_sessions sessions are already open.
+        """
+        self._purge_expired()
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise GraphSessionLimitError(f"{len(self._sessions)} graph sessions are already open. "
+                                             f"Delete one or try again later.")
+            session = GraphSession(uuid.uuid4().hex, settings)
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[GraphSession]:
+        self._purge_expired()
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def delete(self, session_id: str) -> Optional[GraphSession]:
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [session_id for session_id, session in self._sessions.items() if session.updated_at < cutoff]
+            for session_id in expired:
+                del self._sessions[session_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions}
+
+
+_session_store: Optional[GraphSessionStore] = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> GraphSessionStore:
+    """Returns the process-wide graph session store."""
+    global _session_store
+    with _session_store_lock:
+        if _session_store is None:
+            _session_store = GraphSessionStore()
+        return _session_store
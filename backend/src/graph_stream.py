@@ -0,0 +1,52 @@
+# knowledge_graph_project/src/graph_stream.py
+import json
+from typing import Any, Dict, List
+
+from src.entity_resolution import EntityResolver
+from src.graph_merger import IncrementalGraphMerger
+
+
+class GraphDeltaBuilder:
+    """
+    Folds chunk graph dicts into a running graph as they arrive and returns
+    only what each chunk added, shaped for a vis-network DataSet.
+    Node ids are resolved the same way the final merge resolves them, so the
+    live graph lines up with the final rendered one.
+    """
+
+    def __init__(self, fuzzy_entity_matching: bool = False):
+        resolver = EntityResolver(fuzzy=fuzzy_entity_matching)
+        self.merger = IncrementalGraphMerger(normalize_id=resolver.resolve)
+
+    def add(self, gd_dict: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Merges one chunk result and returns {"nodes": [...], "edges": [...]} with the
+        nodes that are new or gained a document, and the edges that became complete.
+        """
+        delta = self.merger.add(gd_dict)
+        return {
+            "nodes": [self._node_view(node_id) for node_id in delta["nodes"]],
+            "edges": [self._edge_view(edge_key) for edge_key in delta["edges"]],
+        }
+
+    def _node_view(self, node_id: str) -> Dict[str, Any]:
+        node = self.merger.nodes[node_id]
+        return {
+            "id": node_id,
+            "label": node_id,
+            "group": node["type"],
+            "title": " ".join(sorted(node["documents"])),
+        }
+
+    @staticmethod
+    def _edge_view(edge_key) -> Dict[str, Any]:
+        source, target, rel_type = edge_key
+        label = rel_type.lower()
+        return {"id": f"{source}→{target}:{label}", "from": source, "to": target, "label": label}
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Formats one Server-Sent Events frame with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,467 @@
+# knowledge_graph_project/src/graph_template.py
+import json
+import string
+from typing import Any, Dict, List
+
+# Same vis-network and bootstrap builds pyvis linked to with cdn_resources="remote"
+_VIS_CSS = ('<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/dist/vis-network.min.css" '
+            'integrity="sha512-WgxfT5LWjfszlPHXRmBWHkV2eceiWTOBvrKCNbdgDYTHrT2AeLCGbF4sZlZw3UMN3WtL0tGUoIAKsu8mllg/XA==" '
+            'crossorigin="anonymous" referrerpolicy="no-referrer" />')
+_VIS_JS = ('<script src="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/vis-network.min.js" '
+           'integrity="sha512-LnvoEWDFrqGHlHmDD2101OrLcbsfkrzoSpvtSQtxK3RMnRV0eOkhhBN2dXHKRrUU8p2DGRTk35n4O8nWSVe1mQ==" '
+           'crossorigin="anonymous" referrerpolicy="no-referrer"></script>')
+_BOOTSTRAP_CSS = ('<link href="https://cdn.jsdelivr.net/npm/bootstrap@5.0.0-beta3/dist/css/bootstrap.min.css" rel="stylesheet" '
+                  'integrity="sha384-eOJMYsd53ii+scO/bJGFsiCZc+5NDVN2yr8+0RDqr0Ql0h+rP48ckxlpbzKgwra6" crossorigin="anonymous" />')
+
+FILTER_MENU_HTML = """
+<div class="card" style="width: 100%; margin-bottom: 10px;">
+    <div class="card-header" style="background-color: #333; padding: 15px;">
+        <div style="display: flex; gap: 10px; align-items: center; flex-wrap: wrap;">
+            <select id="filterItem" style="padding: 8px; min-width: 150px;">
+                <option value="node" selected>Node</option>
+                <option value="edge">Edge</option>
+            </select>
+            <select id="filterProperty" style="padding: 8px; min-width: 150px;">
+                <option value="">Select Property</option>
+            </select>
+            <select id="filterValue" multiple style="padding: 8px; min-width: 200px; height: 100px;">
+                <option value="">Select a property first</option>
+            </select>
+            <button onclick="addCurrentFilter()" style="padding: 8px 20px; background-color: #007bff; color: white; border: none; cursor: pointer; border-radius: 4px;">Add Filter</button>
+            <button onclick="resetAllFilters()" style="padding: 8px 20px; background-color: #6c757d; color: white; border: none; cursor: pointer; border-radius: 4px;">Reset</button>
+        </div>
+        <div id="active-filters" style="margin-top:10px; color:white;"></div>
+    </div>
+</div>
+"""
+
+# Waits for the network, sets the initial view and wires up FILTER_MENU_HTML
+FILTER_MENU_JS = """
+<script>
+(function(){
+  let stabilizationFired = false;
+
+  document.addEventListener("DOMContentLoaded", function() {
+    const waitForNetwork = setInterval(() => {
+      const netReady = (typeof network !== "undefined");
+      const nodesReady = (typeof nodes !== "undefined");
+      const edgesReady = (typeof edges !== "undefined");
+
+      if (netReady && nodesReady && edgesReady) {
+        clearInterval(waitForNetwork);
+
+        // Server-side layout: every node has coordinates and nothing to stabilize
+        if (nodes.get({ filter: node => node.x === undefined }).length === 0) {
+          stabilizationFired = true;
+          setInitialView(false);
+          initFilterMenu();
+          return;
+        }
+
+        // Set initial view after stabilization
+        network.once("stabilizationIterationsDone", () => {
+          stabilizationFired = true;
+          setInitialView();
+        });
+
+        network.on("stabilized", (params) => {
+          if (!stabilizationFired) {
+            setInitialView();
+          }
+        });
+
+        // Fallback in case stabilization events don't fire
+        setTimeout(() => {
+          if (!stabilizationFired) {
+            setInitialView();
+          }
+        }, 3000);
+
+        initFilterMenu();
+      }
+    }, 300);
+  });
+
+  function setInitialView(animate = true) {
+    if (typeof network === "undefined") return;
+
+    // Fit the viewport to the bounds of the laid out graph
+    network.fit({
+      animation: animate ? { duration: 800, easingFunction: "easeInOutQuad" } : false
+    });
+  }
+
+  function initFilterMenu() {
+    let filters = [];
+    let filter = { item: 'node', property: '', value: [] };
+
+    document.getElementById('filterItem').addEventListener('change', function() {
+      filter.item = this.value;
+      rebuildPropertyOptions();
+    });
+
+    document.getElementById('filterProperty').addEventListener('change', function() {
+      filter.property = this.value;
+      const valueSelect = document.getElementById('filterValue');
+      valueSelect.innerHTML = '<option value="">Loading...</option>';
+
+      if (!filter.property) {
+        valueSelect.innerHTML = '<option value="">Select a property first</option>';
+        return;
+      }
+
+      const allItems = (filter.item === 'node') ? nodes.get() : edges.get();
+      const uniqueValues = new Set();
+      allItems.forEach(item => {
+        const val = item[filter.property];
+        if (val !== undefined && val !== null) uniqueValues.add(String(val));
+      });
+
+      const sortedValues = Array.from(uniqueValues).sort((a, b) => {
+        const numA = parseFloat(a), numB = parseFloat(b);
+        if (!isNaN(numA) && !isNaN(numB)) return numA - numB;
+        return a.localeCompare(b);
+      });
+
+      valueSelect.innerHTML = '';
+      sortedValues.forEach(value => {
+        const option = document.createElement('option');
+        option.value = value;
+        option.textContent = value;
+        valueSelect.appendChild(option);
+      });
+    });
+
+    function rebuildPropertyOptions() {
+      const propertySelect = document.getElementById('filterProperty');
+      propertySelect.innerHTML = '<option value="">Select Property</option>';
+      const sample = (filter.item === 'node') ? nodes.get()[0] : edges.get()[0];
+      if (!sample) return;
+      Object.keys(sample).forEach(key => {
+        const opt = document.createElement('option');
+        opt.value = key;
+        opt.textContent = key;
+        propertySelect.appendChild(opt);
+      });
+    }
+
+    window.addCurrentFilter = function() {
+      const valueSelect = document.getElementById('filterValue');
+      filter.value = Array.from(valueSelect.selectedOptions).map(opt => opt.value);
+      if (!filter.property || filter.value.length === 0) {
+        alert('Please select a property and at least one value.');
+        return;
+      }
+
+      filters.push({ item: filter.item, property: filter.property, value: [...filter.value] });
+      applyFilters();
+      renderActiveFilters();
+    }
+
+    function applyFilters() {
+      const allNodes = nodes.get({ returnType: "Object" });
+      const allEdges = edges.get({ returnType: "Object" });
+
+      let visibleNodes = new Set(Object.keys(allNodes));
+      let visibleEdges = new Set(Object.keys(allEdges));
+
+      filters.forEach(f => {
+        const passingNodes = new Set();
+        const passingEdges = new Set();
+
+        if (f.item === 'node') {
+          for (let id in allNodes) {
+            const val = allNodes[id][f.property];
+            if (val !== undefined && f.value.includes(String(val))) {
+              passingNodes.add(id);
+            }
+          }
+        } else if (f.item === 'edge') {
+          for (let id in allEdges) {
+            const val = allEdges[id][f.property];
+            if (val !== undefined && f.value.includes(String(val))) {
+              passingEdges.add(id);
+              passingNodes.add(allEdges[id].from);
+              passingNodes.add(allEdges[id].to);
+            }
+          }
+        }
+
+        visibleNodes = new Set([...visibleNodes].filter(id => passingNodes.has(id)));
+        visibleEdges = new Set([...visibleEdges].filter(id => passingEdges.has(id)));
+      });
+
+      // Only items whose visibility changes are sent, as partial {id, hidden} updates
+      const updateNodeArray = [];
+      for (let id in allNodes) {
+        const hidden = filters.length > 0 && !visibleNodes.has(id);
+        if (Boolean(allNodes[id].hidden) !== hidden) {
+          updateNodeArray.push({ id: allNodes[id].id, hidden });
+        }
+      }
+      nodes.update(updateNodeArray);
+
+      const updateEdgeArray = [];
+      for (let id in allEdges) {
+        const e = allEdges[id];
+        const bothVisible = visibleNodes.has(String(e.from)) && visibleNodes.has(String(e.to));
+        const shouldShow =
+          filters.length === 0 ||
+          visibleEdges.has(id) ||
+          bothVisible;
+
+        if (Boolean(e.hidden) === shouldShow) {
+          updateEdgeArray.push({ id: e.id, hidden: !shouldShow });
+        }
+      }
+      edges.update(updateEdgeArray);
+    }
+
+    window.resetAllFilters = function() {
+      filters = [];
+      applyFilters();
+      renderActiveFilters();
+    }
+
+    function renderActiveFilters() {
+      const container = document.getElementById('active-filters');
+      if (filters.length === 0) {
+        container.innerHTML = "<i>No active filters</i>";
+        return;
+      }
+
+      container.innerHTML = filters.map((f, i) =>
+        `<span style="color:white; background:#555; padding:3px 6px; border-radius:4px; margin-right:5px;">
+          ${f.item}.${f.property}: ${f.value.join(', ')}
+          <button onclick='removeFilter(${i})' style='margin-left:5px; background:red; color:white; border:none; border-radius:3px; cursor:pointer;'>×</button>
+        </span>`
+      ).join('');
+    }
+
+    window.removeFilter = function(index) {
+      filters.splice(index, 1);
+      applyFilters();
+      renderActiveFilters();
+    }
+
+    rebuildPropertyOptions();
+  }
+})();
+</script>
+"""
+
+# Compiled once at import. $graph_script hands the graph to drawGraph, which sets the
+# nodes, edges and network globals FILTER_MENU_JS waits for.
+_PAGE_TEMPLATE = string.Template("""<html>
+<head>
+<meta charset="utf-8">
+$vis_css
+$vis_js
+$bootstrap_css
+<style type="text/css">
+#mynetwork {
+    width: $width;
+    height: $height;
+    background-color: $bgcolor;
+    border: 1px solid lightgray;
+    position: relative;
+    float: left;
+}
+</style>
+</head>
+<body>
+<div class="card" style="width: 100%">
+$filter_html
+<div id="mynetwork" class="card-body"></div>
+</div>
+<script type="text/javascript">
+var nodes, edges, network;
+
+function drawGraph(graph) {
+    graph.nodes.forEach(function(node) {
+        if (node.label === undefined) node.label = node.id;
+    });
+    nodes = new vis.DataSet(graph.nodes);
+    edges = new vis.DataSet(graph.edges);
+    network = new vis.Network(document.getElementById("mynetwork"), {nodes: nodes, edges: edges}, graph.options);
+    return network;
+}
+</script>
+$graph_script
+$filter_js
+</body>
+</html>
+""")
+
+
+# The graph inlined as one JSON payload, parsed with JSON.parse
+_INLINE_GRAPH_SCRIPT = string.Template("""<script type="application/json" id="graph-data">$graph_json</script>
+<script type="text/javascript">
+drawGraph(JSON.parse(document.getElementById("graph-data").textContent));
+</script>""")
+
+# Fetches the columnar payload from src.graph_payload named by ?graph=<id>, relative to
+# the viewer's /graphs/viewer/ URL, and expands it into vis-network items. Cluster
+# supernodes from src.graph_lod load their members from the same endpoint on double-click.
+_VIEWER_GRAPH_SCRIPT = """<script type="text/javascript">
+function graphDataUrl(graphId) {
+    return new URL("../" + encodeURIComponent(graphId) + "/data/", window.location.href);
+}
+
+function fetchGraph(graphId) {
+    return fetch(graphDataUrl(graphId)).then(function(response) {
+        if (!response.ok) throw new Error("Graph could not be loaded (" + response.status + ")");
+        return response.json();
+    });
+}
+
+function edgeId(edge) {
+    return edge.from + "→" + edge.to + ":" + edge.label;
+}
+
+function decodeGraph(payload) {
+    var strings = payload.strings, columns = payload.nodes, edgeColumns = payload.edges;
+    var nodeCount = columns.type.length;
+    var graphNodes = new Array(nodeCount);
+    for (var i = 0; i < nodeCount; i++) {
+        var docs = [];
+        for (var j = columns.doc_offsets[i]; j < columns.doc_offsets[i + 1]; j++) {
+            docs.push(strings.documents[columns.docs[j]]);
+        }
+        var node = {id: strings.ids[i], title: docs.join(" ") + " ", group: strings.types[columns.type[i]],
+                    node_weight: columns.weight[i]};
+        if (columns.x) {
+            node.x = columns.x[i];
+            node.y = columns.y[i];
+        }
+        graphNodes[i] = node;
+    }
+    var clusters = payload.clusters;
+    if (clusters) {
+        for (var c = 0; c < clusters.node.length; c++) {
+            var supernode = graphNodes[clusters.node[c]];
+            supernode.label = clusters.label[c];
+            supernode.shape = "diamond";
+            supernode.size = 20 + Math.min(30, 2 * Math.sqrt(clusters.members[c]));
+            supernode.title = clusters.members[c] + " nodes, double-click to expand";
+            supernode.cluster_graph = clusters.graph[c];
+        }
+    }
+    var graphEdges = new Array(edgeColumns.source.length);
+    for (var k = 0; k < edgeColumns.source.length; k++) {
+        graphEdges[k] = {from: strings.ids[edgeColumns.source[k]], to: strings.ids[edgeColumns.target[k]],
+                         label: strings.relations[edgeColumns.relation[k]], edge_weight: edgeColumns.weight[k]};
+        graphEdges[k].id = edgeId(graphEdges[k]);
+    }
+    // Endpoints outside an expanded cluster, and the supernode each is hidden in
+    var external = {};
+    if (payload.external) {
+        for (var e = nodeCount; e < strings.ids.length; e++) {
+            external[strings.ids[e]] = payload.external.cluster[e - nodeCount];
+        }
+    }
+    return {nodes: graphNodes, edges: graphEdges, options: payload.options, external: external};
+}
+
+// Replaces a supernode with its members, attaching their edges to whatever currently
+// shows the other endpoint: the node itself or the supernode it is still hidden in
+function expandCluster(nodeId) {
+    var supernode = nodes.get(nodeId);
+    if (!supernode || !supernode.cluster_graph || supernode.expanding) return;
+    nodes.update({id: nodeId, expanding: true});
+    fetchGraph(supernode.cluster_graph)
+        .then(function(payload) {
+            var graph = decodeGraph(payload);
+            edges.remove(network.getConnectedEdges(nodeId));
+            nodes.remove(nodeId);
+            graph.nodes.forEach(function(node) {
+                if (node.label === undefined) node.label = node.id;
+            });
+            nodes.update(graph.nodes);
+            var shown = function(id) {
+                if (nodes.get(id)) return id;
+                var cluster = graph.external[id];
+                return cluster && nodes.get(cluster) ? cluster : null;
+            };
+            var attached = [];
+            graph.edges.forEach(function(edge) {
+                var from = shown(edge.from), to = shown(edge.to);
+                if (from === null || to === null) return;
+                // Both ends hidden in the same other supernode
+                if (from === to && edge.from !== edge.to) return;
+                edge.from = from;
+                edge.to = to;
+                edge.id = edgeId(edge);
+                attached.push(edge);
+            });
+            edges.update(attached);
+        })
+        .catch(function(error) {
+            nodes.update({id: nodeId, expanding: false});
+            alert(error.message);
+        });
+}
+
+(function() {
+    var graphId = new URLSearchParams(window.location.search).get("graph");
+    var container = document.getElementById("mynetwork");
+    if (!graphId) {
+        container.textContent = "No graph selected.";
+        return;
+    }
+    fetchGraph(graphId)
+        .then(function(payload) {
+            drawGraph(decodeGraph(payload));
+            network.on("doubleClick", function(params) {
+                if (params.nodes.length === 1) expandCluster(params.nodes[0]);
+            });
+        })
+        .catch(function(error) {
+            container.style.color = "white";
+            container.textContent = error.message;
+        });
+})();
+</script>"""
+
+
+def graph_json(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], options: Dict[str, Any]) -> str:
+    """
+    Serializes the graph compactly for embedding in a <script> element. "</" is
+    escaped so node text can never close the element early.
+    """
+    payload = json.dumps({"nodes": nodes, "edges": edges, "options": options},
+                         separators=(",", ":"), ensure_ascii=False)
+    return payload.replace("</", "<\\/")
+
+
+def render_graph_html(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], options: Dict[str, Any],
+                      width: str = "4000px", height: str = "3000px", bgcolor: str = "#222222") -> str:
+    """
+    Renders the graph page in memory. nodes and edges are vis-network items; a node
+    without a label is labelled with its id. Settings shared by every node or edge
+    belong in options rather than on each item.
+    """
+    graph_script = _INLINE_GRAPH_SCRIPT.substitute(graph_json=graph_json(nodes, edges, options))
+    return _render_page(graph_script, width, height, bgcolor)
+
+
+def render_graph_viewer_html(width: str = "4000px", height: str = "3000px", bgcolor: str = "#222222") -> str:
+    """
+    Renders the graph viewer page, which loads /graphs/<id>/data/ for the graph id in
+    its ?graph= query parameter. The page is the same for every graph.
+    """
+    return _render_page(_VIEWER_GRAPH_SCRIPT, width, height, bgcolor)
+
+
+def _render_page(graph_script: str, width: str, height: str, bgcolor: str) -> str:
+    return _PAGE_TEMPLATE.substitute(
+        vis_css=_VIS_CSS,
+        vis_js=_VIS_JS,
+        bootstrap_css=_BOOTSTRAP_CSS,
+        width=width,
+        height=height,
+        bgcolor=bgcolor,
+        filter_html=FILTER_MENU_HTML,
+        graph_script=graph_script,
+        filter_js=FILTER_MENU_JS,
+    )
@@ -0,0 +1,130 @@
+# knowledge_graph_project/src/ingest.py
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import traceback
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from src.file_reader import read_text_file, read_csv_file, iter_pdf_pages, read_doc_file
+
+logger = logging.getLogger(__name__)
+
+# Extracted text segments buffered between the file readers and the chunker
+INGEST_QUEUE_SIZE = int(os.getenv("KG_INGEST_QUEUE_SIZE", "64"))
+
+# How often a blocked reader thread checks whether the consumer went away
+_PUT_POLL_SECONDS = 1.0
+
+SUPPORTED_EXTENSIONS = (".txt", ".csv", ".pdf", ".docx")
+
+
+class _IngestStopped(Exception):
+    pass
+
+
+def iter_file_segments(file_obj, file_extension: str) -> Iterator[Union[str, pd.DataFrame]]:
+    """
+    Yields the content of one file in the pieces its reader produces: one segment per
+    PDF page, the DataFrame for CSV files and the whole text for other types.
+    """
+    if file_extension == ".txt":
+        yield read_text_file(file_obj)
+    elif file_extension == ".csv":
+        df = read_csv_file(file_obj)
+        if df is not None and not df.empty:
+            yield df
+    elif file_extension == ".pdf":
+        for page in iter_pdf_pages(file_obj):
+            yield page + "\n"
+    elif file_extension == ".docx":
+        yield read_doc_file(file_obj)
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+
+
+async def stream_documents(
+    files: Optional[List[Dict[str, Union[str, bytes]]]] = None,
+    raw_text: Optional[str] = None
+) -> AsyncIterator[Tuple[int, str, Union[str, pd.DataFrame, None]]]:
+    """
+    Reads all uploads concurrently in worker threads and yields (doc_index, name, segment)
+    as soon as each text segment or CSV DataFrame is extracted, then (doc_index, name, None)
+    once that document is complete. The queue to the consumer is bounded, so a slow consumer pauses the readers.
+    """
+    loop = asyncio.get_running_loop()
+    segments = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    stopped = threading.Event()
+
+    def put(item):
+        future = asyncio.run_coroutine_threadsafe(segments.put(item), loop)
+        while True:
+            try:
+                return future.result(timeout=_PUT_POLL_SECONDS)
+            except concurrent.futures.TimeoutError:
+                if stopped.is_set():
+                    future.cancel()
+                    raise _IngestStopped()
+
+    def read_file(doc_index: int, file_dict):
+        file_name = file_dict.get('name', 'unknown')
+        file_content = file_dict.get('content')
+        file_extension = file_dict.get('extension', Path(file_name).suffix).lower()
+        logger.info(f"Processing file: {file_name} ({file_extension})")
+
+        chars = 0
+        try:
+            if file_extension not in SUPPORTED_EXTENSIONS:
+                logger.warning(f"Skipping unsupported file type: {file_extension}")
+                return
+            # Reset stream position
+            if file_content is not None and hasattr(file_content, 'seek'):
+                file_content.seek(0)
+            for segment in iter_file_segments(file_content, file_extension):
+                is_table = isinstance(segment, pd.DataFrame)
+                if is_table or segment:
+                    chars += int(segment.size) if is_table else len(segment)
+                    put((doc_index, file_name, segment))
+            if chars:
+                logger.info(f"Read {chars} chars (or table cells) from {file_name}")
+            else:
+                logger.warning(f"Extracted empty content from {file_name}")
+        except _IngestStopped:
+            return
+        except Exception as e:
+            # One unreadable file should not stop the others
+            logger.error(f"Error reading file {file_name}: {e}")
+            traceback.print_exc()
+        finally:
+            if not stopped.is_set():
+                try:
+                    put((doc_index, file_name, None))
+                except _IngestStopped:
+                    pass
+
+    sources = []
+    if raw_text:
+        sources.append(("raw_text", raw_text))
+    readers = [
+        asyncio.ensure_future(asyncio.to_thread(read_file, doc_index, file_dict))
+        for doc_index, file_dict in enumerate(files or [], start=len(sources))
+    ]
+
+    try:
+        for doc_index, (name, text) in enumerate(sources):
+            yield doc_index, name, text
+            yield doc_index, name, None
+
+        remaining = len(readers)
+        while remaining:
+            item = await segments.get()
+            if item[2] is None:
+                remaining -= 1
+            yield item
+    finally:
+        # Unblocks readers still waiting on a full queue if the consumer stopped early
+        stopped.set()
@@ -0,0 +1,191 @@
+# knowledge_graph_project/src/job_queue.py
+import asyncio
+import logging
+import os
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = int(os.getenv("KG_JOB_WORKERS", "4"))
+DEFAULT_MAX_PENDING = int(os.getenv("KG_JOB_MAX_PENDING", "100"))
+DEFAULT_RESULT_TTL_SECONDS = float(os.getenv("KG_JOB_RESULT_TTL_SECONDS", "3600"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobQueueFullError(RuntimeError):
+    """Raised when too many jobs are already queued or running."""
+
+
+class Job:
+    """
+    State of one background pipeline run. Fields are written on the job loop
+    thread and read by request threads.
+    """
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = JOB_QUEUED
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future = None
+
+    def update_progress(self, **progress):
+        self.progress = {**self.progress, **progress}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status view of the job, without the result payload."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs pipeline coroutines on one long-lived event loop in a background thread.
+    At most max_workers jobs and run() calls run at once; finished jobs are kept for
+    result_ttl_seconds.
+
+    Jobs live in process memory, so the server should run as a single process
+    (e.g. gunicorn -w 1 --threads 8) for status polling to find them.
+    """
+
+    def __init__(self,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING,
+                 result_ttl_seconds: float = DEFAULT_RESULT_TTL_SECONDS):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl_seconds = result_ttl_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        # Lifetime count, unlike the per-status counts in stats() which only cover retained jobs
+        self.cancelled_jobs = 0
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="kg-job-loop", daemon=True)
+        self._thread.start()
+        self._worker_slots = asyncio.run_coroutine_threadsafe(self._make_semaphore(), self.loop).result()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _make_semaphore(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.max_workers)
+
+    def submit(self, job_fn: Callable[[Job], Awaitable[Any]]) -> Job:
+        """
+        Queues job_fn(job) on the job loop and returns the Job immediately.
+        Raises JobQueueFullError when max_pending jobs are already unfinished.
+        """
+        self._purge_expired()
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.status not in FINISHED_STATES)
+            if pending >= self.max_pending:
+                raise JobQueueFullError(f"{pending} jobs are already pending. Try again later.")
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+
+        job.future = asyncio.run_coroutine_threadsafe(self._run_job(job, job_fn), self.loop)
+        return job
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        """
+        Runs a coroutine on the job loop and blocks until it finishes.
+        Lets synchronous callers share the long-lived loop instead of asyncio.run.
+        The coroutine takes one of the max_workers slots, like a submitted job.
+        """
+        return asyncio.run_coroutine_threadsafe(self._run_in_slot(coro), self.loop).result()
+
+    async def _run_in_slot(self, coro: Awaitable[Any]) -> Any:
+        async with self._worker_slots:
+            return await coro
+
+    async def _run_job(self, job: Job, job_fn: Callable[[Job], Awaitable[Any]]):
+        try:
+            async with self._worker_slots:
+                job.status = JOB_RUNNING
+                job.started_at = time.time()
+                job.result = await job_fn(job)
+                job.status = JOB_SUCCEEDED
+        except asyncio.CancelledError:
+            logger.info(f"Job {job.id} cancelled while {job.status}.")
+            job.status = JOB_CANCELLED
+            with self._lock:
+                self.cancelled_jobs += 1
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            logger.debug(traceback.format_exc())
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancels a queued or running job. The cancellation reaches the pipeline as
+        asyncio.CancelledError, which cancels its pending and in-flight LLM calls.
+        Returns the job, or None for unknown ids; finished jobs are left as they are.
+        """
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED_STATES and job.future is not None:
+            job.future.cancel()
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        """Retained jobs per status, plus the lifetime number of cancelled jobs."""
+        with self._lock:
+            counts = {status: 0 for status in (JOB_QUEUED, JOB_RUNNING) + FINISHED_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            counts["cancelled_total"] = self.cancelled_jobs
+        return counts
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.result_ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+_job_manager: Optional[JobManager] = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """
+    Returns the process-wide JobManager, starting its loop thread on first use.
+    """
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager()
+        return _job_manager
@@ -0,0 +1,94 @@
+# knowledge_graph_project/src/json_parsing.py
+import json
+import threading
+from typing import Any, Dict, Tuple
+
+from json_repair import repair_json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PARSE_STRICT = "strict"
+PARSE_REPAIRED = "repaired"
+PARSE_FAILED = "failed"
+
+
+class LLMJSONError(ValueError):
+    """An LLM response that could not be parsed as JSON, even after repair."""
+
+
+def _loads(text: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _strip_fences(text: str) -> str:
+    """Removes a surrounding ```json ... ``` fence without a regex pass over the body."""
+    text = text.strip()
+    if text.startswith("```"):
+        first_newline = text.find("\n")
+        text = text[first_newline + 1:] if first_newline != -1 else text[3:]
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+
+def parse_llm_json(response_text: str) -> Tuple[Any, str]:
+    """
+    Parses an LLM response as JSON. Tries a strict parse of the fence-stripped text,
+    then of the outermost {...} span, and only runs json-repair when both fail.
+
+    Returns:
+        (value, outcome) where outcome is PARSE_STRICT or PARSE_REPAIRED.
+
+    Raises:
+        LLMJSONError: If the response cannot be parsed.
+    """
+    text = _strip_fences(response_text or "")
+    try:
+        return _loads(text), PARSE_STRICT
+    except ValueError:
+        pass
+
+    # Prose around the object, e.g. "Here is the graph: {...}"
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end and (start > 0 or end < len(text) - 1):
+        try:
+            return _loads(text[start:end + 1]), PARSE_STRICT
+        except ValueError:
+            pass
+
+    try:
+        repaired = repair_json(text)
+        if not repaired or repaired == '""':
+            raise ValueError("json-repair returned no JSON")
+        return json.loads(repaired), PARSE_REPAIRED
+    except Exception as e:
+        raise LLMJSONError(f"Failed to parse or repair JSON response: {e}") from e
+
+
+class ParseStats:
+    """Thread-safe counts of strict, repaired and failed response parses."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {PARSE_STRICT: 0, PARSE_REPAIRED: 0, PARSE_FAILED: 0}
+
+    def record(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def to_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+# Process-wide totals across all requests, served by the /stats/ endpoint
+_parse_stats = ParseStats()
+
+
+def get_parse_stats() -> ParseStats:
+    return _parse_stats
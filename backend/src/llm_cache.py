@@ -0,0 +1,176 @@
+# knowledge_graph_project/src/llm_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.getenv("KG_LLM_CACHE_PATH", os.path.join(_BACKEND_DIR, ".cache", "llm_chunks.sqlite3"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("KG_LLM_CACHE_MAX_ENTRIES", "50000"))
+DEFAULT_MAX_BYTES = int(os.getenv("KG_LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+DEFAULT_MAX_AGE_SECONDS = float(os.getenv("KG_LLM_CACHE_MAX_AGE_SECONDS", str(30 * 24 * 3600)))
+
+# Eviction scans the whole table, so only run it every N writes.
+_EVICT_EVERY_N_WRITES = 200
+
+
+class ChunkResultCache:
+    """
+    On-disk SQLite cache of parsed LLM graph results, one row per chunk.
+    Rows are keyed by a hash of the chunk text and everything that changes
+    the LLM output (model, api base, prompt version, temperature).
+    """
+
+    def __init__(self,
+                 path: str = DEFAULT_CACHE_PATH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS):
+        """
+        Args:
+            path (str): SQLite file location. The parent directory is created if needed.
+            max_entries (int): Maximum number of cached chunks before LRU eviction.
+            max_bytes (int): Maximum total size of cached values before LRU eviction.
+            max_age_seconds (float): Entries older than this are treated as misses and evicted.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_results ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "created REAL NOT NULL, "
+                "accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_results_accessed ON chunk_results (accessed)")
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(text_chunk: str, model_name, api_base, prompt_version, temperature, pipeline: str = "") -> str:
+        """
+        Builds the cache key for a chunk. Any argument that changes the LLM output belongs here.
+        """
+        hasher = hashlib.sha256()
+        for part in (pipeline, model_name, api_base, prompt_version, temperature):
+            hasher.update(str(part).encode("utf-8"))
+            hasher.update(b"\x00")
+        hasher.update(text_chunk.encode("utf-8", errors="replace"))
+        return hasher.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached graph dict for a key, or None on a miss or expired entry.
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, created FROM chunk_results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or now - row[1] > self.max_age_seconds:
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE chunk_results SET accessed = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+            return json.loads(row[0])
+        except Exception as e:
+            logger.warning(f"Chunk cache read failed: {e}")
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """
+        Stores a parsed graph dict for a key.
+        """
+        try:
+            payload = json.dumps(value, default=list)
+            now = time.time()
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chunk_results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, len(payload), now, now)
+                )
+                self._conn.commit()
+                self._writes += 1
+                if self._writes % _EVICT_EVERY_N_WRITES == 0:
+                    self._evict_locked(now)
+        except Exception as e:
+            logger.warning(f"Chunk cache write failed: {e}")
+
+    def evict(self) -> None:
+        """
+        Drops expired entries, then least recently used ones until the size limits hold.
+        """
+        with self._lock:
+            self._evict_locked(time.time())
+
+    def _evict_locked(self, now: float) -> None:
+        self._conn.execute("DELETE FROM chunk_results WHERE created < ?", (now - self.max_age_seconds,))
+
+        count, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chunk_results"
+        ).fetchone()
+        if count > self.max_entries or total_bytes > self.max_bytes:
+            # Walk from the least recently used end and find the cut-off point.
+            excess_entries = max(0, count - self.max_entries)
+            excess_bytes = max(0, total_bytes - self.max_bytes)
+            removed_entries = 0
+            removed_bytes = 0
+            cutoff = None
+            for accessed, size in self._conn.execute("SELECT accessed, size FROM chunk_results ORDER BY accessed ASC"):
+                if removed_entries >= excess_entries and removed_bytes >= excess_bytes:
+                    break
+                removed_entries += 1
+                removed_bytes += size
+                cutoff = accessed
+            if cutoff is not None:
+                self._conn.execute("DELETE FROM chunk_results WHERE accessed <= ?", (cutoff,))
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns process-lifetime hit/miss counters.
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_chunk_cache: Optional[ChunkResultCache] = None
+_chunk_cache_lock = threading.Lock()
+
+
+def get_chunk_cache() -> Optional[ChunkResultCache]:
+    """
+    Returns the process-wide chunk cache, or None if disabled with KG_LLM_CACHE=0
+    or if the cache file cannot be opened.
+    """
+    global _chunk_cache
+    if os.getenv("KG_LLM_CACHE", "1") == "0":
+        return None
+    with _chunk_cache_lock:
+        if _chunk_cache is None:
+            try:
+                _chunk_cache = ChunkResultCache()
+            except Exception as e:
+                logger.warning(f"Chunk cache disabled, could not open {DEFAULT_CACHE_PATH}: {e}")
+                return None
+        return _chunk_cache
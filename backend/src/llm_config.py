@@ -1,22 +1,110 @@
 # knowledge_graph_project/src/llm_config.py
 
+import hashlib
 import os
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 
 load_dotenv()
 
-def get_llm(temperature=0, model_name=None, api_base=None, api_key=None):
+# Maximum number of distinct (base_url, api_key, model, temperature) clients kept alive
+LLM_POOL_SIZE = int(os.getenv("KG_LLM_POOL_SIZE", "16"))
+
+# Ask for response_format={"type": "json_object"} on JSON-producing chains. Providers that
+# reject it are detected on the first failing call and switched back to plain output.
+LLM_JSON_MODE = os.getenv("KG_LLM_JSON_MODE", "1").lower() not in ("0", "false", "no", "off")
+
+_llm_pool = OrderedDict()
+_llm_pool_lock = threading.Lock()
+
+
+def _create_llm(temperature=0, model_name=None, api_base=None, api_key=None):
     """
-    Returns an LLM instance
+    Builds a new ChatOpenAI client.
     """
         # openai_api_base=lm_studio_api_base,
     llm_instance = ChatOpenAI(
             base_url=api_base,
             api_key=api_key,
             model=model_name,
-            temperature=temperature
+            temperature=temperature,
+            # Retries and 429 backoff are handled by src.rate_limiter, which needs to see them
+            max_retries=0
     )
 
     print(f"Successfully configured ChatOpenAI for LM Studio model: {model_name}")
-    return llm_instance
\ No newline at end of file
+    return llm_instance
+
+
+def _get_pool_entry(temperature=0, model_name=None, api_base=None, api_key=None):
+    """
+    Returns the pooled {"llm", "chains"} entry for these settings, creating it if needed
+    and evicting the least recently used entry once LLM_POOL_SIZE is exceeded.
+    """
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+    pool_key = (api_base, key_hash, model_name, float(temperature or 0))
+
+    with _llm_pool_lock:
+        entry = _llm_pool.get(pool_key)
+        if entry is not None:
+            _llm_pool.move_to_end(pool_key)
+            return entry
+
+        entry = {"llm": _create_llm(temperature, model_name, api_base, api_key), "chains": {},
+                 "json_mode": LLM_JSON_MODE}
+        _llm_pool[pool_key] = entry
+        while len(_llm_pool) > LLM_POOL_SIZE:
+            _llm_pool.popitem(last=False)
+        return entry
+
+
+def get_llm(temperature=0, model_name=None, api_base=None, api_key=None):
+    """
+    Returns an LLM instance, reused across calls with the same settings so its
+    HTTP connections (and TLS sessions) stay warm.
+    """
+    return _get_pool_entry(temperature, model_name, api_base, api_key)["llm"]
+
+
+def get_chain(name, prompt, temperature=0, model_name=None, api_base=None, api_key=None, json_mode=False):
+    """
+    Returns prompt | llm for the pooled client, built once per chain name and client.
+    With json_mode the client is bound to JSON output; returns None if JSON mode is off
+    or the provider does not support it.
+    """
+    entry = _get_pool_entry(temperature, model_name, api_base, api_key)
+    with _llm_pool_lock:
+        if json_mode and not entry["json_mode"]:
+            return None
+        chain_key = f"{name}:json" if json_mode else name
+        chain = entry["chains"].get(chain_key)
+        if chain is None:
+            llm = entry["llm"].bind(response_format={"type": "json_object"}) if json_mode else entry["llm"]
+            chain = prompt | llm
+            entry["chains"][chain_key] = chain
+        return chain
+
+
+def json_mode_enabled(temperature=0, model_name=None, api_base=None, api_key=None) -> bool:
+    return _get_pool_entry(temperature, model_name, api_base, api_key)["json_mode"]
+
+
+def disable_json_mode(temperature=0, model_name=None, api_base=None, api_key=None) -> bool:
+    """
+    Stops using JSON mode for this client after the provider rejected it.
+    Returns True if JSON mode was still on.
+    """
+    entry = _get_pool_entry(temperature, model_name, api_base, api_key)
+    with _llm_pool_lock:
+        was_enabled = entry["json_mode"]
+        entry["json_mode"] = False
+        return was_enabled
+
+
+def is_json_mode_error(error: Exception) -> bool:
+    """True if a failed call looks like the provider rejecting response_format."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    message = str(error).lower()
+    return status in (400, 422) and ("response_format" in message or "json_object" in message)
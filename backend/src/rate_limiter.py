@@ -0,0 +1,270 @@
+# knowledge_graph_project/src/rate_limiter.py
+import asyncio
+import collections
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the corresponding bucket
+DEFAULT_REQUESTS_PER_MINUTE = float(os.getenv("KG_LLM_RPM", "0"))
+DEFAULT_TOKENS_PER_MINUTE = float(os.getenv("KG_LLM_TPM", "0"))
+DEFAULT_INITIAL_CONCURRENCY = int(os.getenv("KG_LLM_INITIAL_CONCURRENCY", "10"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("KG_LLM_MAX_CONCURRENCY", "32"))
+DEFAULT_TARGET_LATENCY_SECONDS = float(os.getenv("KG_LLM_TARGET_LATENCY_SECONDS", "60"))
+DEFAULT_MAX_RETRIES = int(os.getenv("KG_LLM_MAX_RETRIES", "5"))
+
+_BASE_BACKOFF_SECONDS = 1.0
+_MAX_BACKOFF_SECONDS = 60.0
+# Waiters re-check on this interval even if no release wakes them
+_WAITER_POLL_SECONDS = 1.0
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429:
+        return True
+    return type(error).__name__ == "RateLimitError" or "rate limit" in str(error).lower()
+
+
+def _is_retryable(error: Exception) -> bool:
+    if _is_rate_limited(error):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and status >= 500:
+        return True
+    return type(error).__name__ in ("APITimeoutError", "APIConnectionError", "TimeoutError")
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """The provider's Retry-After in seconds, capped at _MAX_BACKOFF_SECONDS, or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        seconds = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+    # NaN compares false to everything and would pass the clamp below
+    if seconds != seconds:
+        return None
+    return min(max(0.0, seconds), _MAX_BACKOFF_SECONDS)
+
+
+class AdaptiveRateLimiter:
+    """
+    Token-bucket limiter for one LLM provider account, shared by every request in the process.
+
+    Requests per minute and tokens per minute are enforced with two refilling buckets.
+    Concurrency adapts AIMD-style: the limit grows by about one slot per round of
+    successful calls and is halved on a 429 (or trimmed when latency exceeds the target).
+    State is guarded by a thread lock so requests running on different event loops
+    share the same budget.
+    """
+
+    def __init__(self,
+                 requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 initial_concurrency: int = DEFAULT_INITIAL_CONCURRENCY,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 min_concurrency: int = 1,
+                 target_latency_seconds: float = DEFAULT_TARGET_LATENCY_SECONDS,
+                 max_retries: int = DEFAULT_MAX_RETRIES):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(max_concurrency, min_concurrency)
+        self.target_latency_seconds = target_latency_seconds
+        self.max_retries = max_retries
+
+        self.concurrency_limit = float(min(max(initial_concurrency, min_concurrency), self.max_concurrency))
+        self.in_flight = 0
+        self.rate_limited_count = 0
+        self.retry_count = 0
+        # In-flight calls abandoned because their run was cancelled or hit its deadline
+        self.cancelled_count = 0
+
+        self._request_bucket = requests_per_minute
+        self._token_bucket = tokens_per_minute
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self._waiters = collections.deque()
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        elapsed_minutes = (now - self._last_refill) / 60.0
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_bucket = min(self.requests_per_minute,
+                                       self._request_bucket + elapsed_minutes * self.requests_per_minute)
+        if self.tokens_per_minute:
+            self._token_bucket = min(self.tokens_per_minute,
+                                     self._token_bucket + elapsed_minutes * self.tokens_per_minute)
+
+    def _try_acquire_locked(self, estimated_tokens: float) -> Optional[float]:
+        """
+        Takes a slot if possible and returns 0. Otherwise returns the seconds until the
+        buckets refill enough, or None when waiting on a concurrency slot.
+        """
+        self._refill_locked()
+        if self.in_flight >= int(self.concurrency_limit):
+            return None
+
+        wait = 0.0
+        if self.requests_per_minute and self._request_bucket < 1:
+            wait = max(wait, (1 - self._request_bucket) * 60.0 / self.requests_per_minute)
+        if self.tokens_per_minute and self._token_bucket < estimated_tokens:
+            wait = max(wait, (estimated_tokens - self._token_bucket) * 60.0 / self.tokens_per_minute)
+        if wait > 0:
+            return wait
+
+        if self.requests_per_minute:
+            self._request_bucket -= 1
+        if self.tokens_per_minute:
+            self._token_bucket -= estimated_tokens
+        self.in_flight += 1
+        return 0.0
+
+    async def acquire(self, estimated_tokens: float = 0):
+        if self.tokens_per_minute:
+            # A single oversized request must still fit into a full bucket
+            estimated_tokens = min(estimated_tokens, self.tokens_per_minute)
+
+        while True:
+            waiter = None
+            with self._lock:
+                wait = self._try_acquire_locked(estimated_tokens)
+                if wait == 0:
+                    return
+                if wait is None:
+                    waiter = (asyncio.get_running_loop(), asyncio.Event())
+                    self._waiters.append(waiter)
+
+            if waiter is None:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                await asyncio.wait_for(waiter[1].wait(), timeout=_WAITER_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def release(self, latency_seconds: Optional[float] = None, rate_limited: bool = False,
+                estimated_tokens: float = 0, actual_tokens: Optional[int] = None, cancelled: bool = False):
+        """
+        Frees a slot and adapts the concurrency limit from the call's outcome.
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if cancelled:
+                self.cancelled_count += 1
+
+            if rate_limited:
+                self.rate_limited_count += 1
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+            elif latency_seconds is not None and latency_seconds > self.target_latency_seconds:
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit * 0.9)
+            elif latency_seconds is not None and self.in_flight + 1 >= int(self.concurrency_limit):
+                # Only grow while the current limit is actually being used
+                self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+
+            if self.tokens_per_minute and actual_tokens is not None:
+                # Refund (or charge) the difference between the estimate and real usage
+                self._token_bucket = min(self.tokens_per_minute, self._token_bucket + estimated_tokens - actual_tokens)
+
+            free_slots = int(self.concurrency_limit) - self.in_flight
+            while free_slots > 0 and self._waiters:
+                loop, event = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:
+                    # The waiter's loop already closed
+                    continue
+                free_slots -= 1
+
+    async def run(self, call: Callable[[], Awaitable[Any]], estimated_tokens: float = 0,
+                  deadline: Optional[float] = None) -> Any:
+        """
+        Runs call() under the limiter, retrying rate-limit and transient errors with
+        full-jitter exponential backoff (or the provider's Retry-After when given), never
+        waiting longer than _MAX_BACKOFF_SECONDS. With a deadline (a time.monotonic()
+        value) a retry never waits past it, and the error is raised once it has passed.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(estimated_tokens)
+            started = time.monotonic()
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                self.release(cancelled=True)
+                raise
+            except Exception as e:
+                rate_limited = _is_rate_limited(e)
+                self.release(rate_limited=rate_limited)
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if not _is_retryable(e) or attempt >= self.max_retries or (remaining is not None and remaining <= 0):
+                    raise
+                delay = _retry_after_seconds(e)
+                if delay is None:
+                    delay = random.uniform(0, min(_MAX_BACKOFF_SECONDS, _BASE_BACKOFF_SECONDS * 2 ** attempt))
+                if remaining is not None:
+                    delay = min(delay, remaining)
+                attempt += 1
+                self.retry_count += 1
+                logger.warning(f"LLM call failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            usage = getattr(result, "usage_metadata", None) or {}
+            self.release(time.monotonic() - started, estimated_tokens=estimated_tokens,
+                         actual_tokens=usage.get("total_tokens"))
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "concurrency_limit": round(self.concurrency_limit, 2),
+                "in_flight": self.in_flight,
+                "rate_limited": self.rate_limited_count,
+                "retries": self.retry_count,
+                "cancelled": self.cancelled_count,
+            }
+
+
+_limiters: Dict[Tuple[str, str], AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_base: Optional[str], api_key: Optional[str]) -> AdaptiveRateLimiter:
+    """
+    Returns the process-wide limiter for a provider account, keyed by (api_base, api_key hash).
+    """
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+    registry_key = (api_base or "", key_hash)
+    with _limiters_lock:
+        limiter = _limiters.get(registry_key)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter()
+            _limiters[registry_key] = limiter
+        return limiter
+
+
+def get_rate_limiter_stats() -> Dict[str, int]:
+    """Totals of the retry, 429 and cancellation counters over all provider limiters."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    totals = {"in_flight": 0, "rate_limited": 0, "retries": 0, "cancelled": 0}
+    for limiter in limiters:
+        stats = limiter.stats()
+        for key in totals:
+            totals[key] += stats[key]
+    return totals
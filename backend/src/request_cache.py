@@ -0,0 +1,301 @@
+# knowledge_graph_project/src/request_cache.py
+import asyncio
+import concurrent.futures
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.getenv("KG_REQUEST_CACHE_PATH", os.path.join(_BACKEND_DIR, ".cache", "graph_requests.sqlite3"))
+DEFAULT_MEMORY_ITEMS = int(os.getenv("KG_REQUEST_CACHE_MEMORY_ITEMS", "16"))
+DEFAULT_MAX_BYTES = int(os.getenv("KG_REQUEST_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+DEFAULT_TTL_SECONDS = float(os.getenv("KG_REQUEST_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# Where a result came from, reported to clients as "cache"
+CACHE_MEMORY = "memory"
+CACHE_DISK = "disk"
+CACHE_COALESCED = "coalesced"
+CACHE_MISS = "miss"
+
+# Block size for hashing uploads while they are read
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Generation settings that change the graph. deadline_seconds is left out: only complete
+# runs are cached, and those do not depend on it. Runs are shared between concurrent
+# requests only without a deadline, see get_or_compute. The API key is not a setting but
+# scopes the key, see request_cache_key.
+_KEY_SETTINGS = ("llm_name", "api_base", "temp", "chunk_size", "chunk_overlap", "ontology_scope",
+                 "fuzzy_entity_matching", "csv_mode")
+
+
+def read_and_hash(stream, hasher=None) -> Tuple[bytes, str]:
+    """Reads a binary stream block by block, hashing as it goes. Returns (data, hex digest)."""
+    hasher = hasher or hashlib.sha256()
+    blocks = []
+    for block in iter(lambda: stream.read(HASH_BLOCK_SIZE), b""):
+        hasher.update(block)
+        blocks.append(block)
+    return b"".join(blocks), hasher.hexdigest()
+
+
+def request_cache_key(generation_kwargs: Dict[str, Any], pipeline_version: str = "") -> str:
+    """
+    Builds the cache key for a generation request from the settings in _KEY_SETTINGS and,
+    per file in order, its name, extension and content digest ("sha256", set while
+    the upload was read). A hash of the API key is included, as in get_rate_limiter, so
+    results are only shared between requests of the same provider account: a result
+    paid for with one key is never served for another, and a bad key still fails.
+    """
+    hasher = hashlib.sha256()
+    key_hash = hashlib.sha256((generation_kwargs.get("api_key") or "").encode("utf-8")).hexdigest()
+    parts = [pipeline_version, key_hash] + [generation_kwargs.get(name) for name in _KEY_SETTINGS]
+    for file in generation_kwargs.get("files") or []:
+        parts.extend((file["name"], file["extension"], file["sha256"]))
+    for part in parts:
+        hasher.update(str(part).encode("utf-8"))
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+def is_complete_run(report: Dict[str, Any]) -> bool:
+    """
+    True if a run report covers the whole input: nothing dropped, cancelled or cut off
+    by a deadline. Only such results are cached.
+    """
+    coverage = report.get("coverage")
+    return bool(
+        coverage
+        and not report.get("dropped_chunks")
+        and not coverage["deadline_reached"]
+        and not coverage["cancelled"]
+        and coverage["input_complete"]
+        and coverage["chunks_finished"] == coverage["chunks_total"]
+    )
+
+
+class _LeaderCancelled(Exception):
+    """The request computing a shared result was cancelled; a waiting request takes over."""
+
+
+class RequestResultCache:
+    """
+    Whole-request result cache in two tiers: a small in-memory LRU of recent results
+    over an on-disk SQLite table of gzipped JSON, both expiring after ttl_seconds.
+    Concurrent requests for the same key share one computation (single flight).
+    """
+
+    def __init__(self,
+                 path: str = DEFAULT_CACHE_PATH,
+                 memory_items: int = DEFAULT_MEMORY_ITEMS,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        """
+        Args:
+            path (str): SQLite file location. The parent directory is created if needed.
+            memory_items (int): Results kept in memory, least recently used evicted first.
+            max_bytes (int): Maximum total size of the disk tier before LRU eviction.
+            ttl_seconds (float): Results older than this are treated as misses and evicted.
+        """
+        self.path = path
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.counts = {CACHE_MEMORY: 0, CACHE_DISK: 0, CACHE_COALESCED: 0, CACHE_MISS: 0}
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._in_flight: Dict[str, concurrent.futures.Future] = {}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS request_results ("
+                "key TEXT PRIMARY KEY, "
+                "value BLOB NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "created REAL NOT NULL, "
+                "accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_request_results_accessed ON request_results (accessed)")
+            self._conn.commit()
+
+    def _get_locked(self, key: str, now: float) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            created, value = entry
+            if now - created <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                return value, CACHE_MEMORY
+            del self._memory[key]
+
+        try:
+            row = self._conn.execute("SELECT value, created FROM request_results WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                return None, None
+            self._conn.execute("UPDATE request_results SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            value = json.loads(gzip.decompress(row[0]))
+        except Exception as e:
+            logger.warning(f"Request cache read failed: {e}")
+            return None, None
+        self._remember_locked(key, row[1], value)
+        return value, CACHE_DISK
+
+    def _remember_locked(self, key: str, created: float, value: Dict[str, Any]):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached result for a key from memory or disk, or None."""
+        with self._lock:
+            return self._get_locked(key, time.time())[0]
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Stores a JSON-serializable result in both tiers."""
+        now = time.time()
+        try:
+            payload = gzip.compress(json.dumps(value, separators=(",", ":"), default=list).encode("utf-8"))
+        except Exception as e:
+            logger.warning(f"Request cache write failed: {e}")
+            return
+        with self._lock:
+            self._remember_locked(key, now, value)
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO request_results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, len(payload), now, now)
+                )
+                self._evict_locked(now)
+            except Exception as e:
+                logger.warning(f"Request cache write failed: {e}")
+
+    def _evict_locked(self, now: float) -> None:
+        self._conn.execute("DELETE FROM request_results WHERE created < ?", (now - self.ttl_seconds,))
+        total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM request_results").fetchone()[0]
+        if total_bytes > self.max_bytes:
+            # Few, large rows, so walking them all from the least recently used end is cheap
+            excess_bytes = total_bytes - self.max_bytes
+            removed_bytes = 0
+            cutoff = None
+            for accessed, size in self._conn.execute("SELECT accessed, size FROM request_results ORDER BY accessed ASC"):
+                if removed_bytes >= excess_bytes:
+                    break
+                removed_bytes += size
+                cutoff = accessed
+            if cutoff is not None:
+                self._conn.execute("DELETE FROM request_results WHERE accessed <= ?", (cutoff,))
+        self._conn.commit()
+
+    def _claim(self, key: str, shared: bool) -> Tuple[Optional[Dict[str, Any]], Optional[str],
+                                                       Optional[concurrent.futures.Future], bool]:
+        """
+        Returns (value, source, future, leader): a cached value, or the in-flight future
+        for the key, created (leader=True) if nobody is computing it yet. Without shared
+        the caller computes on its own: future is None and leader False.
+        """
+        with self._lock:
+            value, source = self._get_locked(key, time.time())
+            if value is not None:
+                self.counts[source] += 1
+                return value, source, None, False
+            if not shared:
+                return None, None, None, False
+            future = self._in_flight.get(key)
+            if future is not None:
+                return None, None, future, False
+            future = self._in_flight[key] = concurrent.futures.Future()
+            return None, None, future, True
+
+    def _settle(self, key: str, future: concurrent.futures.Future, value: Any = None,
+                error: Optional[BaseException] = None, cacheable: bool = False):
+        if error is None and cacheable:
+            self.put(key, value)
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if error is None:
+                self.counts[CACHE_MISS] += 1
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]],
+                             cacheable: Callable[[Dict[str, Any]], bool],
+                             shared: bool = True) -> Tuple[Dict[str, Any], str]:
+        """
+        Returns (result, source) for a key. On a miss the first caller awaits compute()
+        and concurrent callers for the same key wait for its result; cancelling a waiter
+        does not cancel the shared computation, and if the computing caller is cancelled
+        a waiter takes over. The result is stored when cacheable(result) is true.
+
+        With shared=False the caller neither waits for nor offers its computation to
+        others; requests with a deadline use this, as a run cut short by one deadline must
+        not answer a request without it, nor a deadline wait for a longer run.
+        """
+        while True:
+            value, source, future, leader = self._claim(key, shared)
+            if value is not None:
+                return value, source
+            if future is None:
+                value = await compute()
+                if cacheable(value):
+                    self.put(key, value)
+                with self._lock:
+                    self.counts[CACHE_MISS] += 1
+                return value, CACHE_MISS
+            if not leader:
+                try:
+                    value = await asyncio.shield(asyncio.wrap_future(future))
+                except _LeaderCancelled:
+                    continue
+                with self._lock:
+                    self.counts[CACHE_COALESCED] += 1
+                return value, CACHE_COALESCED
+            try:
+                value = await compute()
+            except BaseException as e:
+                self._settle(key, future, error=_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+                raise
+            self._settle(key, future, value=value, cacheable=cacheable(value))
+            return value, CACHE_MISS
+
+    def stats(self) -> Dict[str, int]:
+        """Returns process-lifetime counts per result source and the current tier sizes."""
+        with self._lock:
+            return {**self.counts, "memory_items": len(self._memory), "in_flight": len(self._in_flight)}
+
+
+_request_cache: Optional[RequestResultCache] = None
+_request_cache_lock = threading.Lock()
+
+
+def get_request_cache() -> Optional[RequestResultCache]:
+    """
+    Returns the process-wide request cache, or None if disabled with KG_REQUEST_CACHE=0
+    or if the cache file cannot be opened.
+    """
+    global _request_cache
+    if os.getenv("KG_REQUEST_CACHE", "1") == "0":
+        return None
+    with _request_cache_lock:
+        if _request_cache is None:
+            try:
+                _request_cache = RequestResultCache()
+            except Exception as e:
+                logger.warning(f"Request cache disabled, could not open {DEFAULT_CACHE_PATH}: {e}")
+                return None
+        return _request_cache
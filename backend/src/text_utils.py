@@ -0,0 +1,28 @@
+# knowledge_graph_project/src/text_utils.py
+
+
+def cleanUpText(string):
+    """
+    Normalizes an entity id for display and matching: spaces and underscores become
+    single-word separators and each word is capitalized.
+    """
+    if not isinstance(string, str):
+        string = str(string)
+
+    cap = True
+    newString = ""
+
+    for i in string:
+        if i in {" ", "_"}:
+            newString += " "
+            cap = True
+        elif i.isalpha():
+            if cap:
+                newString += i.upper()
+                cap = False
+            else:
+                newString += i.lower()
+        else:
+            newString += i
+
+    return newString.strip()
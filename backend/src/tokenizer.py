@@ -0,0 +1,165 @@
+# knowledge_graph_project/src/tokenizer.py
+import logging
+from functools import lru_cache
+from typing import List
+
+import tiktoken
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+ENCODING_NAME = "cl100k_base"
+# Text carried between StreamingChunker feeds when it has no break to encode up to
+_MAX_PENDING_CHARS = 1024
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(encoding_name: str = ENCODING_NAME):
+    """
+    Returns the shared tiktoken encoding, loaded once per process.
+    Returns None (also cached) if it cannot be loaded, e.g. offline without a
+    TIKTOKEN_CACHE_DIR, so callers fall back to character counts without retrying.
+    """
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        logger.warning(f"Tiktoken error: {e}. Falling back to character count.")
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """
+    Calculates the length of text in tokens, memoized for repeated strings.
+    """
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return len(text)
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+class TokenChunkSplitter:
+    """
+    Splits text into windows of chunk_size tokens overlapping by chunk_overlap tokens.
+    Each document is encoded exactly once and cut on token offsets, and several
+    documents can be encoded together with split_texts().
+    """
+
+    def __init__(self, chunk_size: int = 4000, chunk_overlap: int = 200, encoding_name: str = ENCODING_NAME):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        # Overlap must leave room for the window to advance
+        self.chunk_overlap = max(0, min(chunk_overlap, chunk_size - 1))
+        self.encoding_name = encoding_name
+
+    def split_text(self, text: str) -> List[str]:
+        return self.split_texts([text])[0]
+
+    def split_texts(self, texts: List[str]) -> List[List[str]]:
+        """
+        Returns the chunks for each text, in the same order as texts.
+        """
+        tokenizer = get_tokenizer(self.encoding_name)
+        if tokenizer is None:
+            fallback = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+            return [fallback.split_text(text) for text in texts]
+
+        step = self.chunk_size - self.chunk_overlap
+        all_tokens = tokenizer.encode_batch(list(texts), disallowed_special=())
+
+        results = []
+        for tokens in all_tokens:
+            windows = []
+            for start in range(0, len(tokens), step):
+                windows.append(tokens[start:start + self.chunk_size])
+                if start + self.chunk_size >= len(tokens):
+                    break
+            chunks = [chunk for chunk in tokenizer.decode_batch(windows) if chunk.strip()]
+            results.append(chunks)
+        return results
+
+
+class StreamingChunker:
+    """
+    Incremental form of TokenChunkSplitter.split_text for text that arrives in pieces.
+    feed() returns the windows completed so far and flush() the final partial window.
+    The text after the last space or line break that follows a word is carried over
+    to the next feed unencoded, so no token straddles two pieces, and windows end
+    before a token that starts inside a multi-byte character. Window boundaries can
+    still differ slightly from splitting the concatenated text at once.
+    Works on characters instead of tokens when no tokenizer is available.
+    """
+
+    def __init__(self, chunk_size: int = 4000, chunk_overlap: int = 200, encoding_name: str = ENCODING_NAME):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = max(0, min(chunk_overlap, chunk_size - 1))
+        self._tokenizer = get_tokenizer(encoding_name)
+        self._buffer = [] if self._tokenizer is not None else ""
+        # Received text not encoded yet, see _encodable_end
+        self._pending = ""
+        # Leading units of the buffer that are already part of an emitted window
+        self._covered = 0
+
+    def _decode(self, units) -> str:
+        return self._tokenizer.decode(units) if self._tokenizer is not None else units
+
+    def _encodable_end(self, text: str) -> int:
+        """
+        Length of the prefix of text that encodes to the same tokens on its own as inside
+        longer text: up to the last whitespace following a letter or digit. Bounded so a
+        piece without such a break is not held back indefinitely.
+        """
+        for i in range(len(text) - 1, 0, -1):
+            if text[i].isspace() and text[i - 1].isalnum():
+                return i
+        return max(0, len(text) - _MAX_PENDING_CHARS)
+
+    def _starts_inside_character(self, index: int) -> bool:
+        # UTF-8 continuation bytes are 0b10xxxxxx
+        return self._tokenizer.decode_single_token_bytes(self._buffer[index])[0] & 0xC0 == 0x80
+
+    def _window_end(self) -> int:
+        end = self.chunk_size
+        if self._tokenizer is not None:
+            # Characters take at most 4 bytes, so at most 3 tokens are moved to the next window
+            while end > self.chunk_overlap + 1 and end > self.chunk_size - 3 and self._starts_inside_character(end):
+                end -= 1
+        return end
+
+    def feed(self, text: str) -> List[str]:
+        if not text:
+            return []
+        if self._tokenizer is not None:
+            self._pending += text
+            end = self._encodable_end(self._pending)
+            if end:
+                self._buffer += self._tokenizer.encode(self._pending[:end], disallowed_special=())
+                self._pending = self._pending[end:]
+        else:
+            self._buffer += text
+        return self._emit_full_windows()
+
+    def _emit_full_windows(self) -> List[str]:
+        chunks = []
+        # A window ends before len(buffer), so the token it ends before is known
+        while len(self._buffer) > self.chunk_size:
+            end = self._window_end()
+            chunks.append(self._decode(self._buffer[:end]))
+            self._buffer = self._buffer[end - self.chunk_overlap:]
+            self._covered = self.chunk_overlap
+        return [chunk for chunk in chunks if chunk.strip()]
+
+    def flush(self) -> List[str]:
+        chunks = []
+        if self._pending:
+            self._buffer += self._tokenizer.encode(self._pending, disallowed_special=())
+            self._pending = ""
+            chunks = self._emit_full_windows()
+        if len(self._buffer) > self._covered:
+            chunks.append(self._decode(self._buffer))
+        self._buffer = self._buffer[:0]
+        self._covered = 0
+        return [chunk for chunk in chunks if chunk.strip()]
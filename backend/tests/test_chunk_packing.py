@@ -0,0 +1,87 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+from src.associational_algorithm import AssociationalOntologyCreator
+from src.chunk_packing import ChunkPacker, combine_results, pack_text, split_packed_result
+from src.llm_cache import ChunkResultCache
+
+SEGMENTS = ["Marie Curie studied radium in Paris.", "Alan Turing worked at Bletchley Park."]
+
+
+def test_items_follow_their_segment_field():
+    parsed = {
+        "nodes": [{"id": "Marie Curie", "type": "Person", "segment": 1},
+                  {"id": "Alan Turing", "type": "Person", "segment": "SEGMENT 2"}],
+        "relationships": [{"source": "Alan Turing", "target": "Bletchley Park", "type": "WORKED_AT", "segment": 2}],
+    }
+    first, second = split_packed_result(parsed, SEGMENTS)
+    assert [node["id"] for node in first["nodes"]] == ["Marie Curie"]
+    assert [node["id"] for node in second["nodes"]] == ["Alan Turing"]
+    assert first["relationships"] == [] and len(second["relationships"]) == 1
+    assert all("segment" not in node for node in first["nodes"] + second["nodes"])
+
+
+def test_items_without_segment_are_placed_by_text_or_endpoints():
+    parsed = {
+        "nodes": [{"id": "Radium", "type": "Element"}, {"id": "Bletchley Park", "type": "Place"}],
+        "relationships": [{"source": "Marie Curie", "target": "Radium", "type": "STUDIED"}],
+    }
+    first, second = split_packed_result(parsed, SEGMENTS)
+    assert [node["id"] for node in first["nodes"]] == ["Radium"]
+    assert [node["id"] for node in second["nodes"]] == ["Bletchley Park"]
+    # The source is not a node of this result, so the relationship follows its target
+    assert [rel["type"] for rel in first["relationships"]] == ["STUDIED"]
+    assert second["relationships"] == []
+
+
+def test_unplaceable_items_are_not_attributed_to_any_segment():
+    parsed = {
+        "nodes": [{"id": "Ada Lovelace", "type": "Person"}, {"id": "Alan Turing", "type": "Person", "segment": 9}],
+        "relationships": [{"source": "Ada Lovelace", "target": "Charles Babbage", "type": "KNEW"}],
+    }
+    results = split_packed_result(parsed, SEGMENTS)
+    assert results == [{"nodes": [], "relationships": []}, {"nodes": [{"id": "Alan Turing", "type": "Person"}],
+                                                             "relationships": []}]
+
+
+def test_packer_seals_full_packs_and_flushes_the_rest():
+    packer = ChunkPacker(budget_tokens=40)
+    assert packer.add("types", "a", 10) is None
+    assert packer.add("types", "b", 10) is None
+    assert packer.add("types", "c", 10) == ["a", "b"]
+    assert packer.flush() == [("types", ["c"])]
+    assert pack_text(["x", "y"]) == "### SEGMENT 1\nx\n\n### SEGMENT 2\ny"
+    assert combine_results([None, {"nodes": [1], "relationships": []}]) == {"nodes": [1], "relationships": []}
+    assert combine_results([None, None]) is None
+
+
+def test_packed_results_are_cached_per_segment(tmp_path):
+    creator = AssociationalOntologyCreator(llm_name="gpt-4o-mini", api_key="test", use_cache=False)
+    creator.cache = ChunkResultCache(path=str(tmp_path / "chunks.sqlite3"))
+    sent = []
+
+    async def fake_ainvoke(chain, inputs):
+        return SimpleNamespace(content="Thing")
+
+    async def fake_ainvoke_json(chain_name, prompt, inputs):
+        # One node per segment, named after the segment's first word
+        segments = re.split(r"### SEGMENT \d+\n", inputs["text_chunk"])[1:]
+        sent.append([segment.strip() for segment in segments])
+        nodes = [{"id": segment.split()[0], "type": "Thing", "segment": i}
+                 for i, segment in enumerate(segments, start=1)]
+        return SimpleNamespace(content=json.dumps({"nodes": nodes, "relationships": []}))
+
+    creator._ainvoke = fake_ainvoke
+    creator._ainvoke_json = fake_ainvoke_json
+
+    first = asyncio.run(creator._process_packed_chunks(["Alpha one", "Beta two"], ["a.txt", "b.txt"]))
+    assert [result["nodes"][0]["document"] for result in first] == ["a.txt", "b.txt"]
+    # Beta is packed with a different neighbour this time; only Gamma is sent
+    second = asyncio.run(creator._process_packed_chunks(["Beta two", "Gamma three"], ["c.txt", "c.txt"]))
+    assert sent == [["Alpha one", "Beta two"], ["Gamma three"]]
+    assert [result["nodes"][0]["id"] for result in second] == ["Beta", "Gamma"]
+    assert all(node["document"] == "c.txt" for result in second for node in result["nodes"])
+    assert asyncio.run(creator._process_packed_chunks(["Gamma three", "Alpha one"], ["d", "d"]))[1]["nodes"][0]["id"] == "Alpha"
+    assert len(sent) == 2
@@ -0,0 +1,34 @@
+from src.entity_resolution import EntityResolver
+from src.graph_merger import IncrementalGraphMerger
+
+
+def test_relationship_between_aliases_is_not_a_self_loop():
+    merger = IncrementalGraphMerger(normalize_id=EntityResolver().resolve)
+    merger.add({
+        "nodes": [{"id": "company", "type": "Org", "document": "a"},
+                  {"id": "Companies", "type": "Org", "document": "a"},
+                  {"id": "Acme", "type": "Org", "document": "a"}],
+        "relationships": [{"source": "company", "target": "Companies", "type": "includes", "document": "a"},
+                          {"source": "Acme", "target": "companies", "type": "is_a", "document": "a"},
+                          {"source": "Acme", "target": "Acme", "type": "owns", "document": "a"}],
+    })
+    assert set(merger.nodes) == {"Company", "Acme"}
+    # A relationship the extraction itself stated between one id is kept
+    assert set(merger.edges) == {("Acme", "Company", "IS_A"), ("Acme", "Acme", "OWNS")}
+
+
+def test_edge_through_a_removed_node_returns_with_the_node():
+    merger = IncrementalGraphMerger()
+    merger.add({"nodes": [{"id": "X", "type": "T", "document": "a"}],
+                "relationships": [{"source": "X", "target": "Y", "type": "R", "document": "a"},
+                                  {"source": "Y", "target": "X", "type": "S", "document": "b"}]})
+    merger.add({"nodes": [{"id": "Y", "type": "T", "document": "b"}]})
+    assert set(merger.edges) == {("X", "Y", "R"), ("Y", "X", "S")}
+
+    removed = merger.remove_document("b")
+    assert removed["nodes"] == ["Y"] and set(removed["edges"]) == {("X", "Y", "R"), ("Y", "X", "S")}
+    assert merger.edges == {} and list(merger._pending_edges) == [("X", "Y", "R")]
+
+    merger.add({"nodes": [{"id": "Y", "type": "T", "document": "c"}]})
+    assert list(merger.edges) == [("X", "Y", "R")]
+    assert merger.edges[("X", "Y", "R")]["count"] == 1 and merger.edges[("X", "Y", "R")]["documents"] == {"a"}
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+
+from src.associational_algorithm import AssociationalOntologyCreator
+from src.graph_session import GraphSession
+
+SETTINGS = {"llm_name": "gpt-4o-mini", "api_base": None, "temp": 0, "chunk_size": 400, "chunk_overlap": 0,
+            "ontology_scope": "chunk", "fuzzy_entity_matching": False, "csv_mode": "schema"}
+
+
+class FailingExtraction(Exception):
+    pass
+
+
+def make_session(monkeypatch, fail_on=None):
+    session = GraphSession("test", SETTINGS)
+    calls = []
+
+    def new_creator(api_key):
+        creator = AssociationalOntologyCreator(llm_name="gpt-4o-mini", api_key="test", chunk_size=400,
+                                               chunk_overlap=0, use_cache=False, pack_small_chunks=False,
+                                               retry_failed_chunks=False)
+
+        async def fake_extract(chunk, name, node_types=None):
+            calls.append(name)
+            if fail_on is not None and fail_on in chunk:
+                raise FailingExtraction(chunk)
+            # One node per word, linked in order, so documents that share words share nodes.
+            # A word marked "~" is linked to but left out of the nodes.
+            words = chunk.split()
+            return {
+                "nodes": [{"id": word, "type": "Thing", "document": name} for word in words if word[0] != "~"],
+                "relationships": [{"source": a.lstrip("~"), "target": b.lstrip("~"), "type": "NEXT", "document": name}
+                                  for a, b in zip(words, words[1:])],
+            }
+
+        creator.limited_process_chunk_ontology_graphs = fake_extract
+        return creator
+
+    monkeypatch.setattr(session, "_new_creator", new_creator)
+    return session, calls
+
+
+def text_file(name, text):
+    data = text.encode("utf-8")
+    return {"name": name, "extension": ".txt", "content": io.BytesIO(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+
+def graph_state(session):
+    nodes = {node_id: sorted(map(str, node["documents"])) for node_id, node in session.merger.nodes.items()}
+    edges = {key: (edge["count"], sorted(map(str, edge["documents"]))) for key, edge in session.merger.edges.items()}
+    return nodes, edges
+
+
+def test_add_only_extracts_new_documents(monkeypatch):
+    session, calls = make_session(monkeypatch)
+    changes = asyncio.run(session.add_documents([text_file("a.txt", "Alpha Beta Gamma")]))
+    assert changes == {"added": ["a.txt"], "replaced": [], "unchanged": []}
+    calls.clear()
+
+    changes = asyncio.run(session.add_documents([text_file("a.txt", "Alpha Beta Gamma"),
+                                                 text_file("b.txt", "Gamma Delta")]))
+    assert changes == {"added": ["b.txt"], "replaced": [], "unchanged": ["a.txt"]}
+    assert set(calls) == {"b.txt"}
+    nodes, _ = graph_state(session)
+    assert nodes["Gamma"] == ["a.txt", "b.txt"]
+    assert sorted(session.to_dict()["documents"]) == ["a.txt", "b.txt"]
+
+
+def test_remove_restores_the_graph_without_the_document(monkeypatch):
+    session, _ = make_session(monkeypatch)
+    asyncio.run(session.add_documents([text_file("a.txt", "Alpha Beta Gamma")]))
+    before = graph_state(session)
+    asyncio.run(session.add_documents([text_file("b.txt", "Gamma Delta Alpha Beta")]))
+    assert graph_state(session) != before
+
+    assert asyncio.run(session.remove_documents(["b.txt", "missing.txt"])) == ["b.txt"]
+    assert graph_state(session) == before
+
+
+def test_replace_swaps_the_old_version(monkeypatch):
+    session, _ = make_session(monkeypatch)
+    asyncio.run(session.add_documents([text_file("a.txt", "Alpha Beta Gamma")]))
+    changes = asyncio.run(session.add_documents([text_file("a.txt", "Alpha Delta")]))
+    assert changes["replaced"] == ["a.txt"]
+    nodes, edges = graph_state(session)
+    assert nodes == {"Alpha": ["a.txt"], "Delta": ["a.txt"]}
+    assert list(edges.values()) == [(1, ["a.txt"])]
+
+
+def test_failed_replace_keeps_the_last_good_version(monkeypatch):
+    session, _ = make_session(monkeypatch, fail_on="Broken")
+    asyncio.run(session.add_documents([text_file("a.txt", "Alpha Beta Gamma")]))
+    before = graph_state(session)
+    digest = session.documents["a.txt"]
+
+    with pytest.raises(FailingExtraction):
+        asyncio.run(session.add_documents([text_file("a.txt", "Broken Alpha Omega"),
+                                           text_file("b.txt", "Broken Delta")]))
+    assert graph_state(session) == before
+    assert session.documents == {"a.txt": digest}
+
+
+def test_failed_add_keeps_edges_waiting_on_its_nodes(monkeypatch):
+    session, _ = make_session(monkeypatch, fail_on="Broken")
+    asyncio.run(session.add_documents([text_file("a.txt", "Alpha ~Omega")]))
+    with pytest.raises(FailingExtraction):
+        asyncio.run(session.add_documents([text_file("b.txt", "Omega Beta"), text_file("c.txt", "Broken")]))
+    asyncio.run(session.add_documents([text_file("d.txt", "Omega")]))
+
+    rebuilt, _ = make_session(monkeypatch)
+    asyncio.run(rebuilt.add_documents([text_file("a.txt", "Alpha ~Omega"), text_file("d.txt", "Omega")]))
+    assert graph_state(session) == graph_state(rebuilt)
+    assert graph_state(session)[1] == {("Alpha", "Omega", "NEXT"): (1, ["a.txt"])}
@@ -0,0 +1,27 @@
+import asyncio
+import threading
+
+from src.job_queue import JobManager
+
+
+def test_run_and_submit_share_the_worker_slots():
+    manager = JobManager(max_workers=2)
+    running = {"now": 0, "peak": 0}
+
+    async def work(*_):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.05)
+        running["now"] -= 1
+        return "done"
+
+    jobs = [manager.submit(work) for _ in range(3)]
+    threads = [threading.Thread(target=manager.run, args=(work(),)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for job in jobs:
+        job.future.result()
+    assert running["peak"] == 2
+    assert manager.run(work()) == "done"
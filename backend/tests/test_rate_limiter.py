@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+import pytest
+
+import src.rate_limiter as rate_limiter_module
+from src.rate_limiter import AdaptiveRateLimiter
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("rate limit")
+        self.response = type("Response", (), {"status_code": 429, "headers": {"retry-after": retry_after}})()
+
+
+def run_with_sleeps(monkeypatch, retry_after, failures, deadline_in=None):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    calls = []
+
+    async def call():
+        calls.append(None)
+        if len(calls) <= failures:
+            raise RateLimitError(retry_after)
+        return "ok"
+
+    async def main():
+        monkeypatch.setattr(rate_limiter_module.asyncio, "sleep", fake_sleep)
+        deadline = time.monotonic() + deadline_in if deadline_in is not None else None
+        return await AdaptiveRateLimiter(max_retries=3).run(call, deadline=deadline)
+
+    return asyncio.run(main()), sleeps
+
+
+def test_retry_after_is_capped(monkeypatch):
+    result, sleeps = run_with_sleeps(monkeypatch, "86400", failures=2)
+    assert result == "ok"
+    assert sleeps == [rate_limiter_module._MAX_BACKOFF_SECONDS] * 2
+
+
+def test_retry_after_is_capped_by_the_deadline(monkeypatch):
+    result, sleeps = run_with_sleeps(monkeypatch, "30", failures=1, deadline_in=5)
+    assert result == "ok"
+    assert len(sleeps) == 1 and 0 < sleeps[0] <= 5
+
+
+def test_no_retry_after_the_deadline(monkeypatch):
+    with pytest.raises(RateLimitError):
+        run_with_sleeps(monkeypatch, "1", failures=1, deadline_in=-1)
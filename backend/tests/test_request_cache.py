@@ -0,0 +1,99 @@
+import asyncio
+import io
+
+import pytest
+
+from src.request_cache import (CACHE_COALESCED, CACHE_DISK, CACHE_MEMORY, CACHE_MISS, RequestResultCache,
+                               read_and_hash, request_cache_key)
+
+
+def complete(value):
+    return True
+
+
+def make_compute(calls, value, delay=0.05):
+    async def compute():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        return {"value": value}
+    return compute
+
+
+def test_identical_requests_share_one_run(tmp_path):
+    cache = RequestResultCache(path=str(tmp_path / "requests.sqlite3"))
+    calls = []
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_compute("k", make_compute(calls, 1), complete) for _ in range(4)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert sorted(source for _, source in results) == [CACHE_COALESCED] * 3 + [CACHE_MISS]
+    assert all(value == {"value": 1} for value, _ in results)
+    assert asyncio.run(cache.get_or_compute("k", make_compute(calls, 2), complete)) == ({"value": 1}, CACHE_MEMORY)
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "requests.sqlite3")
+    asyncio.run(RequestResultCache(path=path).get_or_compute("k", make_compute([], 1), complete))
+    calls = []
+    assert asyncio.run(RequestResultCache(path=path).get_or_compute("k", make_compute(calls, 2), complete)) == \
+        ({"value": 1}, CACHE_DISK)
+    assert calls == []
+
+
+def test_unshared_requests_neither_join_nor_lead(tmp_path):
+    cache = RequestResultCache(path=str(tmp_path / "requests.sqlite3"))
+    calls = []
+
+    async def main():
+        # A request with a deadline next to one without: neither may take the other's result
+        return await asyncio.gather(
+            cache.get_or_compute("k", make_compute(calls, "full"), lambda value: False),
+            cache.get_or_compute("k", make_compute(calls, "deadline"), lambda value: False, shared=False),
+            cache.get_or_compute("k", make_compute(calls, "full again"), lambda value: False),
+        )
+
+    results = asyncio.run(main())
+    assert sorted(calls) == ["deadline", "full"]
+    assert results[0] == ({"value": "full"}, CACHE_MISS)
+    assert results[1] == ({"value": "deadline"}, CACHE_MISS)
+    assert results[2] == ({"value": "full"}, CACHE_COALESCED)
+
+
+def test_results_that_are_not_cacheable_are_not_stored(tmp_path):
+    cache = RequestResultCache(path=str(tmp_path / "requests.sqlite3"))
+    calls = []
+    for _ in range(2):
+        asyncio.run(cache.get_or_compute("k", make_compute(calls, 1), lambda value: False))
+    assert len(calls) == 2
+
+
+def test_waiter_takes_over_when_the_leader_is_cancelled(tmp_path):
+    cache = RequestResultCache(path=str(tmp_path / "requests.sqlite3"))
+    calls = []
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_compute("k", make_compute(calls, "leader", delay=1), complete))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(cache.get_or_compute("k", make_compute(calls, "follower"), complete))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == ({"value": "follower"}, CACHE_MISS)
+    assert calls == ["leader", "follower"]
+
+
+def test_cache_key_covers_content_and_settings():
+    data, digest = read_and_hash(io.BytesIO(b"x" * 3_000_000))
+    assert len(data) == 3_000_000
+    base = {"llm_name": "m", "chunk_size": 1000, "files": [{"name": "a.txt", "extension": ".txt", "sha256": digest}]}
+    assert request_cache_key(base) == request_cache_key({**base, "deadline_seconds": 5})
+    # Results are not shared across provider accounts
+    assert request_cache_key({**base, "api_key": "a"}) != request_cache_key({**base, "api_key": "b"})
+    assert request_cache_key(base) != request_cache_key({**base, "chunk_size": 2000})
+    changed = {**base, "files": [{"name": "a.txt", "extension": ".txt", "sha256": "0" * 64}]}
+    assert request_cache_key(base) != request_cache_key(changed)
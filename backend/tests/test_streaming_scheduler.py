@@ -0,0 +1,124 @@
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+
+from src.associational_algorithm import AssociationalOntologyCreator
+
+WORDS = ("alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi omicron pi rho sigma tau "
+         "upsilon").split()
+
+
+def paragraph(seed: int, length: int = 400) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + str(rng.randint(0, 999)) for _ in range(length // 4))[:length]
+
+
+def make_creator(max_concurrency: int, delay: float = 0.01, **kwargs) -> AssociationalOntologyCreator:
+    creator = AssociationalOntologyCreator(llm_name="gpt-4o-mini", api_key="test", chunk_size=400, chunk_overlap=0,
+                                           use_cache=False, **kwargs)
+    creator.rate_limiter.max_concurrency = max_concurrency
+    calls = []
+
+    async def fake_extract(chunk, name, node_types=None):
+        calls.append(chunk)
+        await asyncio.sleep(delay)
+        return {"nodes": [{"id": f"Entity {len(calls)}", "type": "Thing", "document": name}], "relationships": []}
+
+    creator.limited_process_chunk_ontology_graphs = fake_extract
+    creator.calls = calls
+    return creator
+
+
+async def segments(documents):
+    for doc_index, (name, chunks) in enumerate(documents):
+        for chunk in chunks:
+            yield doc_index, name, chunk
+        yield doc_index, name, None
+
+
+def run_stream(creator, documents, timeout: float = 20):
+    return asyncio.run(asyncio.wait_for(creator.create_associational_ontology_stream(segments(documents)), timeout))
+
+
+def test_revision_of_document_tail_does_not_deadlock():
+    # B repeats the last chunks of A: each of B's chunks is queued ahead of its
+    # representative, which must not leave every worker waiting on a duplicate
+    for workers in (2, 4, 32):
+        chunks = [paragraph(i) for i in range(200)]
+        creator = make_creator(workers)
+        graph = run_stream(creator, [("A", chunks), ("B", chunks[-workers:])])
+        assert len(creator.calls) == 200
+        assert creator.run_report()["duplicate_chunks"] == workers
+        assert creator.coverage["chunks_finished"] == creator.coverage["chunks_total"] == 200 + workers
+        # Duplicates get their representative's result attributed to their own document
+        assert any("B" in node.properties["document"] for node in graph.nodes)
+        assert all("A" in node.properties["document"] for node in graph.nodes)
+
+
+def test_document_ontology_is_sampled_across_the_whole_document():
+    chunks = [paragraph(i) for i in range(40)]
+    creator = make_creator(4)
+    samples, node_types_seen = [], set()
+
+    async def fake_ainvoke(chain, inputs):
+        samples.append(inputs["text_chunk"])
+        return type("Response", (), {"content": "Thing"})()
+
+    fake_extract = creator.limited_process_chunk_ontology_graphs
+
+    async def extract(chunk, name, node_types=None):
+        node_types_seen.add(node_types)
+        return await fake_extract(chunk, name, node_types)
+
+    creator._ainvoke = fake_ainvoke
+    creator.limited_process_chunk_ontology_graphs = extract
+    graph = asyncio.run(asyncio.wait_for(creator.create_associational_ontology_stream(
+        segments([("A", chunks)]), ontology_scope="document"), 20))
+    assert len(samples) == 1
+    assert chunks[0][:50] in samples[0] and chunks[-len(chunks) // 6][:50] in samples[0]
+    # Every chunk, including the first ones, is extracted with the shared node types
+    assert node_types_seen == {"Thing"}
+    assert graph.nodes and creator.coverage["chunks_finished"] == creator.coverage["chunks_total"]
+
+
+def test_short_and_duplicate_chunks_are_packed_and_reused():
+    creator = make_creator(2, retry_failed_chunks=False)
+    packed_segments = []
+
+    async def fake_ainvoke(chain, inputs):
+        return SimpleNamespace(content="Thing")
+
+    async def fake_ainvoke_json(chain_name, prompt, inputs):
+        segments = re.split(r"### SEGMENT \d+\n", inputs["text_chunk"])[1:]
+        packed_segments.extend(segments)
+        nodes = [{"id": f"Packed {len(packed_segments)} {i}", "type": "Thing", "segment": i}
+                 for i in range(1, len(segments) + 1)]
+        return SimpleNamespace(content=json.dumps({"nodes": nodes, "relationships": []}))
+
+    creator._ainvoke = fake_ainvoke
+    creator._ainvoke_json = fake_ainvoke_json
+    notes = [paragraph(100 + i, 60) for i in range(4)]
+    documents = ([(f"note{i}", [note]) for i, note in enumerate(notes)]
+                 + [(f"copy{i}", [note]) for i, note in enumerate(notes)]
+                 + [("long", [paragraph(i) for i in range(5)])])
+    graph = run_stream(creator, documents)
+
+    report = creator.run_report()
+    assert report["packed_requests"] >= 1 and report["duplicate_chunks"] == 4
+    # Each short note is sent once, in a pack; the long chunks go out on their own
+    assert sorted(segment.strip() for segment in packed_segments) == sorted(notes)
+    assert len(creator.calls) == 5
+    assert creator.coverage["chunks_finished"] == creator.coverage["chunks_total"] == 13
+    documents_seen = set().union(*(node.properties["document"] for node in graph.nodes))
+    assert documents_seen == {name for name, _ in documents}
+
+
+def test_stream_into_an_existing_merger_leaves_the_graph_to_the_caller():
+    creator = make_creator(2)
+    merger = creator.new_merger()
+    result = asyncio.run(asyncio.wait_for(creator.create_associational_ontology_stream(
+        segments([("A", [paragraph(i) for i in range(3)])]), merger=merger), 20))
+    assert result is None
+    assert merger.nodes and creator.coverage["chunks_finished"] == creator.coverage["chunks_total"] == 3
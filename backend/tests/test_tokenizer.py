@@ -0,0 +1,48 @@
+import random
+
+import tiktoken
+
+import src.tokenizer as tokenizer_module
+from src.tokenizer import StreamingChunker
+
+# cl100k_base's pre-tokenization with a few merges of its own, so the tests run offline
+PAT_STR = (r"""'(?i:[sdmt]|ll|ve|re)|[^\r\n\p{L}\p{N}]?+\p{L}++|\p{N}{1,3}+| ?[^\s\p{L}\p{N}]++[\r\n]*+|\s++$|"""
+           r"""\s*[\r\n]|\s+(?!\S)|\s""")
+MERGES = [b"he", b" t", b" the", b"ca", b"caf", b"\xc3\xa9", b"caf\xc3\xa9", b"\xe2\x80", b"\xe2\x80\x94"]
+
+TEXT = "The café — thé and the naïve end, it's 12345 words.\n\n" * 40
+
+
+def fake_encoding():
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in MERGES:
+        ranks[merge] = len(ranks)
+    return tiktoken.Encoding(name="fake", pat_str=PAT_STR, mergeable_ranks=ranks, special_tokens={})
+
+
+def pieces(text, seed):
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(text)), 60))
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+def test_pieces_encode_like_the_whole_text(monkeypatch):
+    encoding = fake_encoding()
+    monkeypatch.setattr(tokenizer_module, "get_tokenizer", lambda name=None: encoding)
+    for seed in range(5):
+        chunker = StreamingChunker(chunk_size=10 ** 6, chunk_overlap=0)
+        for piece in pieces(TEXT, seed):
+            assert chunker.feed(piece) == []
+        assert chunker._buffer + encoding.encode(chunker._pending) == encoding.encode(TEXT)
+
+
+def test_windows_do_not_split_characters(monkeypatch):
+    encoding = fake_encoding()
+    monkeypatch.setattr(tokenizer_module, "get_tokenizer", lambda name=None: encoding)
+    for chunk_size in (7, 8, 9, 10, 11):
+        chunker = StreamingChunker(chunk_size=chunk_size, chunk_overlap=0)
+        chunks = [chunk for piece in pieces(TEXT, chunk_size) for chunk in chunker.feed(piece)] + chunker.flush()
+        assert all("�" not in chunk for chunk in chunks)
+        assert all(len(encoding.encode(chunk)) <= chunk_size for chunk in chunks)
+        # Whitespace-only windows are dropped, everything else is kept in order
+        assert "".join(chunks).split() == TEXT.split()
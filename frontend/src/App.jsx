@@ -7,15 +7,83 @@ import SettingsMenu from './components/SettingsMenu';
 // TODO - update to backend URL
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:5000';
 
+// Minimal vis-network page shown while the graph is still being generated.
+// Node/edge deltas from the stream are posted into it as they arrive. Uses the same
+// pinned vis-network build as the backend's graph pages (src/graph_template.py).
+const LIVE_GRAPH_HTML = `<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <script src="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/vis-network.min.js"
+    integrity="sha512-LnvoEWDFrqGHlHmDD2101OrLcbsfkrzoSpvtSQtxK3RMnRV0eOkhhBN2dXHKRrUU8p2DGRTk35n4O8nWSVe1mQ=="
+    crossorigin="anonymous" referrerpolicy="no-referrer"></script>
+  <style>html, body, #live-network { margin: 0; width: 100%; height: 100%; background: #222222; }</style>
+</head>
+<body>
+  <div id="live-network"></div>
+  <script>
+    const nodes = new vis.DataSet();
+    const edges = new vis.DataSet();
+    const network = new vis.Network(document.getElementById('live-network'), { nodes, edges }, {
+      physics: { solver: 'forceAtlas2Based', stabilization: false },
+      nodes: { shape: 'dot', size: 20, font: { color: 'white', strokeWidth: 2, strokeColor: '#000000' } },
+      edges: { arrows: 'to', font: { color: 'lightgray', size: 14, strokeWidth: 1, strokeColor: '#000000' } }
+    });
+    window.addEventListener('message', (event) => {
+      const data = event.data;
+      if (!data || data.type !== 'kg-delta') return;
+      nodes.update(data.nodes);
+      edges.update(data.edges);
+    });
+  </script>
+</body>
+</html>`;
+
+// Reads a text/event-stream response body and calls onEvent(event, data) per frame
+const readEventStream = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      const dataLines = [];
+      frame.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+      });
+      if (dataLines.length > 0) {
+        onEvent(event, JSON.parse(dataLines.join('\n')));
+      }
+    }
+  }
+};
+
 function App() {
   const [inputText, setInputText] = useState('');
   const [uploadedFiles, setUploadedFiles] = useState([]);
   const [isGenerating, setIsGenerating] = useState(false);
-  const [graphHtml, setGraphHtml] = useState(null);
+  const [graphUrl, setGraphUrl] = useState(null);
   const [graphData, setGraphData] = useState(null);
   const [error, setError] = useState(null);
   const [settingsOpen, setSettingsOpen] = useState(false);
+  const [liveGraph, setLiveGraph] = useState(false);
+  const [progress, setProgress] = useState(null);
   const fileInputRef = useRef(null);
+  const liveFrameRef = useRef(null);
+  const liveFrameReadyRef = useRef(false);
+  const pendingDeltasRef = useRef([]);
+  const abortControllerRef = useRef(null);
+  const jobIdRef = useRef(null);
 
   //settings variables
   const [apiKey, setApiKey] = useState('')
@@ -37,6 +105,28 @@ function App() {
     }
   }, []);
 
+  // Stop the running generation: abort the stream and ask the backend to cancel the job,
+  // so it stops spending LLM calls on a graph nobody will see
+  const cancelGeneration = () => {
+    if (abortControllerRef.current) {
+      abortControllerRef.current.abort();
+      abortControllerRef.current = null;
+    }
+    if (jobIdRef.current) {
+      fetch(`${API_BASE_URL}/jobs/${jobIdRef.current}/`, { method: 'DELETE', keepalive: true }).catch(() => {});
+      jobIdRef.current = null;
+    }
+  };
+
+  // Cancel when the tab is closed or the app unmounts
+  useEffect(() => {
+    window.addEventListener('pagehide', cancelGeneration);
+    return () => {
+      window.removeEventListener('pagehide', cancelGeneration);
+      cancelGeneration();
+    };
+  }, []);
+
   // Handle file selection
   const handleFileSelect = (e) => {
     const files = Array.from(e.target.files);
@@ -52,6 +142,23 @@ function App() {
     setUploadedFiles(prev => prev.filter((_, i) => i !== index));
   };
 
+  // Send a delta to the live graph iframe, or hold it until the iframe has loaded
+  const pushDelta = (delta) => {
+    const frame = liveFrameRef.current;
+    if (frame && liveFrameReadyRef.current) {
+      frame.contentWindow.postMessage({ type: 'kg-delta', ...delta }, '*');
+    } else {
+      pendingDeltasRef.current.push(delta);
+    }
+  };
+
+  const handleLiveFrameLoad = () => {
+    liveFrameReadyRef.current = true;
+    const pending = pendingDeltasRef.current;
+    pendingDeltasRef.current = [];
+    pending.forEach(pushDelta);
+  };
+
   // Generate knowledge graph
  const generateGraph = async () => {
   if (!inputText.trim() && uploadedFiles.length === 0) {
@@ -59,8 +166,16 @@ function App() {
     return;
   }
 
+  // A resubmission replaces the previous request instead of running alongside it
+  cancelGeneration();
+  const controller = new AbortController();
+  abortControllerRef.current = controller;
+
   setIsGenerating(true);
   setError(null);
+  setProgress(null);
+  liveFrameReadyRef.current = false;
+  pendingDeltasRef.current = [];
 
   console.log('=== STARTING GENERATION ===');
   console.log('Input text length:', inputText.length);
@@ -76,6 +191,8 @@ function App() {
     formData.append('model_name', modelName);
     formData.append('temperature', temp);
     formData.append('chunk_size', chunkSize);
+    // The graph is loaded from the compact graph_url endpoint instead of an inline HTML page
+    formData.append('include_html', 'false');
     
     console.log('Settings:', { 
       apiKey: apiKey ? 'present' : 'missing', 
@@ -97,71 +214,112 @@ function App() {
       formData.append('files', file);
     });
 
-    console.log('Sending request to:', `${API_BASE_URL}/generate-graph/`);
+    console.log('Sending request to:', `${API_BASE_URL}/generate-graph/stream/`);
     
-    // Call your Python backend API
-    const response = await fetch(`${API_BASE_URL}/generate-graph/`, {
+    // Call your Python backend API; the graph streams in as Server-Sent Events
+    const response = await fetch(`${API_BASE_URL}/generate-graph/stream/`, {
       method: 'POST',
       body: formData,
+      signal: controller.signal,
     });
 
     console.log('Response status:', response.status);
     console.log('Response ok:', response.ok);
 
-    const data = await response.json();
-    console.log('Response data:', data);
-
-    // Check for errors in response
+    // Validation errors come back as plain JSON before any streaming starts
     if (!response.ok) {
+      const data = await response.json().catch(() => ({}));
       console.error('Response not OK:', data);
       throw new Error(data.error || `Server error: ${response.status}`);
     }
 
-    if (data.error) {
-      console.error('Error in data:', data.error);
-      throw new Error(data.error);
+    let finalData = null;
+    let streamError = null;
+
+    await readEventStream(response, (event, data) => {
+      if (event === 'job') {
+        jobIdRef.current = data.job_id;
+      } else if (event === 'progress') {
+        setProgress(data);
+      } else if (event === 'delta') {
+        setLiveGraph(true);
+        pushDelta(data);
+      } else if (event === 'done') {
+        jobIdRef.current = null;
+        finalData = data;
+      } else if (event === 'error') {
+        jobIdRef.current = null;
+        streamError = data.error;
+      }
+    });
+
+    if (streamError) {
+      console.error('Error in stream:', streamError);
+      throw new Error(streamError);
     }
 
-    // Check if HTML is actually present
-    if (!data.html && !data.graph_html) {
-      console.error('No HTML in response:', data);
+    // Check if the graph is actually present
+    if (!finalData || !finalData.graph_url) {
+      console.error('No graph in response:', finalData);
       throw new Error('No graph data received from server. Check backend logs for PDF processing errors.');
     }
 
-    console.log('SUCCESS - Setting graph HTML');
-    // Set graph HTML for display
-    setGraphHtml(data.html || data.graph_html);
-    setGraphData(data);
+    console.log('SUCCESS - Setting graph URL');
+    // The viewer page fetches the compressed graph payload itself
+    setGraphUrl(`${API_BASE_URL}${finalData.graph_url}`);
+    setGraphData(finalData);
     
   } catch (err) {
+    if (err.name === 'AbortError') {
+      console.log('=== GENERATION CANCELLED ===');
+      return;
+    }
     console.error('=== ERROR CAUGHT ===');
     console.error('Error type:', err.name);
     console.error('Error message:', err.message);
     console.error('Full error:', err);
     setError(err.message || 'Failed to generate knowledge graph');
   } finally {
-    setIsGenerating(false);
-    console.log('=== GENERATION COMPLETE ===');
+    // A newer submission owns the state once this request has been replaced
+    if (abortControllerRef.current === controller) {
+      abortControllerRef.current = null;
+      setIsGenerating(false);
+      setLiveGraph(false);
+      console.log('=== GENERATION COMPLETE ===');
+    }
   }
 };
 
   // Download graph in different formats
-  const downloadGraph = (format) => {
+  const downloadGraph = async (format) => {
     if (!graphData) return;
 
     let blob, filename;
 
-    switch(format) {
-      case 'html':
-        blob = new Blob([graphData.html || graphData.graph_html], { type: 'text/html' });
-        filename = 'knowledge_graph.html';
-        break;
-      case 'json':
-        blob = new Blob([JSON.stringify(graphData, null, 2)], { type: 'application/json' });
-        filename = 'knowledge_graph.json';
-        break;
-      default:
-        return;
+    try {
+      switch(format) {
+        case 'html': {
+          const response = await fetch(`${API_BASE_URL}${graphData.html_url}`);
+          if (!response.ok) throw new Error(`Server error: ${response.status}`);
+          blob = await response.blob();
+          filename = 'knowledge_graph.html';
+          break;
+        }
+        case 'json': {
+          const response = await fetch(`${API_BASE_URL}${graphData.data_url}`);
+          if (!response.ok) throw new Error(`Server error: ${response.status}`);
+          const graph = await response.json();
+          blob = new Blob([JSON.stringify({ ...graphData, graph }, null, 2)], { type: 'application/json' });
+          filename = 'knowledge_graph.json';
+          break;
+        }
+        default:
+          return;
+      }
+    } catch (err) {
+      console.error('Download failed:', err);
+      alert(`Download failed: ${err.message}`);
+      return;
     }
 
     const url = URL.createObjectURL(blob);
@@ -182,11 +340,19 @@ function App() {
 
   return (
     <div className="flex flex-col h-screen bg-white dark:bg-gray-900">
-      {graphHtml ? (
+      {graphUrl || liveGraph ? (
         // Graph Display View
         <div className="flex-1 flex flex-col">
           <div className="bg-white dark:bg-gray-900 border-b dark:border-gray-700 px-6 py-4 flex items-center justify-between">
-            <h2 className="text-xl font-semibold text-gray-800 dark:text-white">Knowledge Graph</h2>
+            <h2 className="text-xl font-semibold text-gray-800 dark:text-white">
+              Knowledge Graph
+              {!graphUrl && (
+                <span className="ml-3 inline-flex items-center gap-2 text-sm font-normal text-gray-500 dark:text-gray-400">
+                  <Loader2 size={14} className="animate-spin" />
+                  {progress ? `${progress.completed_chunks} / ${progress.total_chunks} chunks` : 'Building...'}
+                </span>
+              )}
+            </h2>
             <div className="flex gap-2">
               <button
                 onClick={() => downloadGraph('html')}
@@ -204,7 +370,12 @@ function App() {
               </button>
               <button
                 onClick={() => {
-                  setGraphHtml(null);
+                  // Also leaves a graph that is still being generated
+                  cancelGeneration();
+                  setIsGenerating(false);
+                  setLiveGraph(false);
+                  setProgress(null);
+                  setGraphUrl(null);
                   setGraphData(null);
                   setInputText('');
                   setUploadedFiles([]);
@@ -224,11 +395,21 @@ function App() {
             </div>
           </div>
           <div className="flex-1 overflow-hidden">
-            <iframe
-              srcDoc={graphHtml}
-              className="w-full h-full border-0"
-              title="Knowledge Graph"
-            />
+            {graphUrl ? (
+              <iframe
+                src={graphUrl}
+                className="w-full h-full border-0"
+                title="Knowledge Graph"
+              />
+            ) : (
+              <iframe
+                ref={liveFrameRef}
+                srcDoc={LIVE_GRAPH_HTML}
+                onLoad={handleLiveFrameLoad}
+                className="w-full h-full border-0"
+                title="Knowledge Graph (live)"
+              />
+            )}
           </div>
         </div>
       ) : (